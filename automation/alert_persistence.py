@@ -0,0 +1,166 @@
+"""
+Alert Persistence Module
+Writes AutoResponder alerts to the alerts table through the write-behind queue
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import func
+import logging
+
+from models import Alert
+
+
+def _to_dict(row: Alert) -> Dict:
+    """Alert row in the same shape as AlertStore alerts"""
+    first_seen = row.first_seen or row.timestamp
+    last_seen = row.last_seen or row.timestamp
+    return {
+        'id': row.id,
+        'type': row.alert_type,
+        'severity': row.severity,
+        'message': row.message,
+        'details': row.details or {},
+        'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+        'acknowledged': bool(row.acknowledged),
+        'fingerprint': row.fingerprint,
+        'count': row.count or 1,
+        'first_seen': first_seen.isoformat() if first_seen else None,
+        'last_seen': last_seen.isoformat() if last_seen else None
+    }
+
+
+class AlertPersistence:
+    """
+    Durable copy of the in-memory alert buffer
+
+    Inserts and updates are queued on the shared WriteBehindWriter, so
+    callers on the scheduler thread never wait for SQLite. Reads for
+    alerts that have aged out of memory go straight to the table.
+
+    An insert whose id another process already stored is written under a
+    new id; queued updates follow it and on_rekey() listeners are told.
+    """
+
+    def __init__(self, writer, session_factory: Callable):
+        """
+        Args:
+            writer: models.WriteBehindWriter used for inserts and updates
+            session_factory: Callable returning a new SQLAlchemy session
+        """
+        self.writer = writer
+        self.session_factory = session_factory
+        self.logger = logging.getLogger(__name__)
+        self.rekeyed: Dict[int, int] = {}
+        self.rekey_listeners: List[Callable] = []
+        self.writer.rekey_on_conflict(Alert, self._rekeyed)
+
+    def on_rekey(self, listener: Callable):
+        """Call listener(old id, new id) when an alert is stored under a new id"""
+        self.rekey_listeners.append(listener)
+
+    def _rekeyed(self, old_id: int, new_id: int):
+        self.logger.warning(f"Alert id {old_id} already stored, saved as {new_id}")
+        self.rekeyed[old_id] = new_id
+        for listener in self.rekey_listeners:
+            listener(old_id, new_id)
+
+    def _stored_id(self, alert_id: int) -> int:
+        return self.rekeyed.get(alert_id, alert_id)
+
+    def save_new(self, alert: Dict):
+        """Queue an insert for a newly created alert (keeps its in-memory id)"""
+        details = alert['details'] or {}
+        self.writer.submit(Alert(
+            id=alert['id'],
+            user_id=details.get('user_id'),
+            alert_type=alert['type'],
+            severity=alert['severity'],
+            message=alert['message'],
+            details=details,
+            acknowledged=alert['acknowledged'],
+            fingerprint=alert['fingerprint'],
+            count=alert['count'],
+            first_seen=datetime.fromisoformat(alert['first_seen']),
+            last_seen=datetime.fromisoformat(alert['last_seen']),
+            timestamp=datetime.fromisoformat(alert['timestamp'])
+        ))
+
+    def save_repeat(self, alert: Dict):
+        """Queue an update carrying a folded repeat's count and latest message"""
+        values = {
+            Alert.count: alert['count'],
+            Alert.last_seen: datetime.fromisoformat(alert['last_seen']),
+            Alert.message: alert['message'],
+            Alert.details: alert['details'] or {}
+        }
+        self.writer.submit(
+            lambda session: session.query(Alert).filter_by(id=self._stored_id(alert['id'])).update(
+                values, synchronize_session=False
+            )
+        )
+
+    def save_acknowledged(self, alert_id: int):
+        """Queue the acknowledged flag for an alert still held in memory"""
+        self.writer.submit(
+            lambda session: session.query(Alert).filter_by(id=self._stored_id(alert_id)).update(
+                {Alert.acknowledged: True}, synchronize_session=False
+            )
+        )
+
+    def acknowledge(self, alert_id: int) -> bool:
+        """Acknowledge an alert that is only in the table; False if it does not exist"""
+        session = self.session_factory()
+        try:
+            updated = session.query(Alert).filter_by(id=alert_id).update(
+                {Alert.acknowledged: True}, synchronize_session=False
+            )
+            session.commit()
+            return updated > 0
+        except Exception as e:
+            self.logger.error(f"Error acknowledging alert {alert_id}: {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    def last_id(self) -> int:
+        """Highest alert id stored, so new ids continue after a restart"""
+        session = self.session_factory()
+        try:
+            return session.query(func.max(Alert.id)).scalar() or 0
+        finally:
+            session.close()
+
+    def load_recent(self, limit: int) -> List[Dict]:
+        """Most recent alerts, oldest first, to warm the in-memory buffer"""
+        session = self.session_factory()
+        try:
+            rows = session.query(Alert).order_by(Alert.id.desc()).limit(limit).all()
+            return [_to_dict(row) for row in reversed(rows)]
+        finally:
+            session.close()
+
+    def query_older(self, before_id: Optional[int], limit: int, severity: Optional[str] = None,
+                    alert_type: Optional[str] = None, acknowledged: Optional[bool] = None,
+                    since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[Dict]:
+        """Alerts with ids below `before_id`, newest first, with the AlertStore filters"""
+        session = self.session_factory()
+        try:
+            query = session.query(Alert)
+            if before_id is not None:
+                query = query.filter(Alert.id < before_id)
+            if severity is not None:
+                query = query.filter(Alert.severity == severity)
+            if alert_type is not None:
+                query = query.filter(Alert.alert_type == alert_type)
+            if acknowledged is not None:
+                query = query.filter(Alert.acknowledged == acknowledged)
+            if since is not None:
+                query = query.filter(func.coalesce(Alert.last_seen, Alert.timestamp) >= since)
+            if until is not None:
+                query = query.filter(func.coalesce(Alert.last_seen, Alert.timestamp) <= until)
+            rows = query.order_by(Alert.id.desc()).limit(limit).all()
+            return [_to_dict(row) for row in rows]
+        finally:
+            session.close()
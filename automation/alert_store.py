@@ -0,0 +1,184 @@
+"""
+Alert Store Module
+Bounded, indexed in-memory alert buffer shared by Flask and scheduler threads
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import itertools
+import threading
+
+
+class AlertStore:
+    """
+    Most recent alerts, oldest evicted first
+
+    Alerts live in a deque in creation order with side indexes by id,
+    severity and fingerprint, so adding, evicting, acknowledging and
+    folding repeats are all O(1). Ids come from a counter and are never
+    reused after eviction.
+    """
+
+    def __init__(self, max_alerts: int = 100):
+        self.max_alerts = max_alerts
+        self.alerts = deque()          # oldest on the left
+        self.by_id: Dict[int, Dict] = {}
+        self.by_severity: Dict[str, deque] = {}
+        self.by_fingerprint: Dict[str, Dict] = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.alerts)
+
+    def record(self, alert_type: str, severity: str, message: str, details: Optional[Dict],
+               fingerprint: str, suppression_window: float) -> Tuple[Dict, bool]:
+        """
+        Add an alert, or fold it into the open alert with the same fingerprint
+
+        Returns:
+            (the stored alert, True if a new alert was created)
+        """
+        now = datetime.now()
+        with self.lock:
+            existing = self.by_fingerprint.get(fingerprint)
+            if existing and not existing['acknowledged']:
+                quiet_for = (now - datetime.fromisoformat(existing['last_seen'])).total_seconds()
+                if quiet_for <= suppression_window:
+                    existing['count'] += 1
+                    existing['last_seen'] = now.isoformat()
+                    existing['message'] = message
+                    existing['details'] = details or {}
+                    return dict(existing), False
+
+            alert = {
+                'id': next(self.ids),
+                'type': alert_type,
+                'severity': severity,
+                'message': message,
+                'details': details or {},
+                'timestamp': now.isoformat(),
+                'acknowledged': False,
+                'fingerprint': fingerprint,
+                'count': 1,
+                'first_seen': now.isoformat(),
+                'last_seen': now.isoformat()
+            }
+            self.alerts.append(alert)
+            self.by_id[alert['id']] = alert
+            self.by_severity.setdefault(severity, deque()).append(alert)
+            self.by_fingerprint[fingerprint] = alert
+
+            while len(self.alerts) > self.max_alerts:
+                self._evict_oldest()
+
+            return dict(alert), True
+
+    def get(self, alert_id: int) -> Optional[Dict]:
+        with self.lock:
+            alert = self.by_id.get(alert_id)
+            return dict(alert) if alert else None
+
+    def acknowledge(self, alert_id: int) -> bool:
+        """Mark an alert as acknowledged; False if it is not in the buffer"""
+        with self.lock:
+            alert = self.by_id.get(alert_id)
+            if alert is None:
+                return False
+            alert['acknowledged'] = True
+            return True
+
+    def query(self, limit: int = 50, severity: Optional[str] = None, alert_type: Optional[str] = None,
+              acknowledged: Optional[bool] = None, since: Optional[datetime] = None,
+              until: Optional[datetime] = None) -> List[Dict]:
+        """
+        Newest alerts first, filtered, stopping as soon as `limit` match
+
+        The time window applies to each alert's last occurrence.
+        """
+        since_iso = since.isoformat() if since else None
+        until_iso = until.isoformat() if until else None
+
+        with self.lock:
+            source = self.alerts if severity is None else self.by_severity.get(severity, ())
+            matches = []
+            for alert in reversed(source):
+                if len(matches) >= limit:
+                    break
+                if alert_type is not None and alert['type'] != alert_type:
+                    continue
+                if acknowledged is not None and alert['acknowledged'] != acknowledged:
+                    continue
+                if since_iso is not None and alert['last_seen'] < since_iso:
+                    continue
+                if until_iso is not None and alert['last_seen'] > until_iso:
+                    continue
+                matches.append(dict(alert))
+            return matches
+
+    def oldest_id(self) -> Optional[int]:
+        """Id of the oldest buffered alert (None if empty)"""
+        with self.lock:
+            return self.alerts[0]['id'] if self.alerts else None
+
+    def restore(self, alerts: List[Dict], last_id: int = 0):
+        """
+        Load previously persisted alerts, oldest first, e.g. after a restart
+
+        Args:
+            alerts: Alert dicts in creation order
+            last_id: Highest id already used; new ids continue after it
+        """
+        with self.lock:
+            kept = [dict(alert) for alert in alerts[-self.max_alerts:]] if self.max_alerts else []
+            self._rebuild(kept)
+            self.by_fingerprint = {}
+            for alert in kept:
+                if alert.get('fingerprint'):
+                    self.by_fingerprint[alert['fingerprint']] = alert
+            highest = max([last_id] + [alert['id'] for alert in kept])
+            self.ids = itertools.count(highest + 1)
+
+    def rekey(self, old_id: int, new_id: int):
+        """Move a buffered alert to the id it was persisted under; later ids continue after it"""
+        with self.lock:
+            alert = self.by_id.pop(old_id, None)
+            if alert is not None:
+                alert['id'] = new_id
+                self.by_id[new_id] = alert
+            self.ids = itertools.count(max(next(self.ids), new_id + 1))
+
+    def counts(self) -> Dict[str, int]:
+        """Number of buffered alerts per severity"""
+        with self.lock:
+            return {severity: len(alerts) for severity, alerts in self.by_severity.items() if alerts}
+
+    def remove_older_than(self, cutoff: datetime) -> int:
+        """Drop alerts whose last occurrence is before the cutoff"""
+        cutoff_iso = cutoff.isoformat()
+        with self.lock:
+            kept = [a for a in self.alerts if a['last_seen'] >= cutoff_iso]
+            removed = len(self.alerts) - len(kept)
+            if removed:
+                self._rebuild(kept)
+            return removed
+
+    def _evict_oldest(self):
+        alert = self.alerts.popleft()
+        del self.by_id[alert['id']]
+        # The oldest alert overall is also the oldest of its severity
+        self.by_severity[alert['severity']].popleft()
+        if self.by_fingerprint.get(alert['fingerprint']) is alert:
+            del self.by_fingerprint[alert['fingerprint']]
+
+    def _rebuild(self, alerts: List[Dict]):
+        self.alerts = deque(alerts)
+        self.by_id = {a['id']: a for a in alerts}
+        self.by_severity = {}
+        for alert in alerts:
+            self.by_severity.setdefault(alert['severity'], deque()).append(alert)
+        self.by_fingerprint = {
+            fingerprint: alert for fingerprint, alert in self.by_fingerprint.items()
+            if alert['id'] in self.by_id
+        }
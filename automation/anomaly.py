@@ -0,0 +1,222 @@
+"""
+Anomaly Detection Module
+Streaming EWMA and hour-of-day baselines with z-score scoring for host and network metrics
+"""
+
+from array import array
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import logging
+import math
+import threading
+import time
+
+
+# Series scored every tick: name -> (unit, minimum standard deviation).
+# The floor keeps near-constant series (e.g. idle links) from turning
+# tiny wobbles into huge z-scores.
+DEFAULT_SERIES = {
+    'cpu': ('percent', 2.0),
+    'memory': ('percent', 0.5),
+    'network_send': ('MB/s', 0.05),
+    'network_recv': ('MB/s', 0.05),
+    'packets_per_sec': ('packets/s', 5.0),
+    'bytes_per_sec': ('B/s', 5000.0),
+}
+
+SLOTS_PER_DAY = 24
+
+_SYSTEM_VALUES = {
+    'cpu': lambda m: m['cpu']['usage_percent'],
+    'memory': lambda m: m['memory']['percent'],
+    'network_send': lambda m: m['network']['send_rate_mbps'],
+    'network_recv': lambda m: m['network']['recv_rate_mbps'],
+}
+
+
+class AnomalyDetector:
+    """
+    Flags metric values that deviate from what is normal for that hour
+
+    Each series keeps a global EWMA mean/variance plus one EWMA mean/variance
+    per hour of the day, so traffic that is always high at noon and low at
+    night is compared against its own hour. All state lives in flat typed
+    arrays (one slot per series, or per series and hour), so memory is fixed
+    per series and a tick scores every series in a single pass.
+    """
+
+    def __init__(self, on_anomaly: Callable[[Dict], None], series: Optional[Dict] = None,
+                 threshold: float = 4.0, consecutive: int = 3, half_life: float = 600,
+                 seasonal_half_life: float = 3 * 3600, min_samples: int = 30):
+        """
+        Args:
+            on_anomaly: Called with an anomaly dict when a series starts deviating
+            series: name -> (unit, minimum std); defaults to DEFAULT_SERIES
+            threshold: |z| at which a sample counts as anomalous
+            consecutive: Anomalous ticks in a row needed before reporting
+            half_life: Seconds for the global baseline to forget half its history
+            seasonal_half_life: The same for hourly baselines, counted in time
+                spent inside that hour (3h = roughly the last three days)
+            min_samples: Samples a baseline needs before it is used for scoring
+        """
+        self.on_anomaly = on_anomaly
+        self.series = dict(series or DEFAULT_SERIES)
+        self.names = list(self.series)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.threshold = threshold
+        self.consecutive = consecutive
+        self.half_life = half_life
+        self.seasonal_half_life = seasonal_half_life
+        self.min_samples = min_samples
+
+        count = len(self.names)
+        zeros = lambda n: array('d', bytes(8 * n))
+        self.min_std = array('d', [self.series[name][1] for name in self.names])
+        self.mean = zeros(count)
+        self.var = zeros(count)
+        self.samples = zeros(count)
+        self.seasonal_mean = zeros(count * SLOTS_PER_DAY)
+        self.seasonal_var = zeros(count * SLOTS_PER_DAY)
+        self.seasonal_samples = zeros(count * SLOTS_PER_DAY)
+        self.last_value = zeros(count)
+        self.last_z = zeros(count)
+        self.streak = array('l', bytes(array('l').itemsize * count))
+        self.alerting = array('b', bytes(count))
+
+        self.last_tick = None
+        self.packet_totals = None
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def observe_sample(self, metrics: Dict, packet_stats: Optional[Dict] = None,
+                       timestamp: Optional[float] = None):
+        """
+        Score one SystemMonitor snapshot, plus PacketAnalyzer statistics if given
+
+        Packet counters are cumulative, so they are turned into per-second
+        rates against the previous call; they are skipped while no capture
+        is running so idle periods do not drag the baseline to zero.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        values = {}
+        for name, extract in _SYSTEM_VALUES.items():
+            if name in self.index:
+                try:
+                    values[name] = float(extract(metrics))
+                except (KeyError, TypeError, ValueError):
+                    pass
+
+        if packet_stats and packet_stats.get('is_capturing'):
+            totals = (packet_stats.get('total_packets', 0), packet_stats.get('total_bytes', 0), timestamp)
+            previous = self.packet_totals
+            self.packet_totals = totals
+            # Counters reset when a new capture starts
+            if previous and totals[2] > previous[2] and totals[0] >= previous[0] and totals[1] >= previous[1]:
+                elapsed = totals[2] - previous[2]
+                values['packets_per_sec'] = (totals[0] - previous[0]) / elapsed
+                values['bytes_per_sec'] = (totals[1] - previous[1]) / elapsed
+        else:
+            self.packet_totals = None
+
+        self.observe(values, timestamp)
+
+    def observe(self, values: Dict[str, float], timestamp: Optional[float] = None):
+        """Score and learn one tick of values (series missing from `values` are left untouched)"""
+        timestamp = time.time() if timestamp is None else timestamp
+        anomalies = []
+
+        with self.lock:
+            elapsed = timestamp - self.last_tick if self.last_tick is not None else 0.0
+            self.last_tick = timestamp
+            # Time-based smoothing factors, shared by every series this tick
+            alpha = seasonal_alpha = 0.0
+            if elapsed > 0:
+                alpha = 1 - math.exp(-elapsed * math.log(2) / self.half_life)
+                seasonal_alpha = 1 - math.exp(-elapsed * math.log(2) / self.seasonal_half_life)
+            hour = datetime.fromtimestamp(timestamp).hour
+
+            for name, value in values.items():
+                i = self.index.get(name)
+                if i is None or value is None:
+                    continue
+                s = i * SLOTS_PER_DAY + hour
+
+                # Score against the hourly baseline once it has enough data
+                if self.seasonal_samples[s] >= self.min_samples:
+                    expected, variance, baseline = self.seasonal_mean[s], self.seasonal_var[s], 'seasonal'
+                elif self.samples[i] >= self.min_samples:
+                    expected, variance, baseline = self.mean[i], self.var[i], 'global'
+                else:
+                    expected = variance = baseline = None
+
+                z = 0.0
+                if baseline is not None:
+                    std = max(math.sqrt(variance), self.min_std[i])
+                    z = (value - expected) / std
+
+                    if abs(z) >= self.threshold:
+                        self.streak[i] += 1
+                        if self.streak[i] >= self.consecutive and not self.alerting[i]:
+                            self.alerting[i] = 1
+                            anomalies.append({
+                                'series': name,
+                                'value': value,
+                                'expected': expected,
+                                'std': std,
+                                'z': z,
+                                'baseline': baseline,
+                                'unit': self.series[name][0],
+                                'timestamp': datetime.fromtimestamp(timestamp).isoformat()
+                            })
+                    else:
+                        self.streak[i] = 0
+                        # Hysteresis: re-arm only once the series is clearly back to normal
+                        if abs(z) < self.threshold / 2:
+                            self.alerting[i] = 0
+
+                self.last_value[i] = value
+                self.last_z[i] = z
+
+                # Learn: the first samples are averaged exactly, then the EWMA takes over
+                self.samples[i] += 1
+                self._update(self.mean, self.var, i, value, max(alpha, 1 / self.samples[i]))
+                self.seasonal_samples[s] += 1
+                self._update(self.seasonal_mean, self.seasonal_var, s, value,
+                             max(seasonal_alpha, 1 / self.seasonal_samples[s]))
+
+        for anomaly in anomalies:
+            try:
+                self.on_anomaly(anomaly)
+            except Exception as e:
+                self.logger.error(f"Anomaly callback failed for {anomaly['series']}: {e}")
+
+    @staticmethod
+    def _update(means: array, variances: array, i: int, value: float, alpha: float):
+        # Incremental exponentially weighted mean and variance
+        diff = value - means[i]
+        increment = alpha * diff
+        means[i] += increment
+        variances[i] = (1 - alpha) * (variances[i] + diff * increment)
+
+    def get_status(self) -> List[Dict]:
+        """Current baseline and last score of every series"""
+        with self.lock:
+            hour = datetime.fromtimestamp(self.last_tick).hour if self.last_tick else datetime.now().hour
+            status = []
+            for i, name in enumerate(self.names):
+                s = i * SLOTS_PER_DAY + hour
+                status.append({
+                    'series': name,
+                    'unit': self.series[name][0],
+                    'samples': int(self.samples[i]),
+                    'mean': round(self.mean[i], 4),
+                    'std': round(math.sqrt(self.var[i]), 4),
+                    'hour': hour,
+                    'hour_samples': int(self.seasonal_samples[s]),
+                    'hour_mean': round(self.seasonal_mean[s], 4),
+                    'hour_std': round(math.sqrt(self.seasonal_var[s]), 4),
+                    'last_value': self.last_value[i],
+                    'last_z': round(self.last_z[i], 2),
+                    'alerting': bool(self.alerting[i])
+                })
+            return status
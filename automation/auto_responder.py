@@ -7,24 +7,109 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime
 from typing import Callable, Dict, List, Optional
+import hashlib
 import logging
+import re
+
+from .alert_store import AlertStore
+from .job_stats import JobMonitor
+
+
+# Numbers that are not part of an IP address or version string, e.g. the
+# "93.5" in "High CPU usage detected: 93.5%"
+_VOLATILE_NUMBER = re.compile(r'(?<![\d.])\d+(?:\.\d+)?(?![\d.])')
+
+
+def alert_fingerprint(alert_type: str, severity: str, message: str, details: Optional[Dict] = None) -> str:
+    """
+    Identity of an alert for deduplication
+    
+    Repeats of the same condition differ only in their measured values, so
+    those are masked out of the message; the target (host, IP, ...) is kept
+    so the same finding on different targets stays separate.
+    """
+    details = details or {}
+    target = details.get('target') or details.get('source_ip') or details.get('host')
+    normalized = _VOLATILE_NUMBER.sub('#', ' '.join(message.lower().split()))
+    key = '\x1f'.join((alert_type, severity, normalized, str(target or '')))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
 
 
 class AutoResponder:
     """Manages automated tasks and scheduled responses"""
     
-    def __init__(self):
+    def __init__(self, suppression_window: int = 300, max_alerts: int = 100, persistence=None, notifier=None):
+        """
+        Args:
+            suppression_window: Seconds after an alert's last occurrence during
+                which repeats are folded into it instead of creating a new alert
+            max_alerts: Number of alerts kept in memory
+            persistence: Optional AlertPersistence; alerts are then also written
+                to the alerts table and older pages are read back from it
+            notifier: Optional NotificationDispatcher that new alerts are handed to
+        """
         self.scheduler = BackgroundScheduler()
-        self.alerts = []
-        self.max_alerts = 100
+        self.job_monitor = JobMonitor(self.scheduler)
+        self.alert_store = AlertStore(max_alerts)
+        self.suppression_window = suppression_window
+        self.persistence = persistence
+        self.notifier = notifier
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
+        
+        if self.persistence:
+            self.persistence.on_rekey(self.alert_store.rekey)
+            self.restore_alerts()
+    
+    def restore_alerts(self):
+        """Warm the in-memory buffer from the table so ids and dedup survive restarts"""
+        try:
+            self.alert_store.restore(
+                self.persistence.load_recent(self.alert_store.max_alerts),
+                self.persistence.last_id()
+            )
+        except Exception as e:
+            self.logger.error(f"Could not restore persisted alerts: {e}")
     
-    def start(self):
-        """Start the scheduler"""
+    def start(self, paused: bool = False):
+        """
+        Start the scheduler
+        
+        Args:
+            paused: Start as a standby, without running jobs until set_active(True)
+        """
         if not self.scheduler.running:
-            self.scheduler.start()
-            self.logger.info("Automation scheduler started")
+            if paused and self.persistence:
+                # A standby serves alerts from the table, like set_active(False);
+                # the buffer restored at construction would go stale
+                self.alert_store.restore([])
+            self.scheduler.start(paused=paused)
+            self.logger.info(f"Automation scheduler started{' (paused)' if paused else ''}")
+    
+    def set_active(self, active: bool):
+        """
+        Run or pause scheduled tasks when this process gains or loses leadership
+        
+        Only the active process creates alerts. A standby process keeps an
+        empty buffer so alert reads go to the alerts table, and a process
+        taking over reloads the buffer so ids continue after the last stored one.
+        """
+        if active:
+            if self.persistence:
+                self.restore_alerts()
+            # Restart every interval from now: the schedule kept while paused
+            # would fire an overdue run at once and another at the old phase,
+            # shortly after the previous leader's last run
+            for job in self.scheduler.get_jobs():
+                if isinstance(job.trigger, IntervalTrigger):
+                    self.scheduler.reschedule_job(job.id, trigger=IntervalTrigger(seconds=job.trigger.interval.total_seconds()))
+            self.scheduler.resume()
+            self.logger.info("Automation tasks resumed")
+        else:
+            self.scheduler.pause()
+            if self.persistence:
+                self.alert_store.restore([])
+            self.logger.info("Automation tasks paused")
     
     def stop(self):
         """Stop the scheduler"""
@@ -42,7 +127,7 @@ class AutoResponder:
             task_id: Unique identifier for the task
         """
         self.scheduler.add_job(
-            func=task_func,
+            func=self.job_monitor.wrap(task_id, task_func, interval_seconds),
             trigger=IntervalTrigger(seconds=interval_seconds),
             id=task_id,
             replace_existing=True
@@ -53,13 +138,14 @@ class AutoResponder:
         """Remove a scheduled task"""
         try:
             self.scheduler.remove_job(task_id)
+            self.job_monitor.remove(task_id)
             self.logger.info(f"Removed task: {task_id}")
         except:
             pass
     
     def create_alert(self, alert_type: str, severity: str, message: str, details: Optional[Dict] = None) -> Dict:
         """
-        Create a new alert
+        Create a new alert, or fold a repeat into the matching open alert
         
         Args:
             alert_type: Type of alert (e.g., 'security', 'performance', 'network')
@@ -67,46 +153,75 @@ class AutoResponder:
             message: Alert message
             details: Additional details about the alert
         """
-        alert = {
-            'id': len(self.alerts) + 1,
-            'type': alert_type,
-            'severity': severity,
-            'message': message,
-            'details': details or {},
-            'timestamp': datetime.now().isoformat(),
-            'acknowledged': False
-        }
+        fingerprint = alert_fingerprint(alert_type, severity, message, details)
+        alert, created = self.alert_store.record(
+            alert_type, severity, message, details, fingerprint, self.suppression_window
+        )
         
-        self.alerts.insert(0, alert)  # Add to beginning
+        if self.persistence:
+            # Queued on the write-behind writer; never blocks the caller
+            if created:
+                self.persistence.save_new(alert)
+            else:
+                self.persistence.save_repeat(alert)
         
-        # Keep only the most recent alerts
-        if len(self.alerts) > self.max_alerts:
-            self.alerts = self.alerts[:self.max_alerts]
+        if not created:
+            self.logger.debug(f"Alert repeated (x{alert['count']}): [{severity.upper()}] {alert_type} - {message}")
+            return alert
         
         self.logger.warning(f"Alert created: [{severity.upper()}] {alert_type} - {message}")
         
+        if self.notifier:
+            # Only enqueues; delivery happens on the dispatcher's threads
+            self.notifier.submit(alert)
+        
         # Auto-response based on severity
         if severity == 'critical':
             self._handle_critical_alert(alert)
         
         return alert
     
-    def get_alerts(self, limit: int = 50, severity_filter: Optional[str] = None) -> List[Dict]:
-        """Get recent alerts with optional filtering"""
-        alerts = self.alerts[:limit]
+    def get_alerts(self, limit: int = 50, severity_filter: Optional[str] = None,
+                   alert_type: Optional[str] = None, acknowledged: Optional[bool] = None,
+                   since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[Dict]:
+        """
+        Get recent alerts, newest first, with optional filtering
         
-        if severity_filter:
-            alerts = [a for a in alerts if a['severity'] == severity_filter]
+        Alerts still in memory are served from the buffer; when persistence
+        is enabled and the buffer has fewer matches than `limit`, the rest
+        come from older rows of the alerts table.
+        """
+        filters = {
+            'severity': severity_filter,
+            'alert_type': alert_type,
+            'acknowledged': acknowledged,
+            'since': since,
+            'until': until
+        }
+        alerts = self.alert_store.query(limit=limit, **filters)
+        
+        if self.persistence and len(alerts) < limit:
+            try:
+                alerts.extend(self.persistence.query_older(
+                    self.alert_store.oldest_id(), limit - len(alerts), **filters
+                ))
+            except Exception as e:
+                self.logger.error(f"Error reading persisted alerts: {e}")
         
         return alerts
     
     def acknowledge_alert(self, alert_id: int) -> bool:
         """Mark an alert as acknowledged"""
-        for alert in self.alerts:
-            if alert['id'] == alert_id:
-                alert['acknowledged'] = True
-                self.logger.info(f"Alert {alert_id} acknowledged")
-                return True
+        if self.alert_store.acknowledge(alert_id):
+            if self.persistence:
+                self.persistence.save_acknowledged(alert_id)
+            self.logger.info(f"Alert {alert_id} acknowledged")
+            return True
+        
+        # Aged out of memory: update the stored row directly
+        if self.persistence and self.persistence.acknowledge(alert_id):
+            self.logger.info(f"Alert {alert_id} acknowledged")
+            return True
         return False
     
     def clear_old_alerts(self, hours: int = 24):
@@ -114,12 +229,7 @@ class AutoResponder:
         from datetime import timedelta
         cutoff_time = datetime.now() - timedelta(hours=hours)
         
-        initial_count = len(self.alerts)
-        self.alerts = [
-            a for a in self.alerts 
-            if datetime.fromisoformat(a['timestamp']) > cutoff_time
-        ]
-        cleared_count = initial_count - len(self.alerts)
+        cleared_count = self.alert_store.remove_older_than(cutoff_time)
         
         if cleared_count > 0:
             self.logger.info(f"Cleared {cleared_count} old alerts")
@@ -128,21 +238,22 @@ class AutoResponder:
         """Handle critical alerts with automated response"""
         self.logger.critical(f"CRITICAL ALERT: {alert['message']}")
         
+        # Notifications go out through self.notifier (see create_alert).
         # Here you could add automated response actions:
-        # - Send notifications
         # - Execute security commands
         # - Trigger failover procedures
         # - etc.
     
     def get_task_status(self) -> List[Dict]:
-        """Get status of all scheduled tasks"""
+        """Get status of all scheduled tasks, with run statistics for periodic tasks"""
         jobs = self.scheduler.get_jobs()
         return [
-            {
-                'id': job.id,
-                'name': job.name,
-                'next_run': job.next_run_time.isoformat() if job.next_run_time else None,
-                'trigger': str(job.trigger)
-            }
+            dict(
+                self.job_monitor.get(job.id) or {},
+                id=job.id,
+                name=job.name,
+                next_run=job.next_run_time.isoformat() if job.next_run_time else None,
+                trigger=str(job.trigger)
+            )
             for job in jobs
         ]
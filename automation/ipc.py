@@ -0,0 +1,113 @@
+"""
+IPC Module
+Line-delimited JSON calls over a unix socket between the web and worker processes
+"""
+
+from datetime import datetime
+from typing import Any, Callable, Dict
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+
+
+class IPCError(Exception):
+    """The worker could not be reached or the call failed on its side"""
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One connection may carry several calls, one JSON object per line"""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                handler = self.server.handlers.get(request.get('method'))
+                if handler is None:
+                    raise KeyError(f"Unknown method '{request.get('method')}'")
+                response = {'ok': True, 'result': handler(**request.get('params', {}))}
+            except Exception as e:
+                response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(response, default=_json_default).encode('utf-8') + b'\n')
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class IPCServer:
+    """Serves a table of callables on a unix socket (owner-only permissions)"""
+
+    def __init__(self, path: str, handlers: Dict[str, Callable[..., Any]]):
+        """
+        Args:
+            path: Socket path; a stale socket file left by a dead worker is replaced
+            handlers: method name -> callable taking JSON keyword arguments and
+                returning something JSON-serializable
+        """
+        self.path = path
+        self.handlers = handlers
+        self.server = None
+        self.thread = None
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        previous_umask = os.umask(0o177)
+        try:
+            self.server = _Server(self.path, _Handler)
+        finally:
+            os.umask(previous_umask)
+        self.server.handlers = self.handlers
+        self.thread = threading.Thread(target=self.server.serve_forever, name='ipc-server', daemon=True)
+        self.thread.start()
+        self.logger.info(f"IPC server listening on {self.path}")
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class IPCClient:
+    """Calls an IPCServer; every call uses a short-lived connection"""
+
+    def __init__(self, path: str, timeout: float = 2.0):
+        """
+        Args:
+            path: Socket path of the worker's IPCServer
+            timeout: Seconds to wait for connecting and for the reply
+        """
+        self.path = path
+        self.timeout = timeout
+
+    def call(self, method: str, **params) -> Any:
+        """Invoke `method` on the worker; raises IPCError on any failure"""
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.path)
+                sock.sendall(json.dumps({'method': method, 'params': params}, default=_json_default).encode('utf-8') + b'\n')
+                with sock.makefile('rb') as reader:
+                    line = reader.readline()
+        except OSError as e:
+            raise IPCError(f"Worker unreachable at {self.path}: {e}")
+
+        if not line:
+            raise IPCError("Worker closed the connection without replying")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise IPCError(response.get('error', 'Unknown worker error'))
+        return response['result']
@@ -0,0 +1,156 @@
+"""
+Job Statistics Module
+Runtime, overlap and misfire instrumentation for scheduled automation tasks
+"""
+
+from apscheduler.events import (
+    EVENT_JOB_SUBMITTED, EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+)
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Optional
+import functools
+import threading
+import time
+
+
+# Upper bounds (seconds) of the duration histogram buckets; the last bucket is open
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class JobStats:
+    """Counters for one job; recent durations are kept for percentiles"""
+
+    def __init__(self, job_id: str, interval: Optional[float] = None, recent: int = 256):
+        self.job_id = job_id
+        self.interval = interval
+        self.runs = 0
+        self.failures = 0
+        self.overruns = 0          # runs that took longer than the interval
+        self.skipped = 0           # not started because the previous run was still going
+        self.missed = 0            # not started because the scheduler was too late
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+        self.last_duration = None
+        self.last_error = None
+        self.last_started = None
+        self.last_finished = None
+        self.running_since = None
+        self.max_lateness = 0.0
+        self.last_lateness = None
+        self.recent = deque(maxlen=recent)
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)
+
+    def record_run(self, duration: float, error: Optional[BaseException] = None):
+        self.runs += 1
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+        self.last_duration = duration
+        self.recent.append(duration)
+        self.buckets[bisect_left(DURATION_BUCKETS, duration)] += 1
+        if self.interval and duration > self.interval:
+            self.overruns += 1
+        if error is not None:
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def to_dict(self) -> Dict:
+        running_for = time.time() - self.running_since if self.running_since else None
+        return {
+            'id': self.job_id,
+            'interval_seconds': self.interval,
+            'runs': self.runs,
+            'failures': self.failures,
+            'overruns': self.overruns,
+            'skipped_max_instances': self.skipped,
+            'misfires': self.missed,
+            'duration': {
+                'last': self.last_duration,
+                'avg': self.total_duration / self.runs if self.runs else None,
+                'p95': self.percentile(0.95),
+                'max': self.max_duration if self.runs else None,
+                'histogram': dict(zip([f"le_{bound}" for bound in DURATION_BUCKETS] + ['inf'], self.buckets))
+            },
+            'lateness': {'last': self.last_lateness, 'max': self.max_lateness},
+            'last_error': self.last_error,
+            'last_started': datetime.fromtimestamp(self.last_started).isoformat() if self.last_started else None,
+            'last_finished': datetime.fromtimestamp(self.last_finished).isoformat() if self.last_finished else None,
+            'running_for': running_for,
+            # Still running past its interval: the next run will be skipped
+            'stalled': bool(running_for and self.interval and running_for > self.interval)
+        }
+
+
+class JobMonitor:
+    """
+    Collects JobStats for scheduler jobs
+
+    Job functions are wrapped to time each run; scheduler events supply
+    how late each run was submitted, runs skipped because the previous
+    one was still going (max_instances) and runs missed entirely.
+    """
+
+    def __init__(self, scheduler):
+        self.stats: Dict[str, JobStats] = {}
+        self.lock = threading.Lock()
+        scheduler.add_listener(self._on_event, EVENT_JOB_SUBMITTED | EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+
+    def wrap(self, job_id: str, func: Callable, interval: Optional[float] = None) -> Callable:
+        """Return `func` instrumented under `job_id` (exceptions are recorded and re-raised)"""
+        with self.lock:
+            stats = self.stats.get(job_id)
+            if stats is None:
+                stats = self.stats[job_id] = JobStats(job_id, interval)
+            stats.interval = interval
+
+        @functools.wraps(func)
+        def instrumented(*args, **kwargs):
+            started = time.perf_counter()
+            with self.lock:
+                stats.last_started = stats.running_since = time.time()
+            error = None
+            try:
+                return func(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                with self.lock:
+                    stats.record_run(time.perf_counter() - started, error)
+                    stats.running_since = None
+                    stats.last_finished = time.time()
+
+        return instrumented
+
+    def remove(self, job_id: str):
+        with self.lock:
+            self.stats.pop(job_id, None)
+
+    def _on_event(self, event):
+        with self.lock:
+            stats = self.stats.get(event.job_id)
+            if stats is None:
+                return
+            if event.code == EVENT_JOB_MISSED:
+                stats.missed += 1
+                return
+            if event.code == EVENT_JOB_MAX_INSTANCES:
+                stats.skipped += 1
+                return
+
+            scheduled = event.scheduled_run_times[-1]
+            lateness = max((datetime.now(scheduled.tzinfo) - scheduled).total_seconds(), 0.0)
+            stats.last_lateness = lateness
+            stats.max_lateness = max(stats.max_lateness, lateness)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self.lock:
+            stats = self.stats.get(job_id)
+            return stats.to_dict() if stats else None
@@ -0,0 +1,163 @@
+"""
+Leader Election Module
+Lets exactly one process (e.g. one gunicorn worker) own the automation scheduler
+"""
+
+from sqlalchemy import or_
+from sqlalchemy.dialects.sqlite import insert
+from typing import Callable, Dict, Optional
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from models import Lease
+
+
+class LeaderElection:
+    """
+    Lease-based leader election over the shared SQLite database
+
+    The leader renews a row in the leases table every `renew_interval`
+    seconds. Any process may take the lease once it has expired, so if
+    the leader dies another process takes over within `ttl` seconds; a
+    graceful stop releases it immediately. SQLite serializes writers, so
+    the conditional UPDATE/INSERT that claims the lease is atomic.
+    """
+
+    def __init__(self, session_factory: Callable, name: str = 'scheduler', ttl: float = 30.0,
+                 renew_interval: Optional[float] = None,
+                 on_elected: Optional[Callable[[], None]] = None,
+                 on_demoted: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            session_factory: Callable returning a new SQLAlchemy session
+            name: Lease name; one leader is elected per name
+            ttl: Seconds a lease stays valid without renewal
+            renew_interval: Seconds between renewals/claim attempts (default ttl / 3)
+            on_elected: Called in the election thread when this process becomes leader
+            on_demoted: Called when it loses the lease
+        """
+        self.session_factory = session_factory
+        self.name = name
+        self.ttl = ttl
+        self.renew_interval = renew_interval or ttl / 3
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.valid_until = 0.0
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        """Make a first claim right away, then keep renewing in the background"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self._step()
+        self.thread = threading.Thread(target=self._run, name=f'lease-{self.name}', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop renewing and hand the lease over immediately"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.renew_interval + 1)
+            self.thread = None
+        if self.is_leader:
+            self._set_leader(False)
+            self.release()
+
+    def try_acquire(self) -> bool:
+        """Claim or renew the lease; True if this process holds it afterwards"""
+        now = time.time()
+        expires = now + self.ttl
+        session = self.session_factory()
+        try:
+            renewed = session.query(Lease).filter(
+                Lease.name == self.name,
+                or_(Lease.owner == self.owner_id, Lease.expires_at < now)
+            ).update({
+                Lease.owner: self.owner_id,
+                Lease.renewed_at: now,
+                Lease.expires_at: expires
+            }, synchronize_session=False)
+            if not renewed:
+                renewed = session.execute(
+                    insert(Lease).values(
+                        name=self.name, owner=self.owner_id,
+                        acquired_at=now, renewed_at=now, expires_at=expires
+                    ).on_conflict_do_nothing(index_elements=['name'])
+                ).rowcount
+            elif not self.is_leader:
+                session.query(Lease).filter_by(name=self.name).update(
+                    {Lease.acquired_at: now}, synchronize_session=False
+                )
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            self.logger.error(f"Lease '{self.name}' renewal failed: {e}")
+            return False
+        finally:
+            session.close()
+
+        if renewed:
+            self.valid_until = expires
+        return bool(renewed)
+
+    def release(self):
+        """Expire our lease so another process can take it at once"""
+        session = self.session_factory()
+        try:
+            session.query(Lease).filter_by(name=self.name, owner=self.owner_id).update(
+                {Lease.expires_at: 0.0}, synchronize_session=False
+            )
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            self.logger.error(f"Lease '{self.name}' release failed: {e}")
+        finally:
+            session.close()
+
+    def _step(self):
+        held = self.try_acquire()
+        if held and not self.is_leader:
+            self._set_leader(True)
+        elif not held and self.is_leader and time.time() >= self.valid_until - self.renew_interval:
+            # Lost it, or cannot renew and it is about to lapse: step down
+            # before anyone else could legitimately claim it
+            self._set_leader(False)
+
+    def _set_leader(self, leader: bool):
+        self.is_leader = leader
+        self.logger.info(f"{self.owner_id} {'acquired' if leader else 'gave up'} the '{self.name}' lease")
+        callback = self.on_elected if leader else self.on_demoted
+        if callback:
+            try:
+                callback()
+            except Exception as e:
+                self.logger.error(f"Lease '{self.name}' callback failed: {e}")
+
+    def _run(self):
+        while not self.stop_event.wait(self.renew_interval):
+            self._step()
+
+    def get_status(self) -> Dict:
+        session = self.session_factory()
+        try:
+            lease = session.query(Lease).filter_by(name=self.name).first()
+            now = time.time()
+            return {
+                'name': self.name,
+                'owner_id': self.owner_id,
+                'is_leader': self.is_leader,
+                'current_owner': lease.owner if lease and lease.expires_at > now else None,
+                'expires_in': round(lease.expires_at - now, 1) if lease and lease.expires_at > now else None,
+                'ttl': self.ttl
+            }
+        finally:
+            session.close()
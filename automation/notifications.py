@@ -0,0 +1,451 @@
+"""
+Notification Module
+Delivers alerts to webhook, SMTP, syslog and file channels off the alerting path
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from logging.handlers import SysLogHandler
+from typing import Dict, List, Optional
+import json
+import logging
+import os
+import queue
+import random
+import smtplib
+import socket
+import threading
+import time
+import urllib.request
+
+
+SEVERITY_LEVELS = {'low': 0, 'medium': 1, 'high': 2, 'critical': 3}
+
+
+class Notifier:
+    """
+    Base class for a delivery channel
+
+    Subclasses implement send(), which delivers a batch of alerts as one
+    message and raises on failure. Batching, retries and rate limiting are
+    handled by NotificationDispatcher using the settings held here.
+    """
+
+    kind = 'notifier'
+
+    def __init__(self, name: Optional[str] = None, min_severity: str = 'high', batch_size: int = 20,
+                 batch_interval: float = 10.0, rate_limit: float = 6.0, max_retries: int = 5,
+                 max_pending: int = 1000):
+        """
+        Args:
+            name: Channel name shown in stats (defaults to the channel kind)
+            min_severity: Lowest alert severity delivered on this channel
+            batch_size: Alerts digested into one message
+            batch_interval: Seconds to wait for a batch to fill before sending it anyway
+            rate_limit: Messages per minute (a burst of the same size is allowed)
+            max_retries: Delivery attempts after the first before a batch is dropped
+            max_pending: Alerts buffered for the channel; the oldest are dropped beyond it
+        """
+        if min_severity not in SEVERITY_LEVELS:
+            raise ValueError(f"Unknown severity '{min_severity}'")
+        self.name = name or self.kind
+        self.min_level = SEVERITY_LEVELS[min_severity]
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.rate_limit = rate_limit
+        self.max_retries = max_retries
+        self.max_pending = max_pending
+
+    def accepts(self, alert: Dict) -> bool:
+        return SEVERITY_LEVELS.get(alert.get('severity'), 0) >= self.min_level
+
+    def send(self, alerts: List[Dict]):
+        raise NotImplementedError
+
+    @staticmethod
+    def summary(alerts: List[Dict]) -> str:
+        """One-line subject for a digest"""
+        if len(alerts) == 1:
+            alert = alerts[0]
+            return f"[{alert['severity'].upper()}] {alert['type']}: {alert['message']}"
+        worst = max(alerts, key=lambda a: SEVERITY_LEVELS.get(a['severity'], 0))['severity']
+        return f"{len(alerts)} SentraOS alerts (highest severity: {worst})"
+
+
+class WebhookNotifier(Notifier):
+    """POSTs a JSON digest to an HTTP endpoint"""
+
+    kind = 'webhook'
+
+    def __init__(self, url: str, timeout: float = 10.0, headers: Optional[Dict[str, str]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.timeout = timeout
+        self.headers = headers or {}
+
+    def send(self, alerts: List[Dict]):
+        body = json.dumps({
+            'host': socket.gethostname(),
+            'summary': self.summary(alerts),
+            'count': len(alerts),
+            'alerts': alerts
+        }, default=str).encode('utf-8')
+        request = urllib.request.Request(
+            self.url,
+            data=body,
+            headers=dict({'Content-Type': 'application/json'}, **self.headers),
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status >= 300:
+                raise RuntimeError(f"Webhook returned HTTP {response.status}")
+
+
+class SmtpNotifier(Notifier):
+    """Emails a plain-text digest"""
+
+    kind = 'smtp'
+
+    def __init__(self, host: str, sender: str, recipients: List[str], port: int = 25,
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 use_tls: bool = False, timeout: float = 10.0, **kwargs):
+        super().__init__(**kwargs)
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def send(self, alerts: List[Dict]):
+        message = EmailMessage()
+        message['Subject'] = self.summary(alerts)
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        lines = []
+        for alert in alerts:
+            repeated = f" (x{alert['count']})" if alert.get('count', 1) > 1 else ''
+            lines.append(f"{alert['timestamp']}  [{alert['severity'].upper()}] {alert['type']}: {alert['message']}{repeated}")
+        message.set_content('\n'.join(lines) + '\n')
+
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or '')
+            smtp.send_message(message)
+
+
+class SyslogNotifier(Notifier):
+    """Writes one syslog line per alert"""
+
+    kind = 'syslog'
+
+    PRIORITIES = {'low': 'info', 'medium': 'notice', 'high': 'warning', 'critical': 'crit'}
+
+    def __init__(self, address='/dev/log', facility: str = 'daemon', **kwargs):
+        """
+        Args:
+            address: Unix socket path, or (host, port) for UDP syslog
+            facility: Syslog facility name
+        """
+        kwargs.setdefault('batch_size', 100)
+        kwargs.setdefault('batch_interval', 1.0)
+        kwargs.setdefault('rate_limit', 600.0)
+        super().__init__(**kwargs)
+        self.address = address
+        self.facility = SysLogHandler.facility_names[facility]
+        self.handler = None
+
+    def send(self, alerts: List[Dict]):
+        # Connected lazily so a missing syslog daemon only fails deliveries, which are retried
+        if self.handler is None:
+            self.handler = SysLogHandler(address=self.address, facility=self.facility)
+        try:
+            for alert in alerts:
+                priority = self.handler.encodePriority(self.handler.facility, self.PRIORITIES.get(alert['severity'], 'info'))
+                line = f"<{priority}>sentra: [{alert['severity'].upper()}] {alert['type']}: {alert['message']}\000"
+                if self.handler.unixsocket:
+                    self.handler.socket.send(line.encode('utf-8'))
+                else:
+                    self.handler.socket.sendto(line.encode('utf-8'), self.handler.address)
+        except OSError:
+            # The socket may be dead (e.g. syslogd restarted): reconnect on the retry
+            self.handler.close()
+            self.handler = None
+            raise
+
+
+class FileNotifier(Notifier):
+    """Appends alerts as JSON lines to a local file"""
+
+    kind = 'file'
+
+    def __init__(self, path: str, **kwargs):
+        kwargs.setdefault('batch_size', 100)
+        kwargs.setdefault('batch_interval', 1.0)
+        kwargs.setdefault('rate_limit', 600.0)
+        super().__init__(**kwargs)
+        self.path = path
+
+    def send(self, alerts: List[Dict]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for alert in alerts:
+                f.write(json.dumps(alert, default=str) + '\n')
+
+
+class _ChannelState:
+    """Dispatcher-side bookkeeping for one channel"""
+
+    def __init__(self, notifier: Notifier):
+        self.notifier = notifier
+        self.pending: List[Dict] = []
+        self.pending_since = None
+        self.in_flight = False
+        self.attempts = 0
+        self.retry_at = 0.0
+        # Token bucket: refills at rate_limit per minute, holds at most one burst
+        self.capacity = max(notifier.rate_limit, 1.0)
+        self.tokens = self.capacity
+        self.refilled_at = time.monotonic()
+        self.stats = {'sent_messages': 0, 'sent_alerts': 0, 'failed_alerts': 0, 'retries': 0,
+                      'dropped_alerts': 0, 'rate_limited': 0, 'last_error': None}
+
+    def take_token(self, now: float) -> bool:
+        self.tokens = min(self.capacity, self.tokens + (now - self.refilled_at) * self.notifier.rate_limit / 60)
+        self.refilled_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class NotificationDispatcher:
+    """
+    Routes alerts to notifiers without ever blocking the caller
+
+    submit() only enqueues (alerts are dropped and counted when the queue is
+    full). A router thread spreads alerts over per-channel batches and hands
+    ready batches to a worker pool. A channel has at most one batch in flight,
+    so alert order is kept and a slow channel cannot starve the others.
+    Failed batches are retried with exponential backoff and jitter.
+    """
+
+    def __init__(self, notifiers: List[Notifier], max_queue: int = 1000, workers: int = 2,
+                 backoff_base: float = 1.0, backoff_max: float = 300.0, tick: float = 0.25):
+        """
+        Args:
+            notifiers: Delivery channels
+            max_queue: Alerts buffered between submit() and the router
+            workers: Threads performing deliveries
+            backoff_base: Delay before the first retry, doubled per attempt
+            backoff_max: Upper bound on the retry delay
+            tick: Router wake-up interval in seconds
+        """
+        self.channels = [_ChannelState(notifier) for notifier in notifiers]
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.workers = workers
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.tick = tick
+        self.executor = None
+        self.thread = None
+        self.running = False
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.running = True
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='notify')
+        self.thread = threading.Thread(target=self._run, name='notify-router', daemon=True)
+        self.thread.start()
+        self.logger.info(f"Notification dispatcher started ({', '.join(c.notifier.name for c in self.channels) or 'no channels'})")
+
+    def stop(self, timeout: float = 5.0):
+        """Send what is pending (one attempt each) and stop the threads"""
+        if not self.running:
+            return
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=timeout)
+        self._drain()
+        with self.lock:
+            for state in self.channels:
+                if state.pending and not state.in_flight:
+                    batch, state.pending = state.pending, []
+                    state.in_flight = True
+                    self.executor.submit(self._deliver_all, state, batch)
+        self.executor.shutdown(wait=True)
+
+    def submit(self, alert: Dict) -> bool:
+        """Queue an alert for delivery; returns False if it was dropped"""
+        if not self.channels:
+            return False
+        try:
+            self.queue.put_nowait(alert)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+        with self.lock:
+            self.submitted += 1
+        return True
+
+    def _drain(self):
+        """Move queued alerts into channel batches"""
+        while True:
+            try:
+                alert = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            self._route(alert)
+
+    def _route(self, alert: Dict):
+        now = time.monotonic()
+        with self.lock:
+            for state in self.channels:
+                if not state.notifier.accepts(alert):
+                    continue
+                if not state.pending:
+                    state.pending_since = now
+                state.pending.append(alert)
+                overflow = len(state.pending) - state.notifier.max_pending
+                if overflow > 0:
+                    del state.pending[:overflow]
+                    state.stats['dropped_alerts'] += overflow
+
+    def _run(self):
+        while self.running:
+            try:
+                self._route(self.queue.get(timeout=self.tick))
+                self._drain()
+            except queue.Empty:
+                pass
+            except Exception as e:
+                self.logger.error(f"Notification router error: {e}")
+            self._dispatch_ready()
+
+    def _dispatch_ready(self):
+        now = time.monotonic()
+        with self.lock:
+            for state in self.channels:
+                notifier = state.notifier
+                if state.in_flight or not state.pending or now < state.retry_at:
+                    continue
+                full = len(state.pending) >= notifier.batch_size
+                waited = now - state.pending_since >= notifier.batch_interval
+                if not (full or waited or state.attempts):
+                    continue
+                if not state.take_token(now):
+                    # Alerts wait in pending for the next token; each message still
+                    # carries at most batch_size, and past max_pending the oldest are dropped
+                    state.stats['rate_limited'] += 1
+                    continue
+                batch = state.pending[:notifier.batch_size]
+                del state.pending[:notifier.batch_size]
+                state.pending_since = now
+                state.in_flight = True
+                self.executor.submit(self._deliver, state, batch)
+
+    def _deliver(self, state: _ChannelState, batch: List[Dict]):
+        notifier = state.notifier
+        try:
+            notifier.send(batch)
+        except Exception as e:
+            with self.lock:
+                state.attempts += 1
+                state.stats['last_error'] = str(e)
+                # No retries once stopping: nothing would pick the batch up again
+                if state.attempts > notifier.max_retries or not self.running:
+                    state.stats['failed_alerts'] += len(batch)
+                    state.attempts = 0
+                    self.logger.error(f"Giving up on {len(batch)} alerts for {notifier.name}: {e}")
+                else:
+                    state.stats['retries'] += 1
+                    delay = min(self.backoff_base * 2 ** (state.attempts - 1), self.backoff_max)
+                    state.retry_at = time.monotonic() + delay * random.uniform(0.5, 1.0)
+                    state.pending[:0] = batch
+                    self.logger.warning(f"Delivery to {notifier.name} failed (attempt {state.attempts}): {e}")
+                state.in_flight = False
+            return
+
+        with self.lock:
+            state.attempts = 0
+            state.stats['sent_messages'] += 1
+            state.stats['sent_alerts'] += len(batch)
+            state.in_flight = False
+
+    def _deliver_all(self, state: _ChannelState, alerts: List[Dict]):
+        size = state.notifier.batch_size
+        for start in range(0, len(alerts), size):
+            state.in_flight = True
+            self._deliver(state, alerts[start:start + size])
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'running': self.running,
+                'queued': self.queue.qsize(),
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'channels': {
+                    state.notifier.name: dict(
+                        state.stats,
+                        kind=state.notifier.kind,
+                        pending=len(state.pending),
+                        in_flight=state.in_flight
+                    )
+                    for state in self.channels
+                }
+            }
+
+
+def load_notifiers() -> List[Notifier]:
+    """
+    Channels configured through environment variables
+
+    NOTIFY_WEBHOOK_URL, NOTIFY_SMTP_HOST (+ NOTIFY_SMTP_PORT, NOTIFY_SMTP_FROM,
+    NOTIFY_SMTP_TO, NOTIFY_SMTP_USER, NOTIFY_SMTP_PASSWORD, NOTIFY_SMTP_TLS),
+    NOTIFY_SYSLOG_ADDRESS ('/dev/log' or 'host:port') and NOTIFY_FILE_PATH
+    each enable a channel. NOTIFY_<CHANNEL>_MIN_SEVERITY, _BATCH_SIZE,
+    _BATCH_INTERVAL and _RATE_LIMIT tune it.
+    """
+    def options(channel: str) -> Dict:
+        prefix = f'NOTIFY_{channel.upper()}_'
+        settings = {}
+        for key, cast in (('min_severity', str), ('batch_size', int), ('batch_interval', float),
+                          ('rate_limit', float), ('max_retries', int)):
+            value = os.getenv(prefix + key.upper())
+            if value:
+                settings[key] = cast(value)
+        return settings
+
+    notifiers = []
+    if os.getenv('NOTIFY_WEBHOOK_URL'):
+        notifiers.append(WebhookNotifier(os.getenv('NOTIFY_WEBHOOK_URL'), **options('webhook')))
+    if os.getenv('NOTIFY_SMTP_HOST'):
+        notifiers.append(SmtpNotifier(
+            os.getenv('NOTIFY_SMTP_HOST'),
+            sender=os.getenv('NOTIFY_SMTP_FROM', f'sentra@{socket.gethostname()}'),
+            recipients=[r.strip() for r in os.getenv('NOTIFY_SMTP_TO', '').split(',') if r.strip()],
+            port=int(os.getenv('NOTIFY_SMTP_PORT', 25)),
+            username=os.getenv('NOTIFY_SMTP_USER'),
+            password=os.getenv('NOTIFY_SMTP_PASSWORD'),
+            use_tls=os.getenv('NOTIFY_SMTP_TLS', 'false').lower() == 'true',
+            **options('smtp')
+        ))
+    if os.getenv('NOTIFY_SYSLOG_ADDRESS'):
+        address = os.getenv('NOTIFY_SYSLOG_ADDRESS')
+        if ':' in address:
+            host, port = address.rsplit(':', 1)
+            address = (host, int(port))
+        notifiers.append(SyslogNotifier(address, **options('syslog')))
+    if os.getenv('NOTIFY_FILE_PATH'):
+        notifiers.append(FileNotifier(os.getenv('NOTIFY_FILE_PATH'), **options('file')))
+    return notifiers
@@ -0,0 +1,217 @@
+"""
+Retention Module
+Downsamples old metrics and prunes old rows so the database stays bounded
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+from sqlalchemy import func, text
+import logging
+import os
+import time
+
+from models import SystemMetric, ScanResult, Alert, ActivityLog, FlowRecord
+
+
+HOURLY = 3600
+
+# Per-table policies, overridable with RETENTION_<POLICY>_HOURS
+DEFAULT_POLICIES = {
+    # raw samples older than this are rolled up into hourly rows
+    'system_metrics_raw': 48,
+    # hourly rollups
+    'system_metrics_hourly': 24 * 365,
+    'scan_results': 24 * 90,
+    'alerts': 24 * 90,
+    'activity_logs': 24 * 180,
+    'flow_records': 24 * 7,
+}
+
+
+def load_retention_policies() -> Dict[str, int]:
+    """Retention windows in hours, with environment overrides"""
+    return {
+        name: int(os.getenv(f'RETENTION_{name.upper()}_HOURS', hours))
+        for name, hours in DEFAULT_POLICIES.items()
+    }
+
+
+class RetentionManager:
+    """Rolls up and prunes history tables in small transactions"""
+
+    def __init__(self, session_factory: Callable, policies: Optional[Dict[str, int]] = None,
+                 chunk_size: int = 500, pause: float = 0.01, vacuum_pages: int = 1000):
+        """
+        Args:
+            session_factory: Callable returning a new SQLAlchemy session
+            policies: Retention windows in hours (see DEFAULT_POLICIES)
+            chunk_size: Maximum rows deleted per transaction
+            pause: Seconds to yield between transactions so other writers get the lock
+            vacuum_pages: Maximum free pages released per incremental vacuum
+        """
+        self.session_factory = session_factory
+        self.policies = dict(DEFAULT_POLICIES, **(policies or {}))
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self.last_report = None
+        self.logger = logging.getLogger(__name__)
+
+    def run(self) -> Dict:
+        """Apply every policy once and return what was done"""
+        started = time.perf_counter()
+        now = datetime.now()
+        report = {'started_at': now.isoformat(), 'tables': {}}
+
+        report['tables']['system_metrics_raw'] = self._timed(
+            self.rollup_metrics, now - timedelta(hours=self.policies['system_metrics_raw'])
+        )
+        pruned = {
+            'system_metrics_hourly': (SystemMetric, SystemMetric.resolution == HOURLY, None),
+            'scan_results': (ScanResult, None, None),
+            # A folded alert is as recent as its last occurrence, not its first
+            'alerts': (Alert, None, func.coalesce(Alert.last_seen, Alert.timestamp)),
+            'activity_logs': (ActivityLog, None, None),
+            'flow_records': (FlowRecord, None, None),
+        }
+        for name, (model, condition, column) in pruned.items():
+            cutoff = now - timedelta(hours=self.policies[name])
+            report['tables'][name] = self._timed(self.prune, model, cutoff, condition, column)
+
+        report['vacuum'] = self._timed(self.incremental_vacuum)
+        report['duration_seconds'] = round(time.perf_counter() - started, 3)
+        self.last_report = report
+
+        removed = sum(t.get('removed', 0) for t in report['tables'].values())
+        self.logger.info(f"Retention run removed {removed} rows in {report['duration_seconds']}s")
+        return report
+
+    def rollup_metrics(self, cutoff: datetime) -> Dict:
+        """
+        Replace raw metric samples older than the cutoff with hourly rows
+
+        Works one complete hour per transaction: the hour's samples are
+        aggregated per host/user/type into min/max/avg rows and then deleted.
+        """
+        cutoff = cutoff.replace(minute=0, second=0, microsecond=0)
+        aggregated = removed = 0
+
+        while True:
+            session = self.session_factory()
+            try:
+                oldest = session.query(func.min(SystemMetric.timestamp))\
+                    .filter(SystemMetric.resolution == 0, SystemMetric.timestamp < cutoff)\
+                    .scalar()
+                if oldest is None:
+                    break
+
+                hour_start = oldest.replace(minute=0, second=0, microsecond=0)
+                hour_end = hour_start + timedelta(hours=1)
+                in_hour = (
+                    SystemMetric.resolution == 0,
+                    SystemMetric.timestamp >= hour_start,
+                    SystemMetric.timestamp < hour_end
+                )
+
+                groups = session.query(
+                    SystemMetric.host,
+                    SystemMetric.user_id,
+                    SystemMetric.metric_type,
+                    SystemMetric.unit,
+                    func.avg(SystemMetric.value),
+                    func.min(SystemMetric.value),
+                    func.max(SystemMetric.value),
+                    func.count(SystemMetric.id)
+                ).filter(*in_hour).group_by(
+                    SystemMetric.host, SystemMetric.user_id, SystemMetric.metric_type, SystemMetric.unit
+                ).all()
+
+                for host, user_id, metric_type, unit, avg, minimum, maximum, count in groups:
+                    session.add(SystemMetric(
+                        host=host,
+                        user_id=user_id,
+                        metric_type=metric_type,
+                        value=round(avg, 2) if avg is not None else None,
+                        unit=unit,
+                        details={'min': minimum, 'max': maximum, 'avg': avg, 'samples': count},
+                        resolution=HOURLY,
+                        timestamp=hour_start
+                    ))
+
+                removed += session.query(SystemMetric).filter(*in_hour).delete(synchronize_session=False)
+                aggregated += len(groups)
+                session.commit()
+            except Exception as e:
+                self.logger.error(f"Metric rollup error: {e}")
+                session.rollback()
+                break
+            finally:
+                session.close()
+
+            time.sleep(self.pause)
+
+        return {'removed': removed, 'aggregated': aggregated}
+
+    def prune(self, model, cutoff: datetime, condition=None, column=None) -> Dict:
+        """
+        Delete rows older than the cutoff, at most chunk_size per transaction
+
+        Age is read from `column` (the model's timestamp by default).
+        """
+        removed = 0
+        column = model.timestamp if column is None else column
+
+        while True:
+            session = self.session_factory()
+            try:
+                # Rows are appended in time order, so walking ids from the
+                # start finds old rows without needing a timestamp index
+                query = session.query(model.id).filter(column < cutoff)
+                if condition is not None:
+                    query = query.filter(condition)
+                ids = [row[0] for row in query.order_by(model.id).limit(self.chunk_size)]
+                if not ids:
+                    break
+
+                removed += session.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+                session.commit()
+            except Exception as e:
+                self.logger.error(f"Prune error on {model.__tablename__}: {e}")
+                session.rollback()
+                break
+            finally:
+                session.close()
+
+            if len(ids) < self.chunk_size:
+                break
+            time.sleep(self.pause)
+
+        return {'removed': removed}
+
+    def incremental_vacuum(self) -> Dict:
+        """Return free pages to the filesystem if the database allows it"""
+        session = self.session_factory()
+        try:
+            mode = session.execute(text("PRAGMA auto_vacuum")).scalar()
+            free_before = session.execute(text("PRAGMA freelist_count")).scalar()
+            if mode != 2:
+                # auto_vacuum can only be switched on by a full VACUUM, which
+                # locks the whole database; leave that to the operator
+                return {'mode': mode, 'free_pages': free_before, 'released_pages': 0}
+
+            # The pragma frees one page per step; executescript runs it to completion
+            driver_connection = session.connection().connection.driver_connection
+            driver_connection.executescript(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})")
+            free_after = session.execute(text("PRAGMA freelist_count")).scalar()
+            return {'mode': mode, 'free_pages': free_after, 'released_pages': free_before - free_after}
+        except Exception as e:
+            self.logger.error(f"Incremental vacuum error: {e}")
+            return {'error': str(e)}
+        finally:
+            session.close()
+
+    def _timed(self, step, *args) -> Dict:
+        started = time.perf_counter()
+        result = step(*args)
+        result['seconds'] = round(time.perf_counter() - started, 3)
+        return result
@@ -0,0 +1,412 @@
+"""
+Rule Engine Module
+Declarative threshold and trend rules evaluated incrementally over sliding windows
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import json
+import logging
+import operator
+import os
+import re
+import threading
+import time
+
+
+# Values a rule can reference, taken from a SystemMonitor snapshot
+SAMPLE_METRICS = {
+    'cpu': lambda m: m['cpu']['usage_percent'],
+    'memory': lambda m: m['memory']['percent'],
+    'swap': lambda m: m['memory']['swap_percent'],
+    'disk': lambda m: m['disk']['percent'],
+    'disk_free': lambda m: 100 - m['disk']['percent'],
+    'network_send': lambda m: m['network']['send_rate_mbps'],
+    'network_recv': lambda m: m['network']['recv_rate_mbps'],
+}
+
+# Used when no rules file is configured; each condition must hold over its whole window
+DEFAULT_RULES = [
+    {
+        'name': 'cpu_sustained_high',
+        'when': 'cpu avg > 80 for 5m',
+        'severity': 'high',
+        'type': 'performance',
+        'message': 'CPU usage averaged {cpu_avg:.1f}% over the last 5 minutes'
+    },
+    {
+        'name': 'memory_sustained_high',
+        'when': 'memory avg > 85 for 5m',
+        'severity': 'high',
+        'type': 'performance',
+        'message': 'Memory usage averaged {memory_avg:.1f}% over the last 5 minutes'
+    },
+    {
+        'name': 'memory_leak',
+        'when': 'memory slope > 2%/min for 10m',
+        'severity': 'medium',
+        'type': 'performance',
+        'message': 'Memory usage climbing {memory_slope:.2f}%/min for 10 minutes'
+    },
+    {
+        'name': 'disk_filling',
+        'when': 'disk_free last < 10% and disk_free falling for 30m',
+        'severity': 'high',
+        'type': 'performance',
+        'message': 'Disk free space at {disk_free_last:.1f}% and falling'
+    },
+]
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+}
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600}
+
+_CLAUSE = re.compile(
+    r'^(?P<metric>[a-z_][a-z0-9_]*)\s+'
+    r'(?:(?P<trend>falling|rising)|'
+    r'(?:(?P<aggregate>avg|min|max|last|slope)\s+)?(?P<op>>=|<=|>|<)\s*(?P<threshold>-?\d+(?:\.\d+)?)\s*(?:%/min|%)?)$'
+)
+_WINDOW = re.compile(r'\s+for\s+(?P<amount>\d+(?:\.\d+)?)\s*(?P<unit>[smh])\s*$')
+
+DEFAULT_WINDOW = 60
+
+
+class SlidingWindow:
+    """
+    Samples of one metric over the last `duration` seconds
+
+    Sum, min/max (monotonic deques) and least-squares sums for the slope are
+    maintained as samples enter and expire, so adding a sample is amortized
+    O(1) and reading any aggregate is O(1).
+    """
+
+    def __init__(self, duration: float):
+        self.duration = duration
+        self.samples = deque()      # (timestamp, value), oldest on the left
+        self.min_candidates = deque()
+        self.max_candidates = deque()
+        self.first_timestamp = None
+        self._reset_sums(0.0)
+
+    def _reset_sums(self, origin: float):
+        # Timestamps are taken relative to `origin` to keep the squares small
+        self.origin = origin
+        self.sum_t = self.sum_v = self.sum_tt = self.sum_tv = 0.0
+        self.rebase_in = 64
+
+    def add(self, timestamp: float, value: float):
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+            self._reset_sums(timestamp)
+
+        self.samples.append((timestamp, value))
+        t = timestamp - self.origin
+        self.sum_t += t
+        self.sum_v += value
+        self.sum_tt += t * t
+        self.sum_tv += t * value
+
+        while self.min_candidates and self.min_candidates[-1][1] >= value:
+            self.min_candidates.pop()
+        self.min_candidates.append((timestamp, value))
+        while self.max_candidates and self.max_candidates[-1][1] <= value:
+            self.max_candidates.pop()
+        self.max_candidates.append((timestamp, value))
+
+        cutoff = timestamp - self.duration
+        while self.samples[0][0] < cutoff:
+            old_timestamp, old_value = self.samples.popleft()
+            t = old_timestamp - self.origin
+            self.sum_t -= t
+            self.sum_v -= old_value
+            self.sum_tt -= t * t
+            self.sum_tv -= t * old_value
+            self.rebase_in -= 1
+        while self.min_candidates[0][0] < cutoff:
+            self.min_candidates.popleft()
+        while self.max_candidates[0][0] < cutoff:
+            self.max_candidates.popleft()
+
+        # Subtracting expired samples slowly accumulates rounding error;
+        # recomputing once per window's worth of evictions keeps it amortized O(1)
+        if self.rebase_in <= 0:
+            self._rebase()
+
+    def _rebase(self):
+        self._reset_sums(self.samples[0][0])
+        self.rebase_in = max(len(self.samples), 64)
+        for timestamp, value in self.samples:
+            t = timestamp - self.origin
+            self.sum_t += t
+            self.sum_v += value
+            self.sum_tt += t * t
+            self.sum_tv += t * value
+
+    def is_full(self) -> bool:
+        """True once samples have been seen for at least the whole window"""
+        return bool(self.samples) and self.samples[-1][0] - self.first_timestamp >= self.duration
+
+    def value(self, aggregate: str) -> Optional[float]:
+        if not self.samples:
+            return None
+        if aggregate == 'avg':
+            return self.sum_v / len(self.samples)
+        if aggregate == 'min':
+            return self.min_candidates[0][1]
+        if aggregate == 'max':
+            return self.max_candidates[0][1]
+        if aggregate == 'last':
+            return self.samples[-1][1]
+        if aggregate == 'slope':
+            # Least-squares slope, in units per minute
+            n = len(self.samples)
+            denominator = n * self.sum_tt - self.sum_t * self.sum_t
+            if n < 2 or denominator <= 0:
+                return 0.0
+            return (n * self.sum_tv - self.sum_t * self.sum_v) / denominator * 60
+        raise ValueError(f"Unknown aggregate: {aggregate}")
+
+
+class Rule:
+    """One parsed rule: clauses joined by 'and', evaluated over a shared window length"""
+
+    def __init__(self, name: str, when: str, severity: str = 'medium', alert_type: str = 'performance',
+                 message: Optional[str] = None, repeat_seconds: Optional[float] = None):
+        """
+        Args:
+            name: Unique rule name
+            when: Condition, e.g. "cpu avg > 80 for 5m" or
+                "disk_free last < 10% and disk_free falling for 30m"
+            severity: Severity of the alert raised when the rule fires
+            alert_type: Type of the alert raised
+            message: Alert message; may reference values as {<metric>_<aggregate>}
+            repeat_seconds: Re-raise the alert this often while the condition
+                holds (None = only when it starts holding)
+        """
+        self.name = name
+        self.when = when
+        self.severity = severity
+        self.alert_type = alert_type
+        self.message = message
+        self.repeat_seconds = repeat_seconds
+        self.window, self.clauses = self._parse(when)
+        self.active = False
+        self.last_fired = None
+        self.last_values: Dict[str, float] = {}
+
+    @staticmethod
+    def _parse(when: str) -> Tuple[float, List[Tuple[str, str, Callable, float, str]]]:
+        expression = ' '.join(when.lower().split())
+        window = DEFAULT_WINDOW
+        match = _WINDOW.search(expression)
+        if match:
+            window = float(match.group('amount')) * DURATION_UNITS[match.group('unit')]
+            expression = expression[:match.start()]
+
+        clauses = []
+        for part in expression.split(' and '):
+            match = _CLAUSE.match(part.strip())
+            if not match:
+                raise ValueError(f"Cannot parse condition {part.strip()!r}")
+            metric = match.group('metric')
+            if metric not in SAMPLE_METRICS:
+                raise ValueError(f"Unknown metric {metric!r} (expected one of: {', '.join(SAMPLE_METRICS)})")
+            if match.group('trend'):
+                compare = operator.lt if match.group('trend') == 'falling' else operator.gt
+                clauses.append((metric, 'slope', compare, 0.0, f'{metric}_slope'))
+            else:
+                aggregate = match.group('aggregate') or 'last'
+                clauses.append((
+                    metric,
+                    aggregate,
+                    OPERATORS[match.group('op')],
+                    float(match.group('threshold')),
+                    f'{metric}_{aggregate}'
+                ))
+        return window, clauses
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'Rule':
+        if 'name' not in config or 'when' not in config:
+            raise ValueError(f"Rule needs 'name' and 'when': {config}")
+        return cls(
+            config['name'],
+            config['when'],
+            severity=config.get('severity', 'medium'),
+            alert_type=config.get('type', 'performance'),
+            message=config.get('message'),
+            repeat_seconds=config.get('repeat_seconds')
+        )
+
+    def metrics(self) -> List[str]:
+        return sorted({clause[0] for clause in self.clauses})
+
+    def evaluate(self, windows: Dict[Tuple[str, float], SlidingWindow]) -> bool:
+        """True if every clause holds and every window involved is full"""
+        values = {}
+        holds = True
+        for metric, aggregate, compare, threshold, key in self.clauses:
+            window = windows[(metric, self.window)]
+            value = window.value(aggregate)
+            values[key] = value
+            if value is None or not window.is_full() or not compare(value, threshold):
+                holds = False
+        self.last_values = values
+        return holds
+
+    def format_message(self) -> str:
+        if self.message:
+            try:
+                return self.message.format(**self.last_values)
+            except (KeyError, ValueError, TypeError):
+                pass
+        shown = ', '.join(f"{key}={value:.2f}" for key, value in self.last_values.items() if value is not None)
+        return f"Rule {self.name} triggered ({self.when}): {shown}"
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'when': self.when,
+            'severity': self.severity,
+            'type': self.alert_type,
+            'window_seconds': self.window,
+            'active': self.active,
+            'last_fired': datetime.fromtimestamp(self.last_fired).isoformat() if self.last_fired else None,
+            'values': {key: round(value, 4) if value is not None else None for key, value in self.last_values.items()}
+        }
+
+
+class RuleEngine:
+    """
+    Evaluates rules against every metrics sample
+
+    Rules that use the same metric and window length share one
+    SlidingWindow, so the per-sample cost is one window update per
+    distinct (metric, window) plus a few comparisons per rule. The rules
+    file (JSON list of rule objects) is re-read when its mtime changes.
+    """
+
+    def __init__(self, on_alert: Callable[[Rule], None], rules_path: Optional[str] = None,
+                 reload_interval: float = 5.0):
+        """
+        Args:
+            on_alert: Called with the Rule when a rule starts holding (and on repeats)
+            rules_path: JSON rules file; DEFAULT_RULES are used when None or missing
+            reload_interval: Minimum seconds between checks of the file's mtime
+        """
+        self.on_alert = on_alert
+        self.rules_path = rules_path
+        self.reload_interval = reload_interval
+        self.rules: List[Rule] = []
+        self.windows: Dict[Tuple[str, float], SlidingWindow] = {}
+        self.lock = threading.Lock()
+        self.loaded_mtime = None
+        self.next_reload_check = 0.0
+        self.last_error = None
+        self.logger = logging.getLogger(__name__)
+
+        self.reload()
+
+    def _read_config(self) -> List[Dict]:
+        if self.rules_path and os.path.exists(self.rules_path):
+            with open(self.rules_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            return config.get('rules', []) if isinstance(config, dict) else config
+        return DEFAULT_RULES
+
+    def reload(self) -> bool:
+        """
+        Re-read the rules; on any error the current rules stay in place
+
+        Window contents and per-rule state carry over for rules whose
+        condition did not change.
+        """
+        try:
+            mtime = os.path.getmtime(self.rules_path) if self.rules_path and os.path.exists(self.rules_path) else None
+            rules = [Rule.from_config(config) for config in self._read_config()]
+            names = [rule.name for rule in rules]
+            if len(names) != len(set(names)):
+                raise ValueError("Rule names must be unique")
+        except Exception as e:
+            self.last_error = str(e)
+            self.logger.error(f"Failed to load alert rules from {self.rules_path}: {e}")
+            return False
+
+        with self.lock:
+            previous = {rule.name: rule for rule in self.rules}
+            for rule in rules:
+                old = previous.get(rule.name)
+                if old and old.when == rule.when:
+                    rule.active, rule.last_fired, rule.last_values = old.active, old.last_fired, old.last_values
+
+            windows = {}
+            for rule in rules:
+                for metric in rule.metrics():
+                    key = (metric, rule.window)
+                    windows[key] = self.windows.get(key) or SlidingWindow(rule.window)
+
+            self.rules = rules
+            self.windows = windows
+            self.loaded_mtime = mtime
+            self.last_error = None
+
+        self.logger.info(f"Loaded {len(rules)} alert rules ({len(windows)} sliding windows)")
+        return True
+
+    def _check_reload(self, now: float):
+        if not self.rules_path or now < self.next_reload_check:
+            return
+        self.next_reload_check = now + self.reload_interval
+        try:
+            mtime = os.path.getmtime(self.rules_path)
+        except OSError:
+            mtime = None
+        if mtime != self.loaded_mtime:
+            self.reload()
+
+    def observe_sample(self, metrics: Dict, timestamp: Optional[float] = None):
+        """Feed one SystemMonitor snapshot and evaluate every rule"""
+        timestamp = time.time() if timestamp is None else timestamp
+        self._check_reload(timestamp)
+
+        fired = []
+        with self.lock:
+            values = {}
+            for (metric, _), window in self.windows.items():
+                if metric not in values:
+                    try:
+                        values[metric] = float(SAMPLE_METRICS[metric](metrics))
+                    except (KeyError, TypeError, ValueError):
+                        values[metric] = None
+                if values[metric] is not None:
+                    window.add(timestamp, values[metric])
+
+            for rule in self.rules:
+                holds = rule.evaluate(self.windows)
+                if holds and (not rule.active or (
+                        rule.repeat_seconds and timestamp - rule.last_fired >= rule.repeat_seconds)):
+                    rule.last_fired = timestamp
+                    fired.append(rule)
+                rule.active = holds
+
+        # Outside the lock: the callback may do arbitrary work
+        for rule in fired:
+            try:
+                self.on_alert(rule)
+            except Exception as e:
+                self.logger.error(f"Alert callback failed for rule {rule.name}: {e}")
+
+    def get_status(self) -> Dict:
+        with self.lock:
+            return {
+                'rules_path': self.rules_path,
+                'last_error': self.last_error,
+                'windows': len(self.windows),
+                'rules': [rule.to_dict() for rule in self.rules]
+            }
@@ -0,0 +1,140 @@
+"""
+Alert store micro-benchmark
+AlertStore against the list buffer AutoResponder used before it, at 100k alerts
+
+The list baseline reproduces the old behaviour: new alerts inserted at
+index 0, the list sliced back to size on overflow, acknowledge by linear
+scan and filters applied by copying the whole buffer.
+
+    python benchmarks/alert_store.py
+    python benchmarks/alert_store.py --alerts 100000 --overflow 20000 --repeat 3
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automation.alert_store import AlertStore  # noqa: E402
+
+SEVERITIES = ('low', 'medium', 'high', 'critical')
+TYPES = ('port_scan', 'ddos', 'high_cpu', 'high_memory', 'ssh_bruteforce')
+
+
+class ListBuffer:
+    """Alert buffer as AutoResponder kept it: a list, newest first"""
+
+    def __init__(self, max_alerts: int):
+        self.max_alerts = max_alerts
+        self.alerts = []
+        self.next_id = 1
+
+    def record(self, alert_type, severity, message, details, fingerprint, suppression_window):
+        alert = {'id': self.next_id, 'type': alert_type, 'severity': severity, 'message': message,
+                 'details': details, 'timestamp': '', 'acknowledged': False}
+        self.next_id += 1
+        self.alerts.insert(0, alert)
+        if len(self.alerts) > self.max_alerts:
+            self.alerts = self.alerts[:self.max_alerts]
+        return alert, True
+
+    def acknowledge(self, alert_id):
+        for alert in self.alerts:
+            if alert['id'] == alert_id:
+                alert['acknowledged'] = True
+                return True
+        return False
+
+    def query(self, limit=50, severity=None, alert_type=None, acknowledged=None):
+        alerts = [a for a in self.alerts
+                  if (severity is None or a['severity'] == severity)
+                  and (alert_type is None or a['type'] == alert_type)
+                  and (acknowledged is None or a['acknowledged'] == acknowledged)]
+        return alerts[:limit]
+
+
+def timed(operation, count):
+    started = time.perf_counter()
+    operation()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def run(store, args, seed):
+    """Microseconds per operation for each workload"""
+    rng = random.Random(seed)
+    total = args.alerts + args.overflow
+    events = [(rng.choice(TYPES), rng.choice(SEVERITIES)) for _ in range(total)]
+    results = {}
+
+    def fill():
+        for index in range(args.alerts):
+            alert_type, severity = events[index]
+            store.record(alert_type, severity, f'alert {index}', {}, f'fp-{index}', 0)
+
+    def overflow():
+        for index in range(args.alerts, total):
+            alert_type, severity = events[index]
+            store.record(alert_type, severity, f'alert {index}', {}, f'fp-{index}', 0)
+
+    # Ids still in the buffer after the overflow, spread over its whole age range
+    buffered = range(total - args.alerts + 1, total + 1)
+    ack_ids = [rng.choice(buffered) for _ in range(args.acks)]
+
+    def acknowledge():
+        for alert_id in ack_ids:
+            store.acknowledge(alert_id)
+
+    queries = [
+        ('query newest', {}),
+        ('query severity', {'severity': 'critical'}),
+        ('query type', {'alert_type': 'ddos'}),
+        ('query unacknowledged', {'acknowledged': False}),
+    ]
+
+    results['record (filling)'] = timed(fill, args.alerts)
+    results['record (evicting)'] = timed(overflow, args.overflow)
+    results['acknowledge'] = timed(acknowledge, args.acks)
+    for name, filters in queries:
+        results[name] = timed(lambda: [store.query(limit=50, **filters) for _ in range(args.queries)], args.queries)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--alerts', type=int, default=100000, help='buffer capacity (and alerts to fill it)')
+    parser.add_argument('--overflow', type=int, default=10000, help='alerts recorded past capacity')
+    parser.add_argument('--acks', type=int, default=2000, help='acknowledge calls')
+    parser.add_argument('--queries', type=int, default=200, help='calls per query workload')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per store; the best is reported')
+    parser.add_argument('--skip-baseline', action='store_true', help='only benchmark AlertStore')
+    args = parser.parse_args()
+
+    stores = [('AlertStore', AlertStore)]
+    if not args.skip_baseline:
+        stores.append(('list', ListBuffer))
+
+    best = {}
+    for name, factory in stores:
+        for attempt in range(args.repeat):
+            results = run(factory(args.alerts), args, seed=attempt)
+            for workload, micros in results.items():
+                key = (name, workload)
+                best[key] = min(best.get(key, micros), micros)
+
+    print(f"{args.alerts} alerts buffered, {args.overflow} evicting records, "
+          f"{args.acks} acknowledges, {args.queries} calls per query (us per operation)")
+    names = [name for name, _ in stores]
+    print(f"{'workload':<22}" + ''.join(f"{name:>14}" for name in names) + (f"{'speedup':>10}" if len(names) > 1 else ''))
+    for workload in [workload for name, workload in best if name == 'AlertStore']:
+        row = [best[(name, workload)] for name in names]
+        line = f"{workload:<22}" + ''.join(f"{micros:>14.2f}" for micros in row)
+        if len(row) > 1:
+            line += f"{row[1] / row[0]:>9.0f}x"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
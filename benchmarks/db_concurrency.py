@@ -0,0 +1,140 @@
+"""
+SQLite concurrency benchmark
+Dashboard reads against scheduler writes, once per storage profile (DB_PROFILE)
+
+Each profile runs in its own interpreter on a fresh database: writer
+processes insert metric batches the way the scheduler jobs do, while
+reader threads run the /api/metrics/history and /api/stats queries and
+time them.
+
+    python benchmarks/db_concurrency.py
+    python benchmarks/db_concurrency.py --profiles default wal --duration 10 --readers 8
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def writer(stop_at, batch, pause, written):
+    """One scheduler-like writer: a transaction of `batch` metric rows, then a short pause"""
+    from models import get_session, SystemMetric
+
+    while time.time() < stop_at:
+        session = get_session()
+        try:
+            for index in range(batch):
+                session.add(SystemMetric(metric_type='cpu', value=float(index), unit='percent', details={}))
+            session.commit()
+            with written.get_lock():
+                written.value += batch
+        finally:
+            session.close()
+        time.sleep(pause)
+
+
+def reader(stop_at, latencies):
+    from models import get_session, SystemMetric, ScanResult
+
+    while time.time() < stop_at:
+        started = time.perf_counter()
+        session = get_session()
+        try:
+            session.query(SystemMetric).filter_by(metric_type='cpu').filter(SystemMetric.visible_to(1)) \
+                .order_by(SystemMetric.timestamp.desc()).limit(20).all()
+            session.query(ScanResult).filter_by(user_id=1).count()
+        finally:
+            session.close()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+def run_profile(args):
+    """Child side: benchmark the profile named in DB_PROFILE and print one JSON line"""
+    sys.path.insert(0, ROOT)
+    from models import get_session, get_storage_settings, SystemMetric
+
+    session = get_session()
+    try:
+        session.bulk_save_objects([
+            SystemMetric(metric_type='cpu', value=float(index), unit='percent', details={})
+            for index in range(args.seed_rows)
+        ])
+        session.commit()
+    finally:
+        session.close()
+
+    # Spawned writers import models with the same DATABASE_PATH / DB_PROFILE environment
+    context = multiprocessing.get_context('spawn')
+    written = context.Value('q', 0)
+    stop_at = time.time() + args.duration
+    processes = [
+        context.Process(target=writer, args=(stop_at, args.batch, args.pause, written))
+        for _ in range(args.writers)
+    ]
+    latencies = []
+    threads = [threading.Thread(target=reader, args=(stop_at, latencies)) for _ in range(args.readers)]
+    for worker in processes + threads:
+        worker.start()
+    for worker in processes + threads:
+        worker.join()
+
+    latencies.sort()
+    settings = get_storage_settings()
+    print(json.dumps({
+        'profile': settings['profile'],
+        'journal_mode': settings['pragmas']['journal_mode'],
+        'reads': len(latencies),
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'max': latencies[-1],
+        'rows_written': written.value
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--profiles', nargs='+', default=['default', 'wal'])
+    parser.add_argument('--duration', type=float, default=8.0, help='seconds per profile')
+    parser.add_argument('--readers', type=int, default=4, help='dashboard reader threads')
+    parser.add_argument('--writers', type=int, default=2, help='writer processes')
+    parser.add_argument('--batch', type=int, default=200, help='rows per write transaction')
+    parser.add_argument('--pause', type=float, default=0.01, help='seconds between write transactions')
+    parser.add_argument('--seed-rows', type=int, default=20000, help='metric rows inserted before timing')
+    parser.add_argument('--run-profile', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_profile:
+        run_profile(args)
+        return
+
+    print(f"{args.readers} reader threads, {args.writers} writer processes "
+          f"({args.batch} rows per transaction), {args.duration:g}s per profile")
+    print(f"{'profile':<10} {'journal':<8} {'reads':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'rows/s':>8}")
+    for profile in args.profiles:
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, DB_PROFILE=profile, DATABASE_PATH=os.path.join(directory, 'bench.db'))
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run-profile'] + sys.argv[1:],
+                env=env, cwd=ROOT, check=True, capture_output=True, text=True
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{result['profile']:<10} {result['journal_mode']:<8} {result['reads']:>7} "
+              f"{result['p50']:>8.2f} {result['p95']:>8.2f} {result['p99']:>8.2f} {result['max']:>8.2f} "
+              f"{result['rows_written'] / args.duration:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
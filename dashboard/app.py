@@ -3,11 +3,14 @@ SentraOS Dashboard - Updated with Authentication & Packet Analyzer
 Main Flask application with login/registration system and packet capture
 """
 
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for, flash
+from flask import Flask, render_template, jsonify, request, session, redirect, url_for, flash, send_from_directory, abort, make_response
 from flask_cors import CORS
 from datetime import datetime
+from functools import partial
+import atexit
 import sys
 import os
+import tempfile
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
@@ -15,21 +18,52 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from network_monitor.monitor import SystemMonitor
 from security_scanner.scanner import SecurityScanner
 from automation.auto_responder import AutoResponder
+from automation.alert_persistence import AlertPersistence
+from automation.rules import RuleEngine
+from automation.anomaly import AnomalyDetector
+from automation.notifications import NotificationDispatcher, load_notifiers
+from automation.leader import LeaderElection
+from automation.ipc import IPCServer, IPCClient, IPCError
+from automation.retention import RetentionManager, load_retention_policies
 from packet_analyzer.analyzer import PacketAnalyzer
+from packet_analyzer.flows import describe_flow
 from network_topology.simulator import NetworkTopologySimulator
 from cloud_monitor.monitor import CloudServicesMonitor
 from gns3_monitor.monitor import GNS3Monitor
-from models import get_session, SystemMetric, ScanResult, Alert, PacketCapture, log_activity, User
+from models import get_session, SystemMetric, ScanResult, Alert, PacketCapture, ActivityLog, FlowRecord, log_activity, store_flow_records, User, HOST_NAME, db_writer, get_storage_settings
 from dashboard.auth import login_required, authenticate_user, register_user, logout_user, get_current_user
+from dashboard.pagination import encode_cursor, decode_cursor, keyset_page, paginated_response, stream_export
 
 app = Flask(__name__)
 CORS(app)
 app.config['SECRET_KEY'] = os.environ.get('SESSION_SECRET', 'sentra-dev-secret-key-change-in-production')
 
+# Process role: 'all' serves HTTP and runs the collectors, 'web' only serves
+# HTTP and asks the worker over IPC, 'worker' only runs the collectors
+SENTRA_ROLE = os.getenv('SENTRA_ROLE', 'all')
+if SENTRA_ROLE not in ('all', 'web', 'worker'):
+    raise ValueError(f"Unknown SENTRA_ROLE '{SENTRA_ROLE}' (expected all, web or worker)")
+IPC_SOCKET_PATH = os.getenv('SENTRA_IPC_SOCKET', os.path.join(tempfile.gettempdir(), 'sentra-worker.sock'))
+worker_client = IPCClient(IPC_SOCKET_PATH, timeout=float(os.getenv('SENTRA_IPC_TIMEOUT', 2))) if SENTRA_ROLE == 'web' else None
+
 # Initialize modules
-system_monitor = SystemMonitor()
+system_monitor = SystemMonitor(sample_interval=float(os.getenv('METRICS_SAMPLE_INTERVAL', 2)))
 security_scanner = SecurityScanner()
-auto_responder = AutoResponder()
+notification_dispatcher = NotificationDispatcher(
+    load_notifiers(),
+    max_queue=int(os.getenv('NOTIFY_QUEUE_SIZE', 1000)),
+    workers=int(os.getenv('NOTIFY_WORKERS', 2))
+)
+auto_responder = AutoResponder(
+    suppression_window=int(os.getenv('ALERT_SUPPRESSION_WINDOW', 300)),
+    persistence=AlertPersistence(db_writer, get_session),
+    notifier=notification_dispatcher
+)
+retention_manager = RetentionManager(
+    get_session,
+    policies=load_retention_policies(),
+    chunk_size=int(os.getenv('RETENTION_CHUNK_SIZE', 500))
+)
 packet_analyzer = PacketAnalyzer()  # تهيئة محلل الباكتات
 network_simulator = NetworkTopologySimulator()
 cloud_monitor = CloudServicesMonitor()
@@ -384,37 +418,141 @@ def packets_page():
 def get_current_metrics():
     """Get current system metrics - للمستخدم الحالي فقط"""
     try:
-        metrics = system_monitor.get_all_metrics()
+        metrics = collector('metrics')
         return jsonify(metrics)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def _serialize_metric(m):
+    return {
+        'id': m.id,
+        'timestamp': m.timestamp.isoformat(),
+        'value': m.value,
+        'unit': m.unit,
+        'resolution': m.resolution,
+        'details': m.details
+    }
+
+
+def _serialize_scan(s):
+    return {
+        'id': s.id,
+        'target': s.target,
+        'scan_type': s.scan_type,
+        'status': s.status,
+        'open_ports': s.open_ports,
+        'vulnerabilities': s.vulnerabilities,
+        'risk_level': s.risk_level,
+        'timestamp': s.timestamp.isoformat()
+    }
+
+
+def _serialize_capture(c):
+    return {
+        'id': c.id,
+        'interface': c.interface,
+        'start_time': c.start_time.isoformat(),
+        'end_time': c.end_time.isoformat() if c.end_time else None,
+        'total_packets': c.total_packets,
+        'total_bytes': c.total_bytes,
+        'status': c.status,
+        'suspicious_count': len(c.suspicious_activities) if c.suspicious_activities else 0
+    }
+
+
+def _serialize_activity(a):
+    return {
+        'id': a.id,
+        'action': a.action,
+        'description': a.description,
+        'ip_address': a.ip_address,
+        'timestamp': a.timestamp.isoformat()
+    }
+
+
+def _serialize_flow(f):
+    return {
+        'id': f.id,
+        'capture_id': f.capture_id,
+        **describe_flow({
+            'first_seen': f.first_seen.timestamp(),
+            'last_seen': f.last_seen.timestamp(),
+            'protocol': f.protocol,
+            'src_ip': f.src_ip,
+            'src_port': f.src_port,
+            'dst_ip': f.dst_ip,
+            'dst_port': f.dst_port,
+            'packets': f.packets,
+            'bytes': f.bytes,
+            'rev_packets': f.rev_packets,
+            'rev_bytes': f.rev_bytes,
+            'tcp_flags': f.tcp_flags,
+            'state': f.state,
+            'end_reason': f.end_reason
+        })
+    }
+
+
+def _page_cursor():
+    """
+    Decoded ?cursor= key for keyset pagination (None on the first page)
+    
+    A malformed cursor ends the request with 400, so call it before the
+    route's catch-all try block.
+    """
+    cursor = request.args.get('cursor')
+    try:
+        return decode_cursor(cursor) if cursor else None
+    except ValueError:
+        abort(make_response(jsonify({'error': 'Invalid cursor'}), 400))
+
+
 @app.route('/api/metrics/history')
 @login_required
 def get_metrics_history():
-    """Get historical metrics data - للمستخدم الحالي فقط"""
+    """
+    Get historical metrics data - من الذاكرة أولاً، و SQLite للفترات الأقدم فقط
+    
+    Pass the X-Next-Cursor response header back as ?cursor= for older pages.
+    """
+    after = _page_cursor()
     db_session = None
     try:
         metric_type = request.args.get('type', 'cpu')
         limit = int(request.args.get('limit', 20))
+        resolution = request.args.get('resolution', type=int)
+        start = request.args.get('start')
+        start_ts = datetime.fromisoformat(start).timestamp() if start else None
         user_id = session['user_id']
         
-        db_session = get_session()
-        metrics = db_session.query(SystemMetric)\
-            .filter_by(metric_type=metric_type, user_id=user_id)\
-            .order_by(SystemMetric.timestamp.desc())\
-            .limit(limit)\
-            .all()
+        data = []
+        next_cursor = None
+        if after is None:
+            # Recent history comes from the in-memory time-series store
+            data = collector('metrics_history', name=metric_type, start=start_ts, limit=limit, resolution=resolution)
+            if data:
+                # Older pages continue in SQLite from the oldest point returned
+                after = (datetime.fromisoformat(data[0]['timestamp']), 0)
         
-        data = [{
-            'timestamp': m.timestamp.isoformat(),
-            'value': m.value,
-            'unit': m.unit,
-            'details': m.details
-        } for m in reversed(metrics)]
+        # SQLite can only hold matching rows older than `after` if the window starts before it
+        older_rows = after is None or start_ts is None or start_ts < after[0].timestamp()
+        if older_rows and after is not None:
+            next_cursor = encode_cursor(*after)
         
-        return jsonify(data)
+        # Fall back to SQLite only for the part older than what the store returned
+        if len(data) < limit and older_rows:
+            db_session = get_session()
+            query = db_session.query(SystemMetric)\
+                .filter_by(metric_type=metric_type)\
+                .filter(SystemMetric.visible_to(user_id))
+            if start_ts is not None:
+                query = query.filter(SystemMetric.timestamp >= datetime.fromtimestamp(start_ts))
+            metrics, next_cursor = keyset_page(query, SystemMetric.timestamp, SystemMetric.id, limit - len(data), after)
+            
+            data = [_serialize_metric(m) for m in reversed(metrics)] + data
+        
+        return paginated_response(jsonify(data), next_cursor)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
@@ -474,31 +612,22 @@ def run_security_scan():
 @app.route('/api/security/scans')
 @login_required
 def get_scan_history():
-    """Get scan history - للمستخدم الحالي فقط"""
+    """Get scan history - للمستخدم الحالي فقط (keyset pagination via ?cursor=)"""
+    after = _page_cursor()
     db_session = None
     try:
         limit = int(request.args.get('limit', 10))
         user_id = session['user_id']
         
         db_session = get_session()
-        scans = db_session.query(ScanResult)\
-            .filter_by(user_id=user_id)\
-            .order_by(ScanResult.timestamp.desc())\
-            .limit(limit)\
-            .all()
+        scans, next_cursor = keyset_page(
+            db_session.query(ScanResult).filter_by(user_id=user_id),
+            ScanResult.timestamp, ScanResult.id, limit, after
+        )
         
-        data = [{
-            'id': s.id,
-            'target': s.target,
-            'scan_type': s.scan_type,
-            'status': s.status,
-            'open_ports': s.open_ports,
-            'vulnerabilities': s.vulnerabilities,
-            'risk_level': s.risk_level,
-            'timestamp': s.timestamp.isoformat()
-        } for s in scans]
+        data = [_serialize_scan(s) for s in scans]
         
-        return jsonify(data)
+        return paginated_response(jsonify(data), next_cursor)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
@@ -509,13 +638,25 @@ def get_scan_history():
 @app.route('/api/alerts')
 @login_required
 def get_alerts():
-    """Get recent alerts - للمستخدم الحالي فقط"""
+    """Get recent alerts - فلترة حسب severity / type / acknowledged / since / until"""
     try:
         limit = int(request.args.get('limit', 20))
         severity = request.args.get('severity')
+        alert_type = request.args.get('type')
+        acknowledged = request.args.get('acknowledged')
+        since = request.args.get('since')
+        until = request.args.get('until')
         
-        # Get alerts from auto_responder (in-memory)
-        alerts = auto_responder.get_alerts(limit, severity)
+        # Recent alerts from the collector's memory, older ones from the alerts table
+        alerts = collector(
+            'alerts',
+            limit=limit,
+            severity=severity,
+            alert_type=alert_type,
+            acknowledged=acknowledged.lower() == 'true' if acknowledged else None,
+            since=since,
+            until=until
+        )
         
         return jsonify(alerts)
     except Exception as e:
@@ -527,7 +668,7 @@ def get_alerts():
 def acknowledge_alert(alert_id):
     """Acknowledge an alert"""
     try:
-        success = auto_responder.acknowledge_alert(alert_id)
+        success = collector('acknowledge_alert', alert_id=alert_id)
         return jsonify({'success': success})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -544,6 +685,82 @@ def get_network_connections():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/storage/stats')
+@login_required
+def get_storage_stats():
+    """Database storage profile and write-behind queue counters"""
+    try:
+        return jsonify({
+            'storage': get_storage_settings(),
+            'write_behind': db_writer.get_stats(),
+            'retention': collector('retention')
+        })
+    except IPCError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/automation/rules')
+@login_required
+def get_alert_rules():
+    """Loaded alert rules with their live window values"""
+    try:
+        return jsonify(collector('rules'))
+    except IPCError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/automation/anomalies')
+@login_required
+def get_anomaly_baselines():
+    """Per-series anomaly baselines and latest z-scores"""
+    try:
+        return jsonify(collector('anomalies'))
+    except IPCError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/automation/notifications')
+@login_required
+def get_notification_stats():
+    """Delivery counters per notification channel"""
+    try:
+        return jsonify(collector('notifications'))
+    except IPCError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/automation/jobs')
+@login_required
+def get_automation_jobs():
+    """Scheduled jobs with run counts, durations, overruns and misfires"""
+    try:
+        return jsonify(collector('jobs'))
+    except IPCError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/automation/leader')
+@login_required
+def get_scheduler_leader():
+    """Which process currently owns the scheduler"""
+    try:
+        return jsonify(collector('leader'))
+    except IPCError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/stats')
 @login_required
 def get_dashboard_stats():
@@ -554,7 +771,10 @@ def get_dashboard_stats():
         db_session = get_session()
         
         total_scans = db_session.query(ScanResult).filter_by(user_id=user_id).count()
-        critical_alerts = db_session.query(Alert).filter_by(user_id=user_id, severity='critical').count()
+        critical_alerts = db_session.query(Alert)\
+            .filter(Alert.visible_to(user_id))\
+            .filter_by(severity='critical')\
+            .count()
         
         recent_scans = db_session.query(ScanResult)\
             .filter_by(user_id=user_id)\
@@ -564,7 +784,7 @@ def get_dashboard_stats():
         
         high_risk_scans = sum(1 for s in recent_scans if s.risk_level == 'high')
         
-        metrics = system_monitor.get_all_metrics()
+        metrics = collector('metrics')
         
         stats = {
             'total_scans': total_scans,
@@ -589,20 +809,38 @@ def get_dashboard_stats():
 @app.route('/api/packets/start', methods=['POST'])
 @login_required
 def start_packet_capture():
-    """بدء التقاط الباكتات"""
+    """
+    بدء التقاط الباكتات
+    
+    record_pcap مع pipeline_workers يحفظ أول PACKET_PIPELINE_SLOT_SIZE - 16 بايت فقط
+    من كل باكت (240 افتراضياً)؛ الـ snaplen الفعلي يُعاد في pcap_snaplen
+    """
     db_session = None
     try:
         data = request.json or {}
         interface = data.get('interface', None)
         packet_count = int(data.get('packet_count', 0))
         timeout = int(data.get('timeout', 60)) if data.get('timeout') else None
+        bpf_filter = (data.get('filter') or '').strip() or None  # فلتر BPF يُطبَّق في الـ kernel
+        fast_path = data.get('fast_path')
+        pipeline_workers = data.get('pipeline_workers')  # عمليات فك الترويسات (0 = بدون pipeline)
+        record_pcap = data.get('record_pcap')  # حفظ الباكتات الخام في ملفات pcap دوّارة
         
         # إنشاء PacketAnalyzer جديد للمستخدم
         global packet_analyzer
         packet_analyzer = PacketAnalyzer(interface=interface)
         
         # بدء الالتقاط
-        success = packet_analyzer.start_capture(packet_count, timeout)
+        try:
+            success = packet_analyzer.start_capture(
+                packet_count, timeout,
+                bpf_filter=bpf_filter,
+                fast_path=bool(fast_path) if fast_path is not None else None,
+                pipeline_workers=int(pipeline_workers) if pipeline_workers is not None else None,
+                record_pcap=bool(record_pcap) if record_pcap is not None else None
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         if success:
             # حفظ في قاعدة البيانات
@@ -615,16 +853,24 @@ def start_packet_capture():
                 )
                 db_session.add(capture)
                 db_session.commit()
+                if packet_analyzer.flows:
+                    # سجلات الـ flows المصدَّرة تُكتب دفعات عبر الـ write-behind writer
+                    packet_analyzer.flows.on_export = partial(store_flow_records, capture.id)
                 
                 log_activity('packet_capture_start', 
-                           f'Packet capture started on {interface or "all interfaces"}',
+                           f'Packet capture started on {interface or "all interfaces"}'
+                           f'{f" (filter: {bpf_filter})" if bpf_filter else ""}',
                            user_id=session['user_id'])
                 
-                return jsonify({
+                response = {
                     'success': True,
                     'message': 'Packet capture started',
                     'capture_id': capture.id
-                })
+                }
+                if packet_analyzer.recorder:
+                    # بايتات كل باكت المحفوظة في ملفات الـ pcap
+                    response['pcap_snaplen'] = packet_analyzer.recorder.snaplen
+                return jsonify(response)
             finally:
                 if db_session:
                     db_session.close()
@@ -662,6 +908,7 @@ def stop_packet_capture():
                 capture.protocol_stats = packet_analyzer.get_protocol_distribution()
                 capture.suspicious_activities = packet_analyzer.detect_suspicious_activity()
                 capture.top_talkers = packet_analyzer.get_top_talkers(10)
+                capture.pcap_segments = packet_analyzer.get_pcap_segments() or None
                 capture.status = 'completed'
                 db_session.commit()
             
@@ -693,6 +940,125 @@ def get_packet_capture_status():
         return jsonify({'error': str(e)}), 500
 
 
+def _serialize_segment(segment):
+    return {
+        **segment,
+        'start_time': datetime.fromtimestamp(segment['start']).isoformat(),
+        'end_time': datetime.fromtimestamp(segment['end']).isoformat(),
+        'available': os.path.exists(segment['path'])
+    }
+
+
+@app.route('/api/packets/segments')
+@login_required
+def get_packet_segments():
+    """
+    ملفات pcap المسجّلة التي تغطي فترة زمنية (?start=&end= بصيغة ISO)
+    
+    من الالتقاط الحالي، أو من التقاط محفوظ عبر ?capture_id=
+    """
+    db_session = None
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start_ts = datetime.fromisoformat(start).timestamp() if start else None
+        end_ts = datetime.fromisoformat(end).timestamp() if end else None
+        capture_id = request.args.get('capture_id', type=int)
+        
+        capture = None
+        if capture_id is not None:
+            db_session = get_session()
+            capture = db_session.query(PacketCapture)\
+                .filter_by(id=capture_id, user_id=session['user_id'])\
+                .first()
+            if not capture:
+                return jsonify({'error': 'Capture not found'}), 404
+        
+        if capture is None or capture.status == 'active':
+            # الالتقاط الجاري: الملفات من الـ recorder مباشرة
+            segments = packet_analyzer.get_pcap_segments(start_ts, end_ts)
+        else:
+            segments = [
+                segment for segment in capture.pcap_segments or []
+                if (end_ts is None or segment['start'] <= end_ts)
+                and (start_ts is None or segment['end'] >= start_ts)
+            ]
+        
+        return jsonify([_serialize_segment(segment) for segment in segments])
+    except ValueError as e:
+        return jsonify({'error': f'Invalid time range: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if db_session:
+            db_session.close()
+
+
+@app.route('/api/packets/segments/<name>')
+@login_required
+def download_packet_segment(name):
+    """تحميل ملف pcap مسجّل - فقط من التقاطات المستخدم الحالي"""
+    if not name.endswith('.pcap'):
+        return jsonify({'error': 'Not a capture file'}), 404
+    db_session = None
+    try:
+        db_session = get_session()
+        captures = db_session.query(PacketCapture).filter_by(user_id=session['user_id']).all()
+        segments = [segment for capture in captures for segment in capture.pcap_segments or []]
+        if any(capture.status == 'active' for capture in captures):
+            # الالتقاط الجاري لم يُحفظ بعد: الملفات من الـ recorder مباشرة
+            segments += packet_analyzer.get_pcap_segments()
+        segment = next((segment for segment in segments if segment['file'] == name), None)
+    finally:
+        if db_session:
+            db_session.close()
+    
+    if segment is None:
+        return jsonify({'error': 'Capture file not found'}), 404
+    return send_from_directory(
+        os.path.dirname(os.path.abspath(segment['path'])), name,
+        mimetype='application/vnd.tcpdump.pcap', as_attachment=True
+    )
+
+
+@app.route('/api/packets/flows')
+@login_required
+def get_packet_flows():
+    """
+    سجلات الـ flows ثنائية الاتجاه
+    
+    من الالتقاط الحالي (?active=true للـ flows الجارية الأكبر حجماً أولاً)،
+    أو من التقاط محفوظ عبر ?capture_id= (keyset pagination via ?cursor=)
+    """
+    after = _page_cursor()
+    db_session = None
+    try:
+        limit = int(request.args.get('limit', 100))
+        capture_id = request.args.get('capture_id', type=int)
+        
+        if capture_id is None:
+            active = request.args.get('active', 'false').lower() == 'true'
+            return jsonify(packet_analyzer.get_flows(limit, active=active))
+        
+        db_session = get_session()
+        capture = db_session.query(PacketCapture)\
+            .filter_by(id=capture_id, user_id=session['user_id'])\
+            .first()
+        if not capture:
+            return jsonify({'error': 'Capture not found'}), 404
+        
+        flows, next_cursor = keyset_page(
+            db_session.query(FlowRecord).filter_by(capture_id=capture_id),
+            FlowRecord.first_seen, FlowRecord.id, limit, after
+        )
+        return paginated_response(jsonify([_serialize_flow(f) for f in flows]), next_cursor)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if db_session:
+            db_session.close()
+
+
 @app.route('/api/packets/recent')
 @login_required
 def get_recent_packets():
@@ -730,31 +1096,48 @@ def get_suspicious_activities():
 @app.route('/api/packets/history')
 @login_required
 def get_capture_history():
-    """الحصول على سجل الالتقاطات"""
+    """الحصول على سجل الالتقاطات (keyset pagination via ?cursor=)"""
+    after = _page_cursor()
     db_session = None
     try:
         limit = int(request.args.get('limit', 10))
         user_id = session['user_id']
         
         db_session = get_session()
-        captures = db_session.query(PacketCapture)\
-            .filter_by(user_id=user_id)\
-            .order_by(PacketCapture.start_time.desc())\
-            .limit(limit)\
-            .all()
+        captures, next_cursor = keyset_page(
+            db_session.query(PacketCapture).filter_by(user_id=user_id),
+            PacketCapture.start_time, PacketCapture.id, limit, after
+        )
+        
+        data = [_serialize_capture(c) for c in captures]
+        
+        return paginated_response(jsonify(data), next_cursor)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if db_session:
+            db_session.close()
+
+
+@app.route('/api/activity')
+@login_required
+def get_activity_history():
+    """سجل النشاطات للمستخدم الحالي (keyset pagination via ?cursor=)"""
+    after = _page_cursor()
+    db_session = None
+    try:
+        limit = int(request.args.get('limit', 20))
+        user_id = session['user_id']
         
-        data = [{
-            'id': c.id,
-            'interface': c.interface,
-            'start_time': c.start_time.isoformat(),
-            'end_time': c.end_time.isoformat() if c.end_time else None,
-            'total_packets': c.total_packets,
-            'total_bytes': c.total_bytes,
-            'status': c.status,
-            'suspicious_count': len(c.suspicious_activities) if c.suspicious_activities else 0
-        } for c in captures]
+        db_session = get_session()
+        logs, next_cursor = keyset_page(
+            db_session.query(ActivityLog).filter_by(user_id=user_id),
+            ActivityLog.timestamp, ActivityLog.id, limit, after
+        )
+        
+        data = [_serialize_activity(a) for a in logs]
         
-        return jsonify(data)
+        return paginated_response(jsonify(data), next_cursor)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
@@ -762,6 +1145,53 @@ def get_capture_history():
             db_session.close()
 
 
+# dataset -> (model, time column, user filter, serializer)
+EXPORT_DATASETS = {
+    'metrics': (SystemMetric, SystemMetric.timestamp, SystemMetric.visible_to, _serialize_metric),
+    'scans': (ScanResult, ScanResult.timestamp, lambda user_id: ScanResult.user_id == user_id, _serialize_scan),
+    'captures': (PacketCapture, PacketCapture.start_time, lambda user_id: PacketCapture.user_id == user_id, _serialize_capture),
+    'activity': (ActivityLog, ActivityLog.timestamp, lambda user_id: ActivityLog.user_id == user_id, _serialize_activity),
+    'flows': (FlowRecord, FlowRecord.first_seen, lambda user_id: FlowRecord.capture.has(PacketCapture.user_id == user_id), _serialize_flow),
+}
+
+
+@app.route('/api/export/<dataset>')
+@login_required
+def export_history(dataset):
+    """
+    Stream a full history table as NDJSON or CSV, oldest first
+    
+    Query params: format (ndjson|csv), start/end (ISO timestamps),
+    type (metric type, metrics only)
+    """
+    try:
+        if dataset not in EXPORT_DATASETS:
+            return jsonify({'error': f'Unknown dataset: {dataset}', 'datasets': list(EXPORT_DATASETS)}), 404
+        
+        model, time_column, visible_to, serialize = EXPORT_DATASETS[dataset]
+        export_format = request.args.get('format', 'ndjson')
+        start = request.args.get('start')
+        end = request.args.get('end')
+        metric_type = request.args.get('type')
+        user_id = session['user_id']
+        
+        def build_query(db_session):
+            query = db_session.query(model).filter(visible_to(user_id))
+            if start:
+                query = query.filter(time_column >= datetime.fromisoformat(start))
+            if end:
+                query = query.filter(time_column <= datetime.fromisoformat(end))
+            if metric_type and model is SystemMetric:
+                query = query.filter(SystemMetric.metric_type == metric_type)
+            return query.order_by(time_column, model.id)
+        
+        return stream_export(get_session, build_query, serialize, export_format, f'sentra-{dataset}')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/packets/protocols')
 @login_required
 def get_protocol_distribution():
@@ -779,7 +1209,8 @@ def get_top_talkers():
     """الحصول على أكثر IPs نشاطاً"""
     try:
         limit = int(request.args.get('limit', 10))
-        talkers = packet_analyzer.get_top_talkers(limit)
+        by = request.args.get('by', 'packets')
+        talkers = packet_analyzer.get_top_talkers(limit, by)
         return jsonify(talkers)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -788,58 +1219,34 @@ def get_top_talkers():
 # ===== Automated Monitoring Tasks =====
 
 def periodic_system_check():
-    """Periodic system metrics check - لكل المستخدمين"""
-    db_session = None
+    """Periodic system metrics check - مرة واحدة للـ host، ظاهرة لكل المستخدمين
+    
+    Threshold alerts are raised by rule_engine on every sample, not here.
+    """
     try:
         metrics = system_monitor.get_all_metrics()
         
-        # Store metrics for all active users
-        db_session = get_session()
-        active_users = db_session.query(User).filter_by(is_active=True).all()
-        
-        for user in active_users:
-            # Check for performance issues
-            if metrics['cpu']['usage_percent'] > 80:
-                auto_responder.create_alert(
-                    'performance',
-                    'high',
-                    f"High CPU usage detected: {metrics['cpu']['usage_percent']}%",
-                    {'cpu_data': metrics['cpu'], 'user_id': user.id}
-                )
-            
-            if metrics['memory']['percent'] > 85:
-                auto_responder.create_alert(
-                    'performance',
-                    'high',
-                    f"High memory usage detected: {metrics['memory']['percent']}%",
-                    {'memory_data': metrics['memory'], 'user_id': user.id}
-                )
-            
-            # Store metrics
-            db_session.add(SystemMetric(
-                user_id=user.id,
-                metric_type='cpu',
-                value=metrics['cpu']['usage_percent'],
-                unit='percent',
-                details=metrics['cpu']
-            ))
-            db_session.add(SystemMetric(
-                user_id=user.id,
-                metric_type='memory',
-                value=metrics['memory']['percent'],
-                unit='percent',
-                details=metrics['memory']
-            ))
-        
-        db_session.commit()
+        # Store host metrics once; user visibility is resolved at query time
+        now = datetime.now()
+        db_writer.submit(SystemMetric(
+            host=HOST_NAME,
+            metric_type='cpu',
+            value=metrics['cpu']['usage_percent'],
+            unit='percent',
+            details=metrics['cpu'],
+            timestamp=now
+        ))
+        db_writer.submit(SystemMetric(
+            host=HOST_NAME,
+            metric_type='memory',
+            value=metrics['memory']['percent'],
+            unit='percent',
+            details=metrics['memory'],
+            timestamp=now
+        ))
         
     except Exception as e:
         print(f"Error in periodic system check: {e}")
-        if db_session:
-            db_session.rollback()
-    finally:
-        if db_session:
-            db_session.close()
 
 
 def periodic_security_scan():
@@ -884,10 +1291,130 @@ def periodic_security_scan():
             db_session.close()
 
 
-# Start automation tasks
-auto_responder.add_periodic_task(periodic_system_check, 30, 'system_check')
-auto_responder.add_periodic_task(periodic_security_scan, 300, 'security_scan')
-auto_responder.start()
+# Under gunicorn every worker imports this module; only the worker holding
+# the lease runs scheduled tasks and raises alerts, the rest serve HTTP
+scheduler_election = LeaderElection(
+    get_session,
+    name='scheduler',
+    ttl=float(os.getenv('SCHEDULER_LEASE_TTL', 30)),
+    on_elected=lambda: auto_responder.set_active(True),
+    on_demoted=lambda: auto_responder.set_active(False)
+)
+
+
+# Threshold/trend alert rules, evaluated on every metrics sample
+def raise_rule_alert(rule):
+    """Turn a fired rule into an alert - مرة واحدة للـ host"""
+    if not scheduler_election.is_leader:
+        return
+    auto_responder.create_alert(
+        rule.alert_type,
+        rule.severity,
+        rule.format_message(),
+        {'rule': rule.name, 'condition': rule.when, 'values': rule.last_values, 'host': HOST_NAME}
+    )
+
+
+rule_engine = RuleEngine(
+    raise_rule_alert,
+    rules_path=os.getenv('ALERT_RULES_FILE'),
+    reload_interval=float(os.getenv('ALERT_RULES_RELOAD_INTERVAL', 5))
+)
+system_monitor.add_sample_listener(rule_engine.observe_sample)
+
+
+def raise_anomaly_alert(anomaly):
+    """Report a metric that left its usual range for this hour"""
+    if not scheduler_election.is_leader:
+        return
+    severity = 'high' if abs(anomaly['z']) >= 2 * anomaly_detector.threshold else 'medium'
+    direction = 'above' if anomaly['z'] > 0 else 'below'
+    auto_responder.create_alert(
+        'anomaly',
+        severity,
+        f"Unusual {anomaly['series']}: {anomaly['value']:.2f} {anomaly['unit']} is {direction} "
+        f"the expected {anomaly['expected']:.2f} (z={anomaly['z']:.1f})",
+        dict(anomaly, host=HOST_NAME)
+    )
+
+
+anomaly_detector = AnomalyDetector(
+    raise_anomaly_alert,
+    threshold=float(os.getenv('ANOMALY_Z_THRESHOLD', 4)),
+    consecutive=int(os.getenv('ANOMALY_CONSECUTIVE', 3))
+)
+system_monitor.add_sample_listener(
+    lambda snapshot: anomaly_detector.observe_sample(snapshot, packet_analyzer.get_statistics())
+)
+
+
+def _collector_alerts(limit=20, severity=None, alert_type=None, acknowledged=None, since=None, until=None):
+    return auto_responder.get_alerts(
+        limit,
+        severity,
+        alert_type=alert_type,
+        acknowledged=acknowledged,
+        since=datetime.fromisoformat(since) if since else None,
+        until=datetime.fromisoformat(until) if until else None
+    )
+
+
+# Reads served by the process running the collectors (over IPC for role 'web')
+COLLECTOR_CALLS = {
+    'metrics': system_monitor.get_all_metrics,
+    'metrics_history': lambda name, start=None, limit=None, resolution=None:
+        system_monitor.metrics_store.query(name, start=start, limit=limit, resolution=resolution),
+    'alerts': _collector_alerts,
+    'acknowledge_alert': auto_responder.acknowledge_alert,
+    'retention': lambda: {'policies_hours': retention_manager.policies, 'last_run': retention_manager.last_report},
+    'rules': rule_engine.get_status,
+    'anomalies': anomaly_detector.get_status,
+    'notifications': notification_dispatcher.get_stats,
+    'jobs': auto_responder.get_task_status,
+    'leader': scheduler_election.get_status,
+}
+# Still meaningful from a web process when the worker is down: a direct
+# psutil sample, and alerts read from / acknowledged in the table
+LOCAL_FALLBACK = {'metrics', 'metrics_history', 'alerts', 'acknowledge_alert'}
+# Always served by the web process itself: psutil numbers are system-wide,
+# so an on-demand sample (at most one per METRICS_SAMPLE_INTERVAL, see
+# SystemMonitor.get_all_metrics) matches the worker's without waiting on a
+# busy worker for the IPC round trip
+LOCAL_CALLS = {'metrics'}
+
+
+def collector(method, **params):
+    """Call a COLLECTOR_CALLS entry in this process, or in the worker when role is 'web'"""
+    if worker_client is None or method in LOCAL_CALLS:
+        return COLLECTOR_CALLS[method](**params)
+    try:
+        return worker_client.call(method, **params)
+    except IPCError as e:
+        if method not in LOCAL_FALLBACK:
+            raise
+        print(f"Worker unavailable, serving {method} locally: {e}")
+        return COLLECTOR_CALLS[method](**params)
+
+
+if SENTRA_ROLE in ('all', 'worker'):
+    # Start automation tasks
+    notification_dispatcher.start()
+    atexit.register(notification_dispatcher.stop)
+    auto_responder.add_periodic_task(periodic_system_check, 30, 'system_check')
+    auto_responder.add_periodic_task(periodic_security_scan, 300, 'security_scan')
+    auto_responder.add_periodic_task(retention_manager.run, int(os.getenv('RETENTION_INTERVAL', 3600)), 'retention')
+    auto_responder.start(paused=True)
+    scheduler_election.start()
+    atexit.register(scheduler_election.stop)
+    system_monitor.start_sampler()
+    
+    if SENTRA_ROLE == 'worker':
+        ipc_server = IPCServer(IPC_SOCKET_PATH, COLLECTOR_CALLS)
+        ipc_server.start()
+        atexit.register(ipc_server.stop)
+else:
+    # The worker creates alerts; never serve a copy restored at import time
+    auto_responder.alert_store.restore([])
 
 # ===== Docker Monitor Routes =====
 from docker_monitor.monitor import DockerMonitor
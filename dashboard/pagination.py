@@ -0,0 +1,129 @@
+"""
+Pagination & Export Helpers for SentraOS
+Keyset (cursor) pagination and constant-memory streaming exports
+"""
+
+from flask import Response, stream_with_context
+from sqlalchemy import and_, or_
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import base64
+import csv
+import io
+import json
+
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Opaque cursor for the (timestamp, id) key of the last row on a page"""
+    raw = f"{timestamp.isoformat()}|{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        timestamp, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def keyset_page(query, time_column, id_column, limit: int,
+                after: Optional[Tuple[datetime, int]] = None) -> Tuple[List, Optional[str]]:
+    """
+    One page of rows, newest first, strictly older than the `after` key
+
+    Args:
+        query: Filtered query over a single model
+        time_column: Timestamp column the page is ordered by
+        id_column: Primary key, breaks ties between equal timestamps
+        limit: Page size
+        after: (timestamp, id) key from decode_cursor (None = first page)
+
+    Returns:
+        (rows, next cursor or None when this is the last page)
+    """
+    if after is not None:
+        timestamp, row_id = after
+        query = query.filter(or_(
+            time_column < timestamp,
+            and_(time_column == timestamp, id_column < row_id)
+        ))
+
+    rows = query.order_by(time_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, time_column.key), getattr(last, id_column.key))
+
+
+def paginated_response(response, next_cursor: Optional[str]):
+    """Attach the next page cursor to a JSON list response"""
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
+def stream_export(session_factory: Callable, build_query: Callable, serialize: Callable[..., Dict],
+                  export_format: str, filename: str, batch_size: int = 1000) -> Response:
+    """
+    Stream every row of a query as NDJSON or CSV without loading the table
+
+    Args:
+        session_factory: Callable returning a new SQLAlchemy session
+        build_query: Callable taking the session and returning the ordered query
+        serialize: Turns one ORM row into a flat dict
+        export_format: 'ndjson' or 'csv'
+        filename: Download name without extension
+        batch_size: Rows fetched from SQLite per round trip (yield_per)
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format '{export_format}' (expected one of: {', '.join(EXPORT_FORMATS)})")
+
+    def generate():
+        session = session_factory()
+        try:
+            buffer = io.StringIO()
+            writer = None
+            pending = 0
+
+            for row in build_query(session).yield_per(batch_size):
+                record = serialize(row)
+                if export_format == 'ndjson':
+                    buffer.write(json.dumps(record, default=str))
+                    buffer.write('\n')
+                else:
+                    if writer is None:
+                        writer = csv.DictWriter(buffer, fieldnames=list(record.keys()))
+                        writer.writeheader()
+                    writer.writerow({
+                        key: json.dumps(value) if isinstance(value, (dict, list)) else value
+                        for key, value in record.items()
+                    })
+
+                pending += 1
+                if pending >= batch_size:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                    pending = 0
+
+            if buffer.tell():
+                yield buffer.getvalue()
+        finally:
+            session.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}.{export_format}'}
+    )
@@ -154,6 +154,45 @@ async function updateMetrics() {
     }
 }
 
+// Seed charts with recent history so they are not empty on page load
+async function loadMetricsHistory() {
+    try {
+        const series = ['cpu', 'memory', 'network_send', 'network_recv'];
+        const responses = await Promise.all(series.map(type =>
+            fetch(`/api/metrics/history?type=${type}&limit=${maxDataPoints}`)
+        ));
+        const [cpu, memory, send, recv] = await Promise.all(responses.map(r => r.json()));
+        
+        if (!Array.isArray(cpu) || cpu.length === 0) {
+            return;
+        }
+        
+        // Keep whatever the live poll already added after the history points
+        const points = Math.min(cpu.length, maxDataPoints - timeLabels.length);
+        const offset = cpu.length - points;
+        
+        const byTimestamp = (rows) => new Map((Array.isArray(rows) ? rows : []).map(r => [r.timestamp, r.value]));
+        const memoryMap = byTimestamp(memory);
+        const sendMap = byTimestamp(send);
+        const recvMap = byTimestamp(recv);
+        
+        const history = cpu.slice(offset);
+        timeLabels.unshift(...history.map(p => new Date(p.timestamp).toLocaleTimeString()));
+        cpuData.unshift(...history.map(p => p.value));
+        memoryData.unshift(...history.map(p => memoryMap.get(p.timestamp) ?? null));
+        networkSendData.unshift(...history.map(p => sendMap.get(p.timestamp) ?? null));
+        networkRecvData.unshift(...history.map(p => recvMap.get(p.timestamp) ?? null));
+        
+        if (systemChart) systemChart.update();
+        if (networkChart) networkChart.update();
+        
+        console.log('Metrics history loaded:', history.length);
+        
+    } catch (error) {
+        console.error('Error loading metrics history:', error);
+    }
+}
+
 // Fetch and display alerts
 async function updateAlerts() {
     try {
@@ -363,12 +402,8 @@ document.addEventListener('DOMContentLoaded', async () => {
     await updateConnections();
     await updateDocker();  // ← أضف هنا
     
-    // Load initial metrics for charts (populate with some data)
-    for (let i = 0; i < 5; i++) {
-        setTimeout(() => {
-            updateMetrics();
-        }, i * 1000); // Every 1 second for first 5 seconds
-    }
+    // Populate charts from the server-side metrics history
+    await loadMetricsHistory();
 
     // Then start regular updates
     setInterval(updateMetrics, 3000);
@@ -4,15 +4,18 @@ SentraOS - Main Entry Point
 Smart Operations & Security Platform
 """
 
+import argparse
 import os
+import signal
 import sys
+import threading
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Initialize database
-from models import Base, engine, log_activity, create_admin_user
+from models import Base, engine, log_activity, create_admin_user, db_writer, get_storage_settings
 
 def init_database():
     """Initialize database tables and create admin user"""
@@ -21,6 +24,11 @@ def init_database():
         Base.metadata.create_all(engine)
         print("✅ Database initialized successfully")
         
+        storage = get_storage_settings()
+        pragmas = ', '.join(f"{key}={value}" for key, value in storage['pragmas'].items())
+        print(f"💾 Storage profile: {storage['profile']} ({storage['pool']}, size={storage['pool_size']})")
+        print(f"   {pragmas}")
+        
         # إنشاء مستخدم admin افتراضي
         if create_admin_user():
             print("✅ Default admin user created")
@@ -34,16 +42,169 @@ def init_database():
         print(f"❌ Database initialization failed: {e}")
         return False
 
+def run_worker():
+    """Run the scheduler and collectors only, serving their state over IPC"""
+    import dashboard.app as dashboard_app
+    
+    stop_event = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda signum, frame: stop_event.set())
+    
+    print(f"\n⚙️  Worker running, IPC socket: {dashboard_app.IPC_SOCKET_PATH}")
+    print("⌨️  Press CTRL+C to stop the worker\n")
+    log_activity('system_start', 'SentraOS worker started')
+    try:
+        stop_event.wait()
+        print("\n\n👋 Shutting down SentraOS worker...")
+        log_activity('system_stop', 'SentraOS worker stopped')
+    finally:
+        db_writer.stop()
+
+def analyze_capture_file(args):
+    """Analyze a recorded pcap/pcapng file and store a PacketCapture summary and its flow records"""
+    from datetime import datetime
+    from functools import partial
+    from models import get_session, PacketCapture, User, store_flow_records
+    from packet_analyzer import PacketAnalyzer
+    
+    # The stored summary describes the whole file unless --window narrows it
+    analyzer = PacketAnalyzer(stats_mode=args.stats_mode, stats_window=args.window)
+    capture_id = user_id = None
+    if not args.no_save:
+        # الجلسة تُنشأ قبل التحليل حتى تُكتب سجلات الـ flows أثناء القراءة
+        db_session = get_session()
+        try:
+            user = db_session.query(User).filter_by(username=args.user).first()
+            if not user:
+                print(f"❌ User '{args.user}' not found, nothing analyzed")
+                return False
+            user_id = user.id
+            capture = PacketCapture(
+                user_id=user_id,
+                interface=f"file:{os.path.basename(args.file)}"[:50],
+                status='active'
+            )
+            db_session.add(capture)
+            db_session.commit()
+            capture_id = capture.id
+        except Exception as e:
+            db_session.rollback()
+            print(f"❌ Failed to create capture record: {e}")
+            return False
+        finally:
+            db_session.close()
+        if analyzer.flows:
+            analyzer.flows.on_export = partial(store_flow_records, capture_id)
+    
+    print(f"🔬 Analyzing {args.file} ...")
+    try:
+        summary = analyzer.analyze_file(args.file, chunk_size=args.chunk_size * 1024 * 1024)
+    except (OSError, ValueError) as e:
+        print(f"❌ Cannot analyze {args.file}: {e}")
+        if capture_id:
+            _update_capture(capture_id, status='failed', end_time=datetime.now())
+        return False
+    
+    stats = analyzer.get_statistics()
+    suspicious = analyzer.detect_suspicious_activity()
+    top_talkers = analyzer.get_top_talkers(10)
+    print(f"✅ {summary['packets']:,} packets, {summary['bytes']:,} bytes ({summary['format']})"
+          f" in {summary['elapsed_seconds']}s - {summary['packets_per_second']:,} packets/s")
+    if summary['truncated']:
+        print("⚠️  File ends in the middle of a packet (truncated capture)")
+    print("📊 Protocols: " + ', '.join(f"{name} {count:,}" for name, count in analyzer.get_protocol_distribution().items()))
+    print("🗣️  Top talkers:")
+    for talker in top_talkers[:5]:
+        print(f"   {talker['ip']:<40} {talker['packets']:>12,} packets {talker['bytes']:>15,} bytes")
+    if 'flows' in stats:
+        print(f"🔀 Flows: {stats['flows']['exported']:,} records")
+    print(f"🚨 Suspicious activities: {len(suspicious)}")
+    for activity in suspicious:
+        print(f"   [{activity['severity']}] {activity['description']}")
+    
+    if args.no_save:
+        return True
+    
+    # حفظ ملخص التحليل كجلسة التقاط مكتملة
+    if not _update_capture(
+        capture_id,
+        start_time=datetime.fromtimestamp(summary['first_timestamp']) if summary['packets'] else datetime.now(),
+        end_time=datetime.fromtimestamp(summary['last_timestamp']) if summary['packets'] else datetime.now(),
+        total_packets=stats['total_packets'],
+        total_bytes=stats['total_bytes'],
+        protocol_stats=analyzer.get_protocol_distribution(),
+        suspicious_activities=suspicious,
+        top_talkers=top_talkers,
+        status='completed'
+    ):
+        return False
+    print(f"💾 Saved as packet capture #{capture_id}")
+    
+    log_activity('packet_capture_file', f"Analyzed capture file {args.file} ({summary['packets']} packets)",
+                 user_id=user_id)
+    return True
+
+def _update_capture(capture_id, **fields):
+    """Set fields of a stored PacketCapture"""
+    from models import get_session, PacketCapture
+    
+    db_session = get_session()
+    try:
+        db_session.query(PacketCapture).filter_by(id=capture_id).update(fields)
+        db_session.commit()
+        return True
+    except Exception as e:
+        db_session.rollback()
+        print(f"❌ Failed to save capture summary: {e}")
+        return False
+    finally:
+        db_session.close()
+
 def main():
     """Main application entry point"""
+    parser = argparse.ArgumentParser(description='SentraOS - Smart Operations & Security Platform')
+    parser.add_argument(
+        '--role', choices=['all', 'web', 'worker'], default=os.getenv('SENTRA_ROLE', 'all'),
+        help="all: web + collectors in one process, web: HTTP only, worker: scheduler and collectors only"
+    )
+    commands = parser.add_subparsers(dest='command')
+    analyze = commands.add_parser('analyze', help='Analyze a recorded pcap/pcapng file offline (no root needed)')
+    analyze.add_argument('file', help='pcap or pcapng file')
+    analyze.add_argument('--stats-mode', choices=['exact', 'sketch'], default=None,
+                         help='Traffic counters (default PACKET_STATS_MODE or exact)')
+    analyze.add_argument('--window', type=int, default=0,
+                         help='Seconds of capture time top talkers and suspicious activity cover '
+                              '(exact mode; default 0 = the whole file)')
+    analyze.add_argument('--chunk-size', type=int, default=64, help='MB of the file mapped at a time')
+    analyze.add_argument('--user', default='admin', help='Owner of the stored capture summary')
+    analyze.add_argument('--no-save', action='store_true', help='Print the analysis without storing it')
+    args = parser.parse_args()
+    
+    if args.command == 'analyze':
+        if not init_database():
+            sys.exit(1)
+        try:
+            ok = analyze_capture_file(args)
+        finally:
+            db_writer.stop()
+        sys.exit(0 if ok else 1)
+    
+    # dashboard.app reads the role at import time
+    os.environ['SENTRA_ROLE'] = args.role
+    
     print("=" * 60)
     print("🚀 Starting SentraOS - Smart Operations & Security Platform")
+    print(f"   Role: {args.role}")
     print("=" * 60)
     
     # Initialize database
     if not init_database():
         print("⚠️  Continuing without database initialization...")
     
+    if args.role == 'worker':
+        run_worker()
+        return
+    
     # Import and run Flask app
     from dashboard.app import app
     
@@ -77,6 +238,9 @@ def main():
         print(f"\n❌ Error running application: {e}")
         log_activity('system_error', f'Application error: {str(e)}')
         sys.exit(1)
+    finally:
+        # Write out queued activity logs and metrics before exiting
+        db_writer.stop()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -3,12 +3,25 @@ Database Models for SentraOS
 Updated with User Authentication System, Packet Capture, and Network Topology
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text, JSON, ForeignKey
+from sqlalchemy import create_engine, event, inspect, Column, Integer, String, Float, DateTime, Boolean, Text, JSON, ForeignKey, Index, or_, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.pool import QueuePool, StaticPool
+from contextlib import contextmanager
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+import atexit
 import os
+import queue
+import socket
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process schema lock
+    fcntl = None
 
 Base = declarative_base()
 
@@ -44,16 +57,45 @@ class User(Base):
         return f'<User {self.username}>'
 
 
-class SystemMetric(Base):
-    """Store system performance metrics"""
+HOST_NAME = socket.gethostname()
+
+
+class HostScopedMixin:
+    """Rows with user_id NULL are host-wide and visible to every user"""
+    
+    @classmethod
+    def visible_to(cls, user_id: int):
+        """Filter for the rows a user may see: host-wide rows plus their own"""
+        return or_(cls.user_id == user_id, cls.user_id.is_(None))
+
+
+class SystemMetric(HostScopedMixin, Base):
+    """
+    Store system performance metrics
+    
+    Host metrics are written once per sample with user_id NULL and are
+    visible to every user; rows with a user_id are private to that user.
+    Raw samples have resolution 0; retention rolls old ones up into
+    aggregate rows whose resolution is the bucket width in seconds.
+    """
     __tablename__ = 'system_metrics'
+    __table_args__ = (
+        # /api/metrics/history: host-wide rows by type, newest first
+        Index('ix_system_metrics_type_time', 'metric_type', 'timestamp'),
+        # ... and rows owned by one user
+        Index('ix_system_metrics_user_type_time', 'user_id', 'metric_type', 'timestamp'),
+        # retention rollups and pruning
+        Index('ix_system_metrics_resolution_time', 'resolution', 'timestamp'),
+    )
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    host = Column(String(100), default=HOST_NAME)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
     metric_type = Column(String(50))
     value = Column(Float)
     unit = Column(String(20))
     details = Column(JSON)
+    resolution = Column(Integer, default=0, server_default=text('0'), nullable=False)
     timestamp = Column(DateTime, default=datetime.now)
     
     user = relationship('User', back_populates='metrics')
@@ -62,6 +104,10 @@ class SystemMetric(Base):
 class ScanResult(Base):
     """Store security scan results"""
     __tablename__ = 'scan_results'
+    __table_args__ = (
+        # /api/security/scans and /api/stats
+        Index('ix_scan_results_user_time', 'user_id', 'timestamp'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -76,17 +122,30 @@ class ScanResult(Base):
     user = relationship('User', back_populates='scans')
 
 
-class Alert(Base):
-    """Store security and performance alerts"""
+class Alert(HostScopedMixin, Base):
+    """
+    Store security and performance alerts
+    
+    Ids are assigned by AutoResponder's in-memory store so both agree;
+    repeats of one condition update count and last_seen on a single row.
+    """
     __tablename__ = 'alerts'
+    __table_args__ = (
+        # /api/stats critical alert count
+        Index('ix_alerts_user_severity_time', 'user_id', 'severity', 'timestamp'),
+    )
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
     alert_type = Column(String(50))
     severity = Column(String(20))
     message = Column(Text)
     details = Column(JSON)
     acknowledged = Column(Boolean, default=False)
+    fingerprint = Column(String(16))
+    count = Column(Integer, default=1, server_default=text('1'), nullable=False)
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
     timestamp = Column(DateTime, default=datetime.now)
     
     user = relationship('User', back_populates='alerts')
@@ -95,6 +154,10 @@ class Alert(Base):
 class PacketCapture(Base):
     """Store packet capture sessions"""
     __tablename__ = 'packet_captures'
+    __table_args__ = (
+        # /api/packets/history and the active capture lookup on stop
+        Index('ix_packet_captures_user_time', 'user_id', 'start_time'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -106,14 +169,55 @@ class PacketCapture(Base):
     protocol_stats = Column(JSON)
     suspicious_activities = Column(JSON)
     top_talkers = Column(JSON)
+    # Recorded pcap files, oldest first: [{file, path, start, end, packets, bytes}]
+    pcap_segments = Column(JSON)
     status = Column(String(20), default='active')
     
     user = relationship('User', back_populates='packet_captures')
+    flow_records = relationship('FlowRecord', back_populates='capture', cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<PacketCapture {self.id} - {self.interface} - {self.status}>'
 
 
+class FlowRecord(Base):
+    """
+    Exported bidirectional flow (one conversation's 5-tuple and counters)
+    
+    src is the side that opened the flow; rev_* count the reply direction.
+    """
+    __tablename__ = 'flow_records'
+    __table_args__ = (
+        # /api/packets/flows?capture_id=
+        Index('ix_flow_records_capture_time', 'capture_id', 'first_seen'),
+        # Retention pruning
+        Index('ix_flow_records_time', 'timestamp'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    capture_id = Column(Integer, ForeignKey('packet_captures.id'), nullable=True)
+    protocol = Column(Integer)  # IP protocol number
+    src_ip = Column(String(45))
+    src_port = Column(Integer)
+    dst_ip = Column(String(45))
+    dst_port = Column(Integer)
+    packets = Column(Integer, default=0)
+    bytes = Column(Integer, default=0)
+    rev_packets = Column(Integer, default=0)
+    rev_bytes = Column(Integer, default=0)
+    tcp_flags = Column(Integer, default=0)  # OR of both directions
+    state = Column(String(20))  # last TCP state
+    end_reason = Column(String(10))  # idle, active, closed, evicted, flush
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+    timestamp = Column(DateTime, default=datetime.now)
+    
+    capture = relationship('PacketCapture', back_populates='flow_records')
+    
+    def __repr__(self):
+        return f'<FlowRecord {self.src_ip}:{self.src_port} -> {self.dst_ip}:{self.dst_port} ({self.protocol})>'
+
+
 class NetworkTopology(Base):
     """Store network topology configurations"""
     __tablename__ = 'network_topologies'
@@ -135,6 +239,10 @@ class NetworkTopology(Base):
 class ActivityLog(Base):
     """Store system activity logs"""
     __tablename__ = 'activity_logs'
+    __table_args__ = (
+        # /api/activity
+        Index('ix_activity_logs_user_time', 'user_id', 'timestamp'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
@@ -144,9 +252,252 @@ class ActivityLog(Base):
     timestamp = Column(DateTime, default=datetime.now)
 
 
-DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'sentra.db')
-engine = create_engine(f'sqlite:///{DATABASE_PATH}', echo=False)
-Base.metadata.create_all(engine)
+class Lease(Base):
+    """
+    Named leadership lease shared by every process using the database
+    
+    Times are epoch seconds so processes compare them without timezone
+    or DST ambiguity.
+    """
+    __tablename__ = 'leases'
+    
+    name = Column(String(50), primary_key=True)
+    owner = Column(String(100), nullable=False)
+    acquired_at = Column(Float)
+    renewed_at = Column(Float)
+    expires_at = Column(Float, nullable=False)
+
+
+def _migrate_host_metrics(connection):
+    """
+    Make system_metrics host-scoped
+    
+    Older databases stored one identical copy of every host sample per
+    active user. Rebuild the table with a nullable user_id and a host
+    column, keeping a single host-wide row per sample.
+    """
+    columns = [row[1] for row in connection.execute(text("PRAGMA table_info(system_metrics)"))]
+    if 'host' in columns:
+        return
+    
+    connection.execute(text("ALTER TABLE system_metrics RENAME TO system_metrics_legacy"))
+    SystemMetric.__table__.create(connection)
+    # Copies of one sample share the same details snapshot (which carries
+    # the sample's own timestamp); fall back to the second they were written
+    connection.execute(text("""
+        INSERT INTO system_metrics (id, host, user_id, metric_type, value, unit, details, timestamp)
+        SELECT MIN(id), :host, NULL, metric_type, value, unit, details, MIN(timestamp)
+        FROM system_metrics_legacy
+        GROUP BY metric_type, value, unit, COALESCE(details, substr(timestamp, 1, 19))
+    """), {'host': HOST_NAME})
+    connection.execute(text("DROP TABLE system_metrics_legacy"))
+
+
+def _add_metric_resolution(connection):
+    """Add the resolution column used to tell raw samples from rollups"""
+    columns = [row[1] for row in connection.execute(text("PRAGMA table_info(system_metrics)"))]
+    if 'resolution' not in columns:
+        connection.execute(text("ALTER TABLE system_metrics ADD COLUMN resolution INTEGER NOT NULL DEFAULT 0"))
+
+
+def _migrate_host_alerts(connection):
+    """
+    Allow host-wide alerts and add the deduplication columns
+    
+    user_id was NOT NULL, which SQLite can only relax by rebuilding the table.
+    """
+    columns = [row[1] for row in connection.execute(text("PRAGMA table_info(alerts)"))]
+    if 'fingerprint' in columns:
+        return
+    
+    connection.execute(text("ALTER TABLE alerts RENAME TO alerts_legacy"))
+    Alert.__table__.create(connection)
+    connection.execute(text("""
+        INSERT INTO alerts (id, user_id, alert_type, severity, message, details, acknowledged,
+                            count, first_seen, last_seen, timestamp)
+        SELECT id, user_id, alert_type, severity, message, details, acknowledged,
+               1, timestamp, timestamp, timestamp
+        FROM alerts_legacy
+    """))
+    connection.execute(text("DROP TABLE alerts_legacy"))
+
+
+def _add_capture_segments(connection):
+    """Add the column indexing a capture's recorded pcap files by time range"""
+    columns = [row[1] for row in connection.execute(text("PRAGMA table_info(packet_captures)"))]
+    if 'pcap_segments' not in columns:
+        connection.execute(text("ALTER TABLE packet_captures ADD COLUMN pcap_segments JSON"))
+
+
+# Schema upgrades for existing databases, applied in order and tracked
+# with SQLite's user_version pragma
+MIGRATIONS = [
+    _migrate_host_metrics,
+    _add_metric_resolution,
+    _migrate_host_alerts,
+    _add_capture_segments,
+]
+
+
+def _create_missing_indexes(connection):
+    """Create indexes declared on the models that an existing database lacks"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+@contextmanager
+def schema_lock(path: str):
+    """
+    Serialize schema creation and migrations across processes
+    
+    Every gunicorn worker imports this module at the same time; pysqlite
+    runs DDL outside transactions, so without this two workers can race
+    on CREATE TABLE or interleave the steps of a table rebuild.
+    """
+    if fcntl is None or path == ':memory:':
+        yield
+        return
+    with open(f"{path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def migrate_database(target_engine, fresh: bool = False):
+    """
+    Apply pending schema migrations to an existing database
+    
+    A fresh database (no tables before create_all()) already has the
+    current schema, so it is only stamped with the latest version.
+    """
+    with target_engine.begin() as connection:
+        if fresh:
+            connection.execute(text(f"PRAGMA user_version = {len(MIGRATIONS)}"))
+            return
+        version = connection.execute(text("PRAGMA user_version")).scalar()
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(connection)
+            connection.execute(text(f"PRAGMA user_version = {number}"))
+            print(f"✅ Database migrated to schema version {number} ({migration.__name__})")
+        
+        # create_all() skips tables that already exist, so indexes added to
+        # the models later are created here
+        _create_missing_indexes(connection)
+
+
+# SQLite tuning profiles, selected with DB_PROFILE; each setting can be
+# overridden individually with DB_<SETTING> (e.g. DB_SYNCHRONOUS=FULL)
+STORAGE_PROFILES = {
+    # SQLite defaults: rollback journal, readers and writers block each other
+    'default': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'auto_vacuum': 'NONE',
+        'pool_size': 5,
+        'max_overflow': 10,
+    },
+    # Concurrent dashboard reads alongside scheduler writes
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -65536,       # 64 MB page cache per connection
+        'mmap_size': 268435456,     # 256 MB memory-mapped I/O
+        'auto_vacuum': 'INCREMENTAL',  # new databases only, see RetentionManager
+        'pool_size': 10,
+        'max_overflow': 20,
+    },
+}
+
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+AUTO_VACUUM_MODES = {'NONE', 'FULL', 'INCREMENTAL'}
+
+
+def load_storage_profile() -> dict:
+    """Resolve the storage profile from the environment"""
+    name = os.getenv('DB_PROFILE', 'wal').lower()
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{name}' (expected one of: {', '.join(STORAGE_PROFILES)})")
+    
+    profile = dict(STORAGE_PROFILES[name], name=name)
+    for key, default in STORAGE_PROFILES[name].items():
+        override = os.getenv(f'DB_{key.upper()}')
+        if override is not None:
+            profile[key] = override.upper() if isinstance(default, str) else int(override)
+    
+    if profile['journal_mode'] not in JOURNAL_MODES:
+        raise ValueError(f"Invalid DB_JOURNAL_MODE '{profile['journal_mode']}'")
+    if profile['synchronous'] not in SYNCHRONOUS_MODES:
+        raise ValueError(f"Invalid DB_SYNCHRONOUS '{profile['synchronous']}'")
+    if profile['auto_vacuum'] not in AUTO_VACUUM_MODES:
+        raise ValueError(f"Invalid DB_AUTO_VACUUM '{profile['auto_vacuum']}'")
+    return profile
+
+
+def create_storage_engine(database_path: str, profile: dict):
+    """Create a thread-safe SQLite engine that applies the profile's pragmas on connect"""
+    if database_path == ':memory:':
+        # One shared connection, otherwise every pooled connection is a new empty database
+        new_engine = create_engine('sqlite://', echo=False, poolclass=StaticPool,
+                                   connect_args={'check_same_thread': False})
+    else:
+        new_engine = create_engine(
+            f'sqlite:///{database_path}',
+            echo=False,
+            poolclass=QueuePool,
+            pool_size=profile['pool_size'],
+            max_overflow=profile['max_overflow'],
+            connect_args={'check_same_thread': False, 'timeout': profile['busy_timeout'] / 1000}
+        )
+    
+    @event.listens_for(new_engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # Only takes effect before the first table is created (or after a VACUUM)
+        cursor.execute(f"PRAGMA auto_vacuum = {profile['auto_vacuum']}")
+        cursor.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+        cursor.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+        cursor.execute(f"PRAGMA busy_timeout = {int(profile['busy_timeout'])}")
+        cursor.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+        cursor.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+        cursor.close()
+    
+    return new_engine
+
+
+def get_storage_settings() -> dict:
+    """Profile in use and the pragma values SQLite actually reports"""
+    with engine.connect() as connection:
+        effective = {
+            pragma: connection.execute(text(f"PRAGMA {pragma}")).scalar()
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'auto_vacuum')
+        }
+    return {
+        'database_path': DATABASE_PATH,
+        'profile': STORAGE_PROFILE['name'],
+        'pool': type(engine.pool).__name__,
+        'pool_size': STORAGE_PROFILE['pool_size'],
+        'max_overflow': STORAGE_PROFILE['max_overflow'],
+        'pragmas': effective
+    }
+
+
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'sentra.db')
+if DATABASE_PATH != ':memory:' and not os.path.isabs(DATABASE_PATH):
+    DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), DATABASE_PATH)
+STORAGE_PROFILE = load_storage_profile()
+engine = create_storage_engine(DATABASE_PATH, STORAGE_PROFILE)
+with schema_lock(DATABASE_PATH):
+    fresh_database = not inspect(engine).get_table_names()
+    Base.metadata.create_all(engine)
+    migrate_database(engine, fresh=fresh_database)
 Session = sessionmaker(bind=engine)
 
 
@@ -154,22 +505,303 @@ def get_session():
     return Session()
 
 
+class WriteBehindWriter:
+    """
+    Background writer that batches ORM inserts into single transactions
+    
+    Callers hand over new model instances and return immediately; a worker
+    thread commits them in batches of up to `batch_size` or every
+    `flush_interval` seconds, whichever comes first. When the queue is
+    full new records are dropped and counted rather than blocking the caller.
+    
+    A callable may be submitted instead of an instance for updates; it is
+    called with the batch's session, in queue order with the inserts.
+    
+    Records that still fail on their own are dropped and counted in the
+    stats. Models registered with rekey_on_conflict() are first retried
+    under a database-assigned primary key.
+    """
+    
+    def __init__(self, session_factory, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.worker = None
+        self.lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.rekey_handlers = {}
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'failed': 0,
+            'rekeyed': 0,
+            'last_error': None,
+            'batches': 0,
+            'last_batch_size': 0,
+            'last_flush_ms': 0.0
+        }
+    
+    def start(self):
+        """Start the worker thread (also done lazily on first submit)"""
+        with self.lock:
+            if self.worker and self.worker.is_alive():
+                return
+            self.worker = threading.Thread(target=self._run, name='db-write-behind', daemon=True)
+            self.worker.start()
+    
+    def rekey_on_conflict(self, model, handler):
+        """
+        Retry `model` inserts whose explicit primary key is already taken
+        (e.g. an alert id another process stored) under a new key
+        
+        Args:
+            model: Mapped class with a single-column primary key
+            handler: Called from the worker thread with (old id, new id)
+                before later records of the same batch are applied
+        """
+        self.rekey_handlers[model] = handler
+    
+    def submit(self, record) -> bool:
+        """Queue a new model instance (or update callable); False if it was dropped"""
+        if not (self.worker and self.worker.is_alive()):
+            self.start()
+        
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.stats_lock:
+                self.stats['dropped'] += 1
+                dropped = self.stats['dropped']
+            if dropped % 1000 == 1:
+                print(f"⚠️  Write-behind queue full, dropped {dropped} records so far")
+            return False
+        
+        with self.stats_lock:
+            self.stats['enqueued'] += 1
+        return True
+    
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until every record queued before this call has been written"""
+        if not (self.worker and self.worker.is_alive()):
+            return self.queue.empty()
+        
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+    
+    def stop(self, timeout: float = 10.0):
+        """Flush pending records and stop the worker thread"""
+        if not (self.worker and self.worker.is_alive()):
+            return
+        
+        self.flush(timeout)
+        self.queue.put(None)
+        self.worker.join(timeout)
+        self.worker = None
+    
+    def get_stats(self) -> dict:
+        """Counters for monitoring the writer"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['queue_depth'] = self.queue.qsize()
+        stats['queue_capacity'] = self.queue.maxsize
+        stats['running'] = bool(self.worker and self.worker.is_alive())
+        return stats
+    
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False  # flush deadline reached
+            
+            if isinstance(item, threading.Event):
+                self._write(batch)
+                batch, deadline = [], None
+                item.set()
+                continue
+            
+            if item is None:
+                self._write(batch)
+                return
+            
+            if item is not False:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            
+            if batch and (item is False or len(batch) >= self.batch_size):
+                self._write(batch)
+                batch, deadline = [], None
+    
+    def _write(self, batch):
+        """Insert one batch in a single transaction"""
+        if not batch:
+            return
+        
+        started = time.perf_counter()
+        # Instances whose primary key the database assigns (vs. e.g. alerts
+        # that keep their in-memory id); a failed flush leaves ids on them
+        generated = [
+            record for record in batch
+            if not callable(record) and all(value is None for value in inspect(record).mapper.primary_key_from_instance(record))
+        ]
+        session = self.session_factory()
+        try:
+            for record in batch:
+                self._apply(session, record)
+            session.commit()
+            written, failed = len(batch), 0
+        except Exception as e:
+            print(f"Error writing batch of {len(batch)} records, retrying one by one: {e}")
+            session.rollback()
+            written = None
+        finally:
+            session.close()
+        
+        if written is None:
+            for record in generated:
+                mapper = inspect(record).mapper
+                for column in mapper.primary_key:
+                    setattr(record, mapper.get_property_by_column(column).key, None)
+            written, failed = self._write_each(batch)
+        
+        with self.stats_lock:
+            self.stats['written'] += written
+            self.stats['failed'] += failed
+            self.stats['batches'] += 1
+            self.stats['last_batch_size'] = len(batch)
+            self.stats['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    
+    @staticmethod
+    def _apply(session, record):
+        if callable(record):
+            session.flush()
+            record(session)
+        else:
+            session.add(record)
+    
+    def _write_each(self, batch):
+        """
+        Write a batch that failed as a whole, each record in its own savepoint,
+        so one bad record (e.g. a duplicate alert id) does not discard the others
+        
+        Returns:
+            (records written, records dropped)
+        """
+        written = failed = rekeyed = 0
+        last_error = None
+        session = self.session_factory()
+        try:
+            # pysqlite only opens a transaction before DML, so without this
+            # releasing the first savepoint would commit on its own
+            session.connection().exec_driver_sql('BEGIN')
+            for record in batch:
+                savepoint = session.begin_nested()
+                try:
+                    self._apply(session, record)
+                    session.flush()
+                    savepoint.commit()
+                    written += 1
+                except IntegrityError as e:
+                    savepoint.rollback()
+                    if self._rekey(session, record):
+                        written += 1
+                        rekeyed += 1
+                    else:
+                        failed += 1
+                        last_error = str(e.orig)
+                except Exception as e:
+                    savepoint.rollback()
+                    failed += 1
+                    last_error = str(e)
+            session.commit()
+        except Exception as e:
+            print(f"Error writing batch of {len(batch)} records: {e}")
+            session.rollback()
+            written, failed, rekeyed = 0, len(batch), 0
+            last_error = str(e)
+        finally:
+            session.close()
+        
+        with self.stats_lock:
+            self.stats['rekeyed'] += rekeyed
+            if last_error:
+                self.stats['last_error'] = last_error
+        return written, failed
+    
+    def _rekey(self, session, record) -> bool:
+        """Insert a record with a conflicting primary key under a new one; False if not possible"""
+        handler = None if callable(record) else self.rekey_handlers.get(type(record))
+        if handler is None:
+            return False
+        
+        mapper = inspect(record).mapper
+        key = mapper.get_property_by_column(mapper.primary_key[0]).key
+        old_id = getattr(record, key)
+        setattr(record, key, None)
+        savepoint = session.begin_nested()
+        try:
+            session.add(record)
+            session.flush()
+            savepoint.commit()
+        except Exception:
+            savepoint.rollback()
+            return False
+        handler(old_id, getattr(record, key))
+        return True
+
+
+db_writer = WriteBehindWriter(
+    Session,
+    max_queue=int(os.getenv('DB_WRITE_QUEUE_SIZE', 10000)),
+    batch_size=int(os.getenv('DB_WRITE_BATCH_SIZE', 500)),
+    flush_interval=float(os.getenv('DB_WRITE_FLUSH_INTERVAL', 1.0))
+)
+# Entry points other than main.py (e.g. gunicorn) still get a final flush
+atexit.register(db_writer.stop)
+
+
 def log_activity(action: str, description: str, user_id: int = None, ip_address: str = None):
-    session = get_session()
     try:
-        log = ActivityLog(
+        db_writer.submit(ActivityLog(
             action=action, 
             description=description, 
             user_id=user_id,
-            ip_address=ip_address
-        )
-        session.add(log)
-        session.commit()
+            ip_address=ip_address,
+            timestamp=datetime.now()
+        ))
     except Exception as e:
         print(f"Error logging activity: {e}")
-        session.rollback()
-    finally:
-        session.close()
+
+
+def store_flow_records(capture_id: int, flows: list) -> bool:
+    """Queue a batch of exported flows (FlowTable on_export dicts) as one bulk insert"""
+    now = datetime.now()
+    rows = [
+        dict(
+            flow,
+            capture_id=capture_id,
+            first_seen=datetime.fromtimestamp(flow['first_seen']),
+            last_seen=datetime.fromtimestamp(flow['last_seen']),
+            timestamp=now
+        )
+        for flow in flows
+    ]
+    try:
+        return db_writer.submit(lambda session: session.execute(FlowRecord.__table__.insert(), rows))
+    except Exception as e:
+        print(f"Error storing flow records: {e}")
+        return False
 
 
 def create_admin_user():
@@ -5,20 +5,44 @@ Monitors system metrics including CPU, RAM, disk usage, and network statistics
 
 import psutil
 import time
+import threading
+import logging
 from datetime import datetime
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
+
+from .timeseries import MetricsStore
 
 
 class SystemMonitor:
     """Monitors system performance and network metrics"""
     
-    def __init__(self):
+    def __init__(self, sample_interval: float = 2.0, metrics_store: Optional[MetricsStore] = None):
+        """
+        Args:
+            sample_interval: Seconds between background samples once the sampler is started
+            metrics_store: In-memory history fed with every published sample
+        """
         self.network_stats_baseline = psutil.net_io_counters()
         self.last_check_time = time.time()
+        self.sample_interval = sample_interval
+        self.metrics_store = metrics_store or MetricsStore()
+        
+        # Latest snapshot published by the background sampler
+        self._latest_metrics: Optional[Dict] = None
+        self._latest_at = 0.0  # time.monotonic() of the latest snapshot
+        self._metrics_lock = threading.Lock()
+        self._collect_lock = threading.Lock()  # network rates keep per-call state
+        self._sampler_thread = None
+        self._sampler_stop = threading.Event()
+        self.sample_listeners: List[Callable[[Dict], None]] = []
+        self.logger = logging.getLogger(__name__)
+        
+        # Prime psutil so the first non-blocking cpu_percent() call is meaningful
+        psutil.cpu_percent(interval=None)
     
     def get_cpu_metrics(self) -> Dict:
-        """Get CPU usage metrics"""
-        cpu_percent = psutil.cpu_percent(interval=1, percpu=False)
+        """Get CPU usage metrics (usage since the previous call, never blocks)"""
+        cpu_percent = psutil.cpu_percent(interval=None, percpu=False)
         cpu_count = psutil.cpu_count()
         cpu_freq = psutil.cpu_freq()
         
@@ -86,8 +110,8 @@ class SystemMonitor:
             'timestamp': datetime.now().isoformat()
         }
     
-    def get_all_metrics(self) -> Dict:
-        """Get all system metrics at once"""
+    def collect_metrics(self) -> Dict:
+        """Sample all system metrics from psutil right now"""
         return {
             'cpu': self.get_cpu_metrics(),
             'memory': self.get_memory_metrics(),
@@ -95,6 +119,96 @@ class SystemMonitor:
             'network': self.get_network_metrics()
         }
     
+    def get_all_metrics(self) -> Dict:
+        """
+        Get all system metrics at once
+        
+        Returns the latest snapshot taken by the background sampler. The
+        nested dicts are shared between callers and must be treated as
+        read-only. Without a running sampler (or before its first sample)
+        a synchronous sample is taken whenever the snapshot is older than
+        `sample_interval`.
+        """
+        with self._metrics_lock:
+            snapshot = self._latest_metrics
+            age = time.monotonic() - self._latest_at
+        
+        if snapshot is None or (age >= self.sample_interval and not self._sampler_running()):
+            snapshot = self._publish_sample(max_age=self.sample_interval)
+        
+        return dict(snapshot)
+    
+    def _sampler_running(self) -> bool:
+        return bool(self._sampler_thread and self._sampler_thread.is_alive())
+    
+    def add_sample_listener(self, callback: Callable[[Dict], None]):
+        """Call `callback(snapshot)` on the sampler thread for every published sample"""
+        self.sample_listeners.append(callback)
+    
+    def start_sampler(self):
+        """Start the background thread that refreshes the metrics snapshot"""
+        if self._sampler_running():
+            return
+        
+        self._sampler_stop.clear()
+        self._sampler_thread = threading.Thread(
+            target=self._sample_loop,
+            name='metrics-sampler',
+            daemon=True
+        )
+        self._sampler_thread.start()
+        self.logger.info(f"Metrics sampler started (every {self.sample_interval}s)")
+    
+    def stop_sampler(self):
+        """Stop the background sampler thread"""
+        self._sampler_stop.set()
+        if self._sampler_thread:
+            self._sampler_thread.join(timeout=self.sample_interval + 1)
+            self._sampler_thread = None
+        self.logger.info("Metrics sampler stopped")
+    
+    def _sample_loop(self):
+        """Sampler thread body: publish a snapshot on a fixed cadence"""
+        next_run = time.monotonic()
+        while not self._sampler_stop.is_set():
+            try:
+                self._publish_sample()
+            except Exception as e:
+                self.logger.error(f"Metrics sampling error: {e}")
+            
+            # Fixed cadence: sleep until the next slot rather than a full interval
+            next_run += self.sample_interval
+            delay = next_run - time.monotonic()
+            if delay < 0:
+                next_run = time.monotonic()
+                delay = 0
+            self._sampler_stop.wait(delay)
+    
+    def _publish_sample(self, max_age: Optional[float] = None) -> Dict:
+        """
+        Collect a fresh sample and make it the shared latest snapshot
+        
+        Args:
+            max_age: Reuse a snapshot younger than this many seconds instead
+                (concurrent on-demand callers then share one sample)
+        """
+        with self._collect_lock:
+            if max_age is not None:
+                with self._metrics_lock:
+                    if self._latest_metrics is not None and time.monotonic() - self._latest_at < max_age:
+                        return self._latest_metrics
+            snapshot = self.collect_metrics()
+            with self._metrics_lock:
+                self._latest_metrics = snapshot
+                self._latest_at = time.monotonic()
+        self.metrics_store.record_sample(snapshot)
+        for callback in self.sample_listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                self.logger.error(f"Sample listener error: {e}")
+        return snapshot
+    
     def get_network_connections(self) -> List[Dict]:
         """Get active network connections"""
         connections = []
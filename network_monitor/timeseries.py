@@ -0,0 +1,255 @@
+"""
+Metrics Time-Series Store
+In-memory ring buffers for recent system metrics with multi-resolution rollups
+"""
+
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+
+
+# (bucket width in seconds, number of buckets kept)
+DEFAULT_RESOLUTIONS = (
+    (1, 3600),      # raw samples, 1 hour
+    (10, 2160),     # 10s rollups, 6 hours
+    (60, 1440),     # 1m rollups, 24 hours
+    (3600, 720),    # 1h rollups, 30 days
+)
+
+ROLLUP_COLUMNS = ('min', 'max', 'avg', 'last')
+
+
+class _Ring:
+    """Fixed-capacity ring of parallel float columns, oldest entry first"""
+
+    def __init__(self, capacity: int, columns: Tuple[str, ...]):
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.columns = {name: array('d', bytes(8 * capacity)) for name in columns}
+        self.head = 0  # next write position
+        self.size = 0
+
+    def append(self, timestamp: float, values: Tuple[float, ...]):
+        """Write one entry, overwriting the oldest when full"""
+        pos = self.head
+        self.timestamps[pos] = timestamp
+        for column, value in zip(self.columns.values(), values):
+            column[pos] = value
+        self.head = (pos + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def _physical(self, index: int) -> int:
+        """Map a logical index (0 = oldest) to a position in the arrays"""
+        return (self.head - self.size + index) % self.capacity
+
+    def oldest_timestamp(self) -> Optional[float]:
+        return self.timestamps[self._physical(0)] if self.size else None
+
+    def _lower_bound(self, timestamp: float) -> int:
+        """Logical index of the first entry with a timestamp >= the given one"""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timestamps[self._physical(mid)] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def slice(self, start: Optional[float], end: Optional[float], limit: Optional[int]) -> List[Tuple[float, Dict]]:
+        """Entries in [start, end], keeping the most recent `limit` of them"""
+        first = self._lower_bound(start) if start is not None else 0
+        last = self._lower_bound(end + 1e-9) if end is not None else self.size
+        if limit is not None:
+            first = max(first, last - limit)
+
+        rows = []
+        for index in range(first, last):
+            pos = self._physical(index)
+            rows.append((
+                self.timestamps[pos],
+                {name: column[pos] for name, column in self.columns.items()}
+            ))
+        return rows
+
+    def nbytes(self) -> int:
+        return self.timestamps.itemsize * self.capacity * (1 + len(self.columns))
+
+
+class _Series:
+    """One metric: a raw ring plus a ring and open bucket per rollup resolution"""
+
+    def __init__(self, resolutions):
+        raw_width, raw_capacity = resolutions[0]
+        self.raw_width = raw_width
+        self.raw = _Ring(raw_capacity, ('value',))
+        self.rollups = []
+        for width, capacity in resolutions[1:]:
+            # open bucket: [bucket_start, min, max, sum, count, last]
+            self.rollups.append((width, _Ring(capacity, ROLLUP_COLUMNS), [None, 0.0, 0.0, 0.0, 0, 0.0]))
+
+    def add(self, timestamp: float, value: float):
+        self.raw.append(timestamp, (value,))
+
+        for width, ring, bucket in self.rollups:
+            bucket_start = timestamp - (timestamp % width)
+            if bucket[0] != bucket_start:
+                if bucket[0] is not None:
+                    ring.append(bucket[0], (bucket[1], bucket[2], bucket[3] / bucket[4], bucket[5]))
+                bucket[0] = bucket_start
+                bucket[1] = bucket[2] = bucket[3] = bucket[5] = value
+                bucket[4] = 1
+            else:
+                if value < bucket[1]:
+                    bucket[1] = value
+                if value > bucket[2]:
+                    bucket[2] = value
+                bucket[3] += value
+                bucket[4] += 1
+                bucket[5] = value
+
+    def tier(self, resolution: int):
+        """Return (ring, open bucket) for a resolution in seconds"""
+        if resolution == self.raw_width:
+            return self.raw, None
+        for width, ring, bucket in self.rollups:
+            if width == resolution:
+                return ring, bucket
+        raise ValueError(f"Unknown resolution: {resolution}s")
+
+
+class MetricsStore:
+    """
+    Bounded in-memory history of system metrics
+
+    Every series keeps raw samples plus min/max/avg/last rollups at coarser
+    resolutions, each in preallocated typed arrays, so memory use is fixed
+    per series no matter how long the process runs.
+    """
+
+    # Series recorded from a SystemMonitor snapshot: name -> (section, key, unit)
+    SAMPLE_FIELDS = {
+        'cpu': ('cpu', 'usage_percent', 'percent'),
+        'memory': ('memory', 'percent', 'percent'),
+        'swap': ('memory', 'swap_percent', 'percent'),
+        'disk': ('disk', 'percent', 'percent'),
+        'network_send': ('network', 'send_rate_mbps', 'MB/s'),
+        'network_recv': ('network', 'recv_rate_mbps', 'MB/s'),
+    }
+
+    def __init__(self, resolutions=DEFAULT_RESOLUTIONS):
+        """
+        Args:
+            resolutions: (bucket seconds, bucket count) pairs, finest first;
+                the first entry holds raw samples
+        """
+        self.resolutions = tuple(sorted(resolutions))
+        self.series: Dict[str, _Series] = {}
+        self.lock = threading.Lock()
+
+    def record(self, name: str, value: float, timestamp: Optional[float] = None):
+        """Append one sample to a series, creating the series on first use"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            series = self.series.get(name)
+            if series is None:
+                series = self.series[name] = _Series(self.resolutions)
+            series.add(timestamp, float(value))
+
+    def record_sample(self, metrics: Dict, timestamp: Optional[float] = None):
+        """Record every known series from a SystemMonitor.collect_metrics() snapshot"""
+        timestamp = time.time() if timestamp is None else timestamp
+        for name, (section, key, _unit) in self.SAMPLE_FIELDS.items():
+            value = metrics.get(section, {}).get(key)
+            if value is not None:
+                self.record(name, value, timestamp)
+
+    def retention_start(self, name: str, resolution: Optional[int] = None) -> Optional[float]:
+        """Oldest timestamp still held for a series at a resolution (None if empty)"""
+        with self.lock:
+            series = self.series.get(name)
+            if series is None:
+                return None
+            ring, _ = series.tier(resolution or self.resolutions[0][0])
+            return ring.oldest_timestamp()
+
+    def pick_resolution(self, start: Optional[float]) -> int:
+        """Finest resolution whose retention window still reaches back to `start`"""
+        if start is None:
+            return self.resolutions[0][0]
+
+        age = time.time() - start
+        for width, capacity in self.resolutions:
+            if width * capacity >= age:
+                return width
+        return self.resolutions[-1][0]
+
+    def query(self, name: str, start: Optional[float] = None, end: Optional[float] = None,
+              limit: Optional[int] = None, resolution: Optional[int] = None) -> List[Dict]:
+        """
+        Get points for a series, oldest first
+
+        Args:
+            name: Series name (e.g. 'cpu', 'memory', 'network_recv')
+            start: Earliest epoch timestamp to include (None = everything held)
+            end: Latest epoch timestamp to include (None = now)
+            limit: Keep only the most recent N points
+            resolution: Bucket width in seconds (None = picked from `start`)
+        """
+        resolution = resolution or self.pick_resolution(start)
+        unit = self.SAMPLE_FIELDS.get(name, (None, None, None))[2]
+
+        with self.lock:
+            series = self.series.get(name)
+            if series is None:
+                return []
+            ring, bucket = series.tier(resolution)
+            rows = ring.slice(start, end, limit)
+
+            # Include the still-open rollup bucket so recent data is visible
+            if bucket is not None and bucket[0] is not None:
+                in_range = (start is None or bucket[0] >= start) and (end is None or bucket[0] <= end)
+                if in_range:
+                    rows.append((bucket[0], {
+                        'min': bucket[1],
+                        'max': bucket[2],
+                        'avg': bucket[3] / bucket[4],
+                        'last': bucket[5]
+                    }))
+                    if limit is not None and len(rows) > limit:
+                        rows = rows[-limit:]
+
+        points = []
+        for timestamp, values in rows:
+            if 'value' in values:
+                value = values['value']
+                values = {'min': value, 'max': value, 'avg': value, 'last': value}
+            points.append({
+                'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+                'value': round(values['avg'], 2),
+                'min': values['min'],
+                'max': values['max'],
+                'last': values['last'],
+                'unit': unit,
+                'resolution': resolution
+            })
+        return points
+
+    def get_stats(self) -> Dict:
+        """Memory footprint and fill level of the store"""
+        with self.lock:
+            return {
+                'series': len(self.series),
+                'resolutions': [
+                    {'seconds': width, 'buckets': capacity, 'window_seconds': width * capacity}
+                    for width, capacity in self.resolutions
+                ],
+                'memory_bytes': sum(
+                    series.raw.nbytes() + sum(ring.nbytes() for _, ring, _ in series.rollups)
+                    for series in self.series.values()
+                ),
+                'raw_points': {name: series.raw.size for name, series in self.series.items()}
+            }
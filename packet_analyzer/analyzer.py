@@ -3,28 +3,84 @@ Packet Analyzer Module
 تحليل حزم البيانات الشبكية باستخدام Scapy (بديل Wireshark)
 """
 
-from scapy.all import sniff, IP, TCP, UDP, ICMP, ARP, DNS, DNSQR
-from datetime import datetime
-from typing import Dict, List, Optional
+from scapy.all import sniff, Ether, IP, IPv6, TCP, UDP, ICMP, ARP, DNS, DNSQR
+from typing import Dict, List, Optional, Tuple
 import threading
 import logging
+import os
+import time
+
+from .counters import TrafficCounters
+from .fastpath import RawCapture, decode_frame
+from .flows import FlowTable, describe_flow
+from .offline import CaptureFile
+from .pipeline import CapturePipeline
+from .recorder import PcapRingWriter
+from .sketches import TrafficSketches
+from .ring import (
+    PacketRing, encode_address, decode_address, NO_ADDRESS, NO_PORT,
+    PROTO_UNKNOWN, PROTO_TCP, PROTO_UDP, PROTO_DNS, PROTO_ICMP, PROTO_ARP
+)
+
+
+# Protocol code -> statistics counter (anything else counts as other_packets)
+PROTOCOL_STAT_KEYS = {
+    PROTO_TCP: 'tcp_packets',
+    PROTO_UDP: 'udp_packets',
+    PROTO_DNS: 'dns_packets',
+    PROTO_ICMP: 'icmp_packets',
+    PROTO_ARP: 'arp_packets'
+}
 
 
 class PacketAnalyzer:
     """محلل حزم البيانات الشبكية"""
     
-    def __init__(self, interface: str = None):
+    def __init__(self, interface: str = None, max_packets: int = None, stats_mode: str = None,
+                 stats_window: int = None):
         """
         تهيئة محلل الباكتات
         
         Args:
             interface: واجهة الشبكة للمراقبة (None = كل الواجهات)
+            max_packets: سعة الذاكرة الدائرية للباكتات (الافتراضي PACKET_BUFFER_SIZE أو 100000)
+            stats_mode: 'exact' عدّادات دقيقة، أو 'sketch' ذاكرة ثابتة لالتقاط طويل أو هجوم
+                بعناوين مزيفة (الافتراضي PACKET_STATS_MODE أو exact)
+            stats_window: نافذة العدّادات الدقيقة بثواني الالتقاط، 0 = كل الالتقاط
+                (الافتراضي PACKET_STATS_WINDOW أو 0)
         """
         self.interface = interface
         self.is_capturing = False
         self.capture_thread = None
-        self.packets_captured = []
-        self.max_packets = 1000  # الحد الأقصى للباكتات المحفوظة
+        self.bpf_filter = None
+        self.fast_path = False
+        self.pipeline = None
+        self.recorder = None
+        # الحد الأقصى للباكتات المحفوظة - الأقدم يُكتب فوقه
+        self.max_packets = max_packets or int(os.getenv('PACKET_BUFFER_SIZE', 100000))
+        self.packets_captured = PacketRing(self.max_packets)
+        # عدّادات أكثر IPs نشاطاً ومنافذ كل مصدر - على كل الالتقاط وليس آخر max_packets فقط
+        self.stats_mode = stats_mode or os.getenv('PACKET_STATS_MODE', 'exact')
+        if self.stats_mode == 'sketch':
+            self.traffic = TrafficSketches(
+                capacity=int(os.getenv('PACKET_SKETCH_CAPACITY', 1024)),
+                precision=int(os.getenv('PACKET_SKETCH_PRECISION', 8))
+            )
+        elif self.stats_mode == 'exact':
+            # الافتراضي 0 = كل الالتقاط، لأن ملخص الالتقاط المحفوظ (top_talkers والنشاطات
+            # المشبوهة) يُؤخذ من هذه العدّادات؛ نافذة بالثواني تحصرها في آخر window إلى 2×window
+            if stats_window is None:
+                stats_window = int(os.getenv('PACKET_STATS_WINDOW', 0))
+            self.traffic = TrafficCounters(window=stats_window)
+        else:
+            raise ValueError(f"Unknown packet stats mode '{self.stats_mode}' (expected exact or sketch)")
+        # جدول الـ flows ثنائية الاتجاه (سجل مختصر لكل محادثة بدل كل باكت)
+        self.flows = FlowTable(
+            idle_timeout=float(os.getenv('PACKET_FLOW_IDLE_TIMEOUT', 15)),
+            active_timeout=float(os.getenv('PACKET_FLOW_ACTIVE_TIMEOUT', 1800)),
+            max_flows=int(os.getenv('PACKET_FLOW_MAX', 65536)),
+            max_records=int(os.getenv('PACKET_FLOW_RECORDS', 10000))
+        ) if os.getenv('PACKET_FLOWS', 'true').lower() == 'true' else None
         self.statistics = {
             'total_packets': 0,
             'tcp_packets': 0,
@@ -40,37 +96,96 @@ class PacketAnalyzer:
         self.logger = logging.getLogger(__name__)
         logging.basicConfig(level=logging.INFO)
     
-    def start_capture(self, packet_count: int = 0, timeout: int = None):
+    def start_capture(self, packet_count: int = 0, timeout: int = None,
+                      bpf_filter: str = None, fast_path: bool = None, pipeline_workers: int = None,
+                      record_pcap: bool = None):
         """
         بدء التقاط الباكتات
         
         Args:
             packet_count: عدد الباكتات المطلوب التقاطها (0 = غير محدود)
             timeout: المدة بالثواني (None = غير محدود)
+            bpf_filter: فلتر BPF بصيغة tcpdump يُطبَّق في الـ kernel (مثل "tcp port 443")
+            fast_path: قراءة مباشرة من AF_PACKET وفك الترويسات بدون scapy
+                (الافتراضي PACKET_FAST_PATH)
+            pipeline_workers: عدد عمليات فك الترويسات في الالتقاط متعدد المراحل، 0 = بدون
+                (الافتراضي PACKET_PIPELINE_WORKERS أو 0؛ يستخدم AF_PACKET مثل المسار السريع)
+            record_pcap: حفظ الباكتات الخام في ملفات pcap دوّارة في PACKET_RECORD_DIR
+                (الافتراضي PACKET_RECORD)
+        
+        Raises:
+            ValueError: إذا كان الفلتر أو إعدادات التسجيل غير صالحة
         """
         if self.is_capturing:
             self.logger.warning("Packet capture already running")
             return False
         
+        if bpf_filter:
+            # التحقق من الفلتر قبل بدء الـ thread حتى يصل الخطأ للمستخدم
+            from scapy.arch.common import compile_filter
+            try:
+                compile_filter(bpf_filter, self.interface)
+            except Exception as e:
+                raise ValueError(f"Invalid BPF filter '{bpf_filter}': {e}")
+        if fast_path is None:
+            fast_path = os.getenv('PACKET_FAST_PATH', 'false').lower() == 'true'
+        if pipeline_workers is None:
+            pipeline_workers = int(os.getenv('PACKET_PIPELINE_WORKERS', 0))
+        if record_pcap is None:
+            record_pcap = os.getenv('PACKET_RECORD', 'false').lower() == 'true'
+        self.bpf_filter = bpf_filter or None
+        self.fast_path = fast_path or pipeline_workers > 0
+        self.pipeline = CapturePipeline(
+            self._merge_partial,
+            self.interface,
+            self.bpf_filter,
+            workers=pipeline_workers,
+            slots=int(os.getenv('PACKET_PIPELINE_SLOTS', 65536)),
+            slot_size=int(os.getenv('PACKET_PIPELINE_SLOT_SIZE', 256)),
+            buffer_size=int(os.getenv('PACKET_SOCKET_BUFFER', 8 * 1024 * 1024))
+        ) if pipeline_workers > 0 else None
+        # ملفات pcap دوّارة: عدد ثابت من الملفات، الأقدم يُحذف
+        # مع الـ pipeline تُسجَّل الباكتات مقصوصة لحجم الـ slot، فالـ snaplen في الملف هو حجمها الفعلي
+        self.recorder = PcapRingWriter(
+            os.getenv('PACKET_RECORD_DIR', 'captures'),
+            max_files=int(os.getenv('PACKET_RECORD_FILES', 10)),
+            max_file_bytes=int(os.getenv('PACKET_RECORD_FILE_MB', 100)) * 1024 * 1024,
+            max_file_seconds=float(os.getenv('PACKET_RECORD_FILE_SECONDS', 300)),
+            fsync=os.getenv('PACKET_RECORD_FSYNC', 'rotate'),
+            fsync_interval=float(os.getenv('PACKET_RECORD_FSYNC_INTERVAL', 5)),
+            snaplen=self.pipeline.snaplen if self.pipeline else 65535
+        ) if record_pcap else None
+        if self.pipeline and self.recorder:
+            self.pipeline.on_frame = self.recorder.write
+        
         self.is_capturing = True
-        self.packets_captured = []
+        self.packets_captured.clear()
+        self.traffic.clear()
+        if self.flows:
+            self.flows.clear()
         self.statistics = {key: 0 for key in self.statistics}
         
         # بدء الالتقاط في thread منفصل
         self.capture_thread = threading.Thread(
-            target=self._capture_packets,
+            target=self._capture_pipelined if self.pipeline else self._capture_fast if fast_path else self._capture_packets,
             args=(packet_count, timeout),
             daemon=True
         )
         self.capture_thread.start()
-        self.logger.info(f"Packet capture started on interface: {self.interface or 'all'}")
+        self.logger.info(
+            f"Packet capture started on interface: {self.interface or 'all'}"
+            f"{f' filter: {bpf_filter}' if bpf_filter else ''}{f' ({pipeline_workers} pipeline workers)' if self.pipeline else ' (fast path)' if fast_path else ''}"
+        )
         return True
     
     def stop_capture(self):
         """إيقاف التقاط الباكتات"""
         self.is_capturing = False
         if self.capture_thread:
-            self.capture_thread.join(timeout=2)
+            # الـ pipeline ينتظر العمليات حتى تفرغ طوابيرها وترسل آخر تجميع
+            self.capture_thread.join(timeout=15 if self.pipeline else 2)
+        if self.recorder:
+            self.recorder.close()
         self.logger.info("Packet capture stopped")
         return True
     
@@ -85,6 +200,7 @@ class PacketAnalyzer:
         try:
             sniff(
                 iface=self.interface,
+                filter=self.bpf_filter,
                 prn=self._process_packet,
                 count=packet_count if packet_count > 0 else 0,
                 timeout=timeout,
@@ -94,7 +210,137 @@ class PacketAnalyzer:
         except Exception as e:
             self.logger.error(f"Capture error: {e}")
         finally:
-            self.is_capturing = False
+            self._finish_capture()
+    
+    def _capture_fast(self, packet_count: int, timeout: int):
+        """
+        الالتقاط عبر المسار السريع (AF_PACKET + فك الترويسات بـ struct)
+        
+        Args:
+            packet_count: عدد الباكتات
+            timeout: المدة الزمنية
+        """
+        try:
+            RawCapture(
+                self.interface,
+                self.bpf_filter,
+                buffer_size=int(os.getenv('PACKET_SOCKET_BUFFER', 8 * 1024 * 1024))
+            ).run(
+                self._record,
+                packet_count=packet_count,
+                timeout=timeout,
+                should_stop=lambda: not self.is_capturing,
+                on_frame=self.recorder.write if self.recorder else None
+            )
+        except Exception as e:
+            self.logger.error(f"Capture error: {e}")
+        finally:
+            self._finish_capture()
+    
+    def _capture_pipelined(self, packet_count: int, timeout: int):
+        """
+        الالتقاط متعدد المراحل (thread للالتقاط وعمليات لفك الترويسات)
+        
+        Args:
+            packet_count: عدد الباكتات
+            timeout: المدة الزمنية
+        """
+        try:
+            self.pipeline.run(
+                packet_count=packet_count,
+                timeout=timeout,
+                should_stop=lambda: not self.is_capturing
+            )
+        except Exception as e:
+            self.logger.error(f"Capture error: {e}")
+        finally:
+            self._finish_capture()
+    
+    def _finish_capture(self):
+        """انتهاء الالتقاط (إيقاف أو timeout أو عدد الباكتات): إغلاق ملف pcap الحالي وتصدير الـ flows المتبقية"""
+        self.is_capturing = False
+        if self.recorder:
+            self.recorder.close()
+        if self.flows:
+            self.flows.flush()
+    
+    def _merge_partial(self, partial: Dict):
+        """
+        دمج تجميع جزئي من عملية فك ترويسات في الإحصائيات والعدّادات
+        
+        Args:
+            partial: الأعداد منذ آخر دمج (من CapturePipeline)
+        """
+        statistics = self.statistics
+        statistics['total_packets'] += partial['count']
+        statistics['total_bytes'] += partial['bytes']
+        for protocol, count in partial['protocols'].items():
+            statistics[PROTOCOL_STAT_KEYS.get(protocol, 'other_packets')] += count
+        self.traffic.merge(
+            partial['timestamp'], partial['packets'], partial['byte_counts'],
+            partial['ports'], partial['sources']
+        )
+        # الذاكرة الدائرية تحفظ آخر الباكتات من كل دمج فقط
+        for record in partial['recent']:
+            self.packets_captured.append(*record)
+    
+    def analyze_file(self, path: str, chunk_size: int = 64 * 1024 * 1024) -> Dict:
+        """
+        تحليل ملف pcap/pcapng مسجَّل بنفس الإحصائيات وعدّادات أكثر IPs نشاطاً وكشف النشاطات المشبوهة
+        
+        الملف يُقرأ على أجزاء مربوطة بالذاكرة (mmap) فلا يلزم أن يتسع في الذاكرة،
+        والنافذة الزمنية للعدّادات تتبع توقيت الباكتات في الملف
+        
+        Args:
+            path: مسار الملف
+            chunk_size: حجم كل جزء يُربط بالذاكرة بالبايت
+            
+        Returns:
+            ملخص القراءة: عدد الباكتات والبايتات، الفترة المسجّلة، والسرعة (باكت/ثانية)
+        
+        Raises:
+            ValueError: إذا لم يكن الملف pcap أو pcapng
+            RuntimeError: إذا كان الالتقاط الحي يعمل
+        """
+        if self.is_capturing:
+            raise RuntimeError("Packet capture is running")
+        
+        self.packets_captured.clear()
+        self.traffic.clear()
+        if self.flows:
+            self.flows.clear()
+        self.statistics = {key: 0 for key in self.statistics}
+        record = self._record
+        first_timestamp = last_timestamp = None
+        packets = 0
+        started = time.perf_counter()
+        with CaptureFile(path, chunk_size) as capture:
+            for timestamp, length, frame, ethernet in capture:
+                record(timestamp, length, *decode_frame(frame, len(frame), ethernet))
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                last_timestamp = timestamp
+                packets += 1
+            if self.flows:
+                self.flows.flush()
+            elapsed = time.perf_counter() - started
+            summary = {
+                'file': path,
+                'format': capture.format,
+                'file_bytes': capture.size,
+                'packets': packets,
+                'bytes': self.statistics['total_bytes'],
+                'first_timestamp': first_timestamp,
+                'last_timestamp': last_timestamp,
+                'truncated': capture.truncated,
+                'elapsed_seconds': round(elapsed, 3),
+                'packets_per_second': round(packets / elapsed) if elapsed > 0 else 0
+            }
+        
+        if summary['truncated']:
+            self.logger.warning(f"{path}: file ends in the middle of a packet")
+        self.logger.info(f"Analyzed {packets} packets from {path} ({summary['packets_per_second']} packets/s)")
+        return summary
     
     def _process_packet(self, packet):
         """
@@ -104,88 +350,94 @@ class PacketAnalyzer:
             packet: الباكت الملتقط
         """
         try:
-            # تحديث الإحصائيات
-            self.statistics['total_packets'] += 1
-            self.statistics['total_bytes'] += len(packet)
-            
-            # استخراج معلومات الباكت
-            packet_info = self._extract_packet_info(packet)
-            
-            # تحديث إحصائيات البروتوكول
-            protocol = packet_info.get('protocol', 'other').lower()
-            stat_key = f'{protocol}_packets'
-            if stat_key in self.statistics:
-                self.statistics[stat_key] += 1
-            else:
-                self.statistics['other_packets'] += 1
-            
-            # حفظ الباكت (مع الحد الأقصى)
-            if len(self.packets_captured) >= self.max_packets:
-                self.packets_captured.pop(0)  # حذف أقدم باكت
-            
-            self.packets_captured.append(packet_info)
-            
+            timestamp = float(getattr(packet, 'time', 0) or time.time())
+            if self.recorder and isinstance(packet, Ether):
+                self.recorder.write(timestamp, packet.original or bytes(packet), len(packet))
+            self._record(timestamp, len(packet), *self._extract_fields(packet))
         except Exception as e:
             self.logger.error(f"Packet processing error: {e}")
     
-    def _extract_packet_info(self, packet) -> Dict:
+    def _record(self, timestamp: float, length: int, protocol: int, src_ip: int, dst_ip: int,
+                src_port: int, dst_port: int, info: str):
         """
-        استخراج معلومات من الباكت
+        تسجيل باكت مفكوكة (من scapy أو المسار السريع) في الذاكرة الدائرية والعدّادات
+        
+        Args:
+            timestamp: وقت الالتقاط
+            length: حجم الباكت بالبايت
+            protocol: رمز البروتوكول (PROTO_* أو رقم بروتوكول IP)
+            src_ip, dst_ip, src_port, dst_port, info: كما في PacketRing
+        """
+        self.packets_captured.append(timestamp, length, protocol, src_ip, dst_ip, src_port, dst_port, info)
+        self.traffic.observe(timestamp, length, src_ip, dst_ip, dst_port)
+        if self.flows:
+            self.flows.observe(timestamp, length, protocol, src_ip, dst_ip, src_port, dst_port, info)
+        
+        # تحديث الإحصائيات
+        statistics = self.statistics
+        statistics['total_packets'] += 1
+        statistics['total_bytes'] += length
+        statistics[PROTOCOL_STAT_KEYS.get(protocol, 'other_packets')] += 1
+    
+    def _extract_fields(self, packet) -> Tuple[int, int, int, int, int, str]:
+        """
+        استخراج معلومات الباكت من تشريح scapy
         
         Args:
             packet: الباكت
             
         Returns:
-            قاموس بمعلومات الباكت
-        """
-        info = {
-            'timestamp': datetime.now().isoformat(),
-            'length': len(packet),
-            'protocol': 'Unknown',
-            'src_ip': None,
-            'dst_ip': None,
-            'src_port': None,
-            'dst_port': None,
-            'info': ''
-        }
+            (protocol, src_ip, dst_ip, src_port, dst_port, info)
+        """
+        protocol = PROTO_UNKNOWN
+        src_ip = dst_ip = NO_ADDRESS
+        src_port = dst_port = NO_PORT
+        info = ''
         
-        # فحص طبقة IP
-        if IP in packet:
-            info['src_ip'] = packet[IP].src
-            info['dst_ip'] = packet[IP].dst
-            info['protocol'] = packet[IP].proto
+        # فحص طبقة IP / IPv6
+        ip = packet[IP] if IP in packet else packet[IPv6] if IPv6 in packet else None
+        if ip is not None:
+            src_ip = encode_address(ip.src)
+            dst_ip = encode_address(ip.dst)
+            protocol = ip.proto if IP in packet else ip.nh
             
             # فحص TCP
             if TCP in packet:
-                info['protocol'] = 'TCP'
-                info['src_port'] = packet[TCP].sport
-                info['dst_port'] = packet[TCP].dport
-                info['info'] = f"Flags: {packet[TCP].flags}"
+                tcp = packet[TCP]
+                protocol = PROTO_TCP
+                src_port = tcp.sport
+                dst_port = tcp.dport
+                info = f"Flags: {tcp.flags}"
             
             # فحص UDP
             elif UDP in packet:
-                info['protocol'] = 'UDP'
-                info['src_port'] = packet[UDP].sport
-                info['dst_port'] = packet[UDP].dport
+                udp = packet[UDP]
+                protocol = PROTO_UDP
+                src_port = udp.sport
+                dst_port = udp.dport
                 
                 # فحص DNS
                 if DNS in packet and packet.haslayer(DNSQR):
-                    info['protocol'] = 'DNS'
-                    info['info'] = f"Query: {packet[DNSQR].qname.decode('utf-8', errors='ignore')}"
+                    protocol = PROTO_DNS
+                    info = f"Query: {packet[DNSQR].qname.decode('utf-8', errors='ignore')}"
             
-            # فحص ICMP
+            # فحص ICMP / ICMPv6
             elif ICMP in packet:
-                info['protocol'] = 'ICMP'
-                info['info'] = f"Type: {packet[ICMP].type}"
+                protocol = PROTO_ICMP
+                info = f"Type: {packet[ICMP].type}"
+            elif protocol == 58 and ip.payload:
+                protocol = PROTO_ICMP
+                info = f"Type: {ip.payload.type}"
         
         # فحص ARP
         elif ARP in packet:
-            info['protocol'] = 'ARP'
-            info['src_ip'] = packet[ARP].psrc
-            info['dst_ip'] = packet[ARP].pdst
-            info['info'] = f"Op: {packet[ARP].op}"
+            arp = packet[ARP]
+            protocol = PROTO_ARP
+            src_ip = encode_address(arp.psrc)
+            dst_ip = encode_address(arp.pdst)
+            info = f"Op: {arp.op}"
         
-        return info
+        return protocol, src_ip, dst_ip, src_port, dst_port, info
     
     def get_recent_packets(self, limit: int = 50) -> List[Dict]:
         """
@@ -197,7 +449,7 @@ class PacketAnalyzer:
         Returns:
             قائمة بالباكتات
         """
-        return self.packets_captured[-limit:]
+        return self.packets_captured.recent(limit)
     
     def get_statistics(self) -> Dict:
         """
@@ -208,7 +460,19 @@ class PacketAnalyzer:
         """
         stats = self.statistics.copy()
         stats['is_capturing'] = self.is_capturing
+        stats['bpf_filter'] = self.bpf_filter
+        stats['fast_path'] = self.fast_path
+        if self.pipeline:
+            # معدل كل مرحلة وعمق الطوابير والباكتات المفقودة
+            stats['pipeline'] = self.pipeline.get_status()
+        if self.recorder:
+            stats['pcap_recording'] = self.recorder.get_status()
+        if self.flows:
+            self._expire_flows()
+            stats['flows'] = self.flows.get_status()
         stats['packets_stored'] = len(self.packets_captured)
+        # دقة وحجم ذاكرة عدّادات أكثر IPs نشاطاً
+        stats['traffic_counters'] = self.traffic.get_status()
         
         # حساب النسب المئوية
         total = stats['total_packets']
@@ -221,6 +485,46 @@ class PacketAnalyzer:
         
         return stats
     
+    def get_pcap_segments(self, start: float = None, end: float = None) -> List[Dict]:
+        """
+        ملفات pcap المسجّلة التي تغطي فترة زمنية
+        
+        Args:
+            start: بداية الفترة (unix timestamp، None = من البداية)
+            end: نهاية الفترة (None = حتى الآن)
+            
+        Returns:
+            قائمة بالملفات وفترة كل ملف وعدد باكتاته، الأقدم أولاً
+        """
+        if not self.recorder:
+            return []
+        return self.recorder.get_segments(start, end)
+    
+    def get_flows(self, limit: int = 100, active: bool = False) -> List[Dict]:
+        """
+        سجلات الـ flows (محادثات 5-tuple ثنائية الاتجاه)
+        
+        الـ flows لا تُحسب في الالتقاط متعدد المراحل لأن باكتات المحادثة الواحدة
+        تتوزع على أكثر من عملية
+        
+        Args:
+            limit: الحد الأقصى للسجلات
+            active: True = الـ flows الجارية الأكبر حجماً أولاً، False = آخر السجلات المصدَّرة
+            
+        Returns:
+            قائمة بالـ flows: العناوين والمنافذ، الباكتات والبايتات في كل اتجاه، أعلام TCP وحالتها وسبب الانتهاء
+        """
+        if not self.flows:
+            return []
+        self._expire_flows()
+        flows = self.flows.active(limit) if active else self.flows.recent(limit)
+        return [describe_flow(flow) for flow in flows]
+    
+    def _expire_flows(self):
+        """مهلة الخمول تتقدم بتوقيت الباكتات، فأثناء الالتقاط الحي الهادئ تُطبَّق بالوقت الحالي"""
+        if self.is_capturing and not self.pipeline:
+            self.flows.expire(time.time())
+    
     def get_protocol_distribution(self) -> Dict:
         """
         الحصول على توزيع البروتوكولات
@@ -237,37 +541,20 @@ class PacketAnalyzer:
             'Other': self.statistics['other_packets']
         }
     
-    def get_top_talkers(self, limit: int = 10) -> List[Dict]:
+    def get_top_talkers(self, limit: int = 10, by: str = 'packets') -> List[Dict]:
         """
         الحصول على أكثر IPs نشاطاً
         
         Args:
             limit: عدد النتائج
+            by: الترتيب حسب 'packets' أو 'bytes'
             
         Returns:
             قائمة بأكثر IPs نشاطاً
         """
-        ip_stats = {}
-        
-        for packet in self.packets_captured:
-            src_ip = packet.get('src_ip')
-            dst_ip = packet.get('dst_ip')
-            
-            if src_ip:
-                ip_stats[src_ip] = ip_stats.get(src_ip, 0) + 1
-            if dst_ip:
-                ip_stats[dst_ip] = ip_stats.get(dst_ip, 0) + 1
-        
-        # ترتيب حسب عدد الباكتات
-        sorted_ips = sorted(
-            ip_stats.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:limit]
-        
         return [
-            {'ip': ip, 'packets': count}
-            for ip, count in sorted_ips
+            {'ip': decode_address(ip), 'packets': packets, 'bytes': byte_count}
+            for ip, packets, byte_count in self.traffic.top_talkers(limit, by)
         ]
     
     def analyze_traffic_pattern(self) -> Dict:
@@ -305,27 +592,29 @@ class PacketAnalyzer:
         
         # كشف Port Scanning (عدد كبير من الاتصالات لنفس IP)
         port_scan_threshold = 20
-        ip_connections = {}
-        
-        for packet in self.packets_captured:
-            src_ip = packet.get('src_ip')
-            dst_port = packet.get('dst_port')
-            
-            if src_ip and dst_port:
-                if src_ip not in ip_connections:
-                    ip_connections[src_ip] = set()
-                ip_connections[src_ip].add(dst_port)
         
         # فحص IPs المشبوهة
-        for ip, ports in ip_connections.items():
-            if len(ports) > port_scan_threshold:
-                suspicious.append({
-                    'type': 'Port Scanning',
-                    'severity': 'high',
-                    'source_ip': ip,
-                    'description': f'Possible port scan detected from {ip} ({len(ports)} ports)',
-                    'ports_count': len(ports)
-                })
+        for address, ports_count in self.traffic.port_scanners(port_scan_threshold):
+            ip = decode_address(address)
+            suspicious.append({
+                'type': 'Port Scanning',
+                'severity': 'high',
+                'source_ip': ip,
+                'description': f'Possible port scan detected from {ip} ({ports_count} ports)',
+                'ports_count': ports_count
+            })
+        
+        # كشف DDoS (عدد كبير من المصادر المختلفة لنفس الهدف)
+        ddos_threshold = 1000
+        for address, sources_count in self.traffic.flood_targets(ddos_threshold):
+            ip = decode_address(address)
+            suspicious.append({
+                'type': 'DDoS',
+                'severity': 'critical',
+                'target_ip': ip,
+                'description': f'Possible DDoS against {ip} ({sources_count} distinct sources)',
+                'sources_count': sources_count
+            })
         
         # كشف DNS Tunneling (عدد كبير من DNS queries)
         dns_threshold = 50
@@ -353,6 +642,9 @@ class PacketAnalyzer:
     
     def clear_capture(self):
         """مسح البيانات المحفوظة"""
-        self.packets_captured = []
+        self.packets_captured.clear()
+        self.traffic.clear()
+        if self.flows:
+            self.flows.clear()
         self.statistics = {key: 0 for key in self.statistics}
         self.logger.info("Capture data cleared")
\ No newline at end of file
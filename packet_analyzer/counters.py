@@ -0,0 +1,191 @@
+"""
+Traffic Counters
+عدّادات الترافيك المحدّثة لحظة الالتقاط (أكثر IPs نشاطاً، منافذ كل مصدر ومصادر كل هدف)
+"""
+
+from typing import Dict, List, Set, Tuple
+import heapq
+import sys
+import threading
+
+from .ring import NO_ADDRESS
+
+
+class _Epoch:
+    """Counters for one window of capture time"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.packets: Dict[int, int] = {}
+        self.bytes: Dict[int, int] = {}
+        self.ports: Dict[int, Set[int]] = {}
+        self.sources: Dict[int, Set[int]] = {}
+
+
+class TrafficCounters:
+    """
+    Per-IP packet/byte counts, per-source destination ports and
+    per-destination sources, updated per packet
+
+    Counting happens at ingest time, so queries cost O(distinct IPs) no
+    matter how many packets were captured. With a window the counters
+    rotate on packet timestamps between a current and a previous epoch,
+    and queries cover the last `window` to 2 * `window` seconds; without
+    one they cover the whole capture.
+    """
+
+    def __init__(self, window: int = 0, max_ports_per_source: int = 1024,
+                 max_sources_per_destination: int = 4096):
+        """
+        Args:
+            window: Epoch length in seconds of capture time (0 = whole capture)
+            max_ports_per_source: Distinct destination ports remembered per
+                source; past this a source is reported with this many ports
+            max_sources_per_destination: Same cap for distinct sources per destination
+        """
+        self.window = window
+        self.max_ports_per_source = max_ports_per_source
+        self.max_sources_per_destination = max_sources_per_destination
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.current = _Epoch(0)
+            self.previous = _Epoch(-1)
+            # Distinct IPs over both epochs, kept up to date so get_status stays O(1)
+            self.tracked_ips = 0
+
+    def observe(self, timestamp: float, length: int, src_ip: int, dst_ip: int, dst_port: int):
+        """Count one packet (addresses/ports encoded as in PacketRing)"""
+        with self.lock:
+            epoch = self._epoch_for(timestamp)
+            packets = epoch.packets
+            byte_counts = epoch.bytes
+            other = self.previous.packets if epoch is self.current else self.current.packets
+            if src_ip != NO_ADDRESS:
+                count = packets.get(src_ip)
+                if count is None:
+                    count = 0
+                    if src_ip not in other:
+                        self.tracked_ips += 1
+                packets[src_ip] = count + 1
+                byte_counts[src_ip] = byte_counts.get(src_ip, 0) + length
+                if dst_port > 0:
+                    ports = epoch.ports.get(src_ip)
+                    if ports is None:
+                        ports = epoch.ports[src_ip] = set()
+                    if len(ports) < self.max_ports_per_source:
+                        ports.add(dst_port)
+            if dst_ip != NO_ADDRESS:
+                count = packets.get(dst_ip)
+                if count is None:
+                    count = 0
+                    if dst_ip not in other:
+                        self.tracked_ips += 1
+                packets[dst_ip] = count + 1
+                byte_counts[dst_ip] = byte_counts.get(dst_ip, 0) + length
+                if src_ip != NO_ADDRESS:
+                    sources = epoch.sources.get(dst_ip)
+                    if sources is None:
+                        sources = epoch.sources[dst_ip] = set()
+                    if len(sources) < self.max_sources_per_destination:
+                        sources.add(src_ip)
+
+    def merge(self, timestamp: float, packets: Dict[int, int], byte_counts: Dict[int, int],
+              ports: Dict[int, Set[int]], sources: Dict[int, Set[int]]):
+        """Add counts aggregated elsewhere (e.g. by a pipeline worker) up to `timestamp`"""
+        with self.lock:
+            epoch = self._epoch_for(timestamp)
+            other = self.previous.packets if epoch is self.current else self.current.packets
+            for ip in packets.keys() - epoch.packets.keys():
+                if ip not in other:
+                    self.tracked_ips += 1
+            for target, delta in ((epoch.packets, packets), (epoch.bytes, byte_counts)):
+                for ip, count in delta.items():
+                    target[ip] = target.get(ip, 0) + count
+            for target, delta, cap in ((epoch.ports, ports, self.max_ports_per_source),
+                                       (epoch.sources, sources, self.max_sources_per_destination)):
+                for ip, members in delta.items():
+                    known = target.get(ip)
+                    if known is None:
+                        known = target[ip] = set()
+                    if len(known) + len(members) <= cap:
+                        known.update(members)
+                        continue
+                    for member in members:
+                        if len(known) >= cap:
+                            break
+                        known.add(member)
+
+    def _epoch_for(self, timestamp: float) -> _Epoch:
+        if self.window:
+            index = int(timestamp // self.window)
+            if index != self.current.index:
+                return self._rotate(index)
+        return self.current
+
+    def _rotate(self, index: int) -> _Epoch:
+        if index < self.current.index:
+            # Late packet from the previous epoch (or older): count it there
+            return self.previous if index == self.previous.index else self.current
+        if self.current.index == 0 and not self.current.packets:
+            # First packet after a clear
+            self.current.index = index
+            return self.current
+        self.previous = self.current if index == self.current.index + 1 else _Epoch(index - 1)
+        self.current = _Epoch(index)
+        self.tracked_ips = len(self.previous.packets)
+        return self.current
+
+    def top_talkers(self, limit: int = 10, by: str = 'packets') -> List[Tuple[int, int, int]]:
+        """(ip, packets, bytes) of the `limit` busiest addresses by packets or bytes"""
+        with self.lock:
+            packets = dict(self.previous.packets)
+            byte_counts = dict(self.previous.bytes)
+            for ip, count in self.current.packets.items():
+                packets[ip] = packets.get(ip, 0) + count
+            for ip, count in self.current.bytes.items():
+                byte_counts[ip] = byte_counts.get(ip, 0) + count
+        ranked = byte_counts if by == 'bytes' else packets
+        busiest = heapq.nlargest(limit, ranked, key=ranked.get)
+        return [(ip, packets[ip], byte_counts.get(ip, 0)) for ip in busiest]
+
+    def port_scanners(self, threshold: int) -> List[Tuple[int, int]]:
+        """(source ip, distinct destination ports) for sources above `threshold`"""
+        with self.lock:
+            return self._distinct_above(self.current.ports, self.previous.ports, threshold, self.max_ports_per_source)
+
+    def flood_targets(self, threshold: int) -> List[Tuple[int, int]]:
+        """(destination ip, distinct sources) for destinations above `threshold`"""
+        with self.lock:
+            return self._distinct_above(self.current.sources, self.previous.sources, threshold,
+                                        self.max_sources_per_destination)
+
+    @staticmethod
+    def _distinct_above(current: Dict[int, Set[int]], previous: Dict[int, Set[int]],
+                        threshold: int, cap: int) -> List[Tuple[int, int]]:
+        found = []
+        for ip, members in current.items():
+            count = len(members | previous[ip]) if ip in previous else len(members)
+            if count > threshold:
+                found.append((ip, min(count, cap)))
+        for ip, members in previous.items():
+            if ip not in current and len(members) > threshold:
+                found.append((ip, len(members)))
+        return found
+
+    def get_status(self) -> Dict:
+        with self.lock:
+            # Approximate and O(1): every port/source set is counted at its
+            # small-set size, which is what dominates under a spoofed flood
+            memory = 0
+            for epoch in (self.current, self.previous):
+                memory += sum(sys.getsizeof(table) for table in (epoch.packets, epoch.bytes, epoch.ports, epoch.sources))
+                memory += (len(epoch.ports) + len(epoch.sources)) * sys.getsizeof(set())
+            return {
+                'mode': 'exact',
+                'window_seconds': self.window,
+                'tracked_ips': self.tracked_ips,
+                'memory_bytes': memory
+            }
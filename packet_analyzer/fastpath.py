@@ -0,0 +1,224 @@
+"""
+Packet Fast Path
+التقاط مباشر من AF_PACKET وفك الترويسات بـ struct بدل تشريح scapy الكامل
+"""
+
+from typing import Callable, Optional, Tuple
+import logging
+import socket
+import struct
+import time
+
+from .ring import (
+    NO_ADDRESS, NO_PORT, IPV6_FLAG,
+    PROTO_UNKNOWN, PROTO_TCP, PROTO_UDP, PROTO_DNS, PROTO_ICMP, PROTO_ARP
+)
+
+
+ETH_P_ALL = 0x0003
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_ARP = 0x0806
+ETHERTYPE_IPV6 = 0x86DD
+VLAN_ETHERTYPES = (0x8100, 0x88A8)
+ARPHRD_ETHER = 1
+ARPHRD_LOOPBACK = 772
+PACKET_OUTGOING = 4
+SOL_PACKET = 263
+PACKET_ADD_MEMBERSHIP = 1
+PACKET_MR_PROMISC = 1
+
+IPV6_EXTENSION_HEADERS = (0, 43, 60)  # hop-by-hop, routing, destination options
+IPV6_FRAGMENT_HEADER = 44
+DNS_PORTS = (53, 5353)
+
+_U16 = struct.Struct('!H')
+_U32 = struct.Struct('!I')
+_PAIR16 = struct.Struct('!HH')
+_PAIR32 = struct.Struct('!II')
+
+# Same text scapy produces, precomputed so decoding allocates no strings
+TCP_FLAG_INFO = tuple(
+    'Flags: ' + ''.join(letter for bit, letter in enumerate('FSRPAUECN') if value & (1 << bit))
+    for value in range(512)
+)
+ICMP_TYPE_INFO = tuple(f"Type: {value}" for value in range(256))
+
+
+def _dns_query(buf, pos: int, length: int) -> Optional[str]:
+    """First question name of a DNS message at `pos`, or None if it has no question"""
+    if length < pos + 12 or _U16.unpack_from(buf, pos + 4)[0] == 0:
+        return None
+    pos += 12
+    labels = []
+    while pos < length:
+        size = buf[pos]
+        if size == 0 or size >= 0xC0:
+            break
+        labels.append(bytes(buf[pos + 1:pos + 1 + size]).decode('utf-8', errors='ignore'))
+        pos += 1 + size
+    return '.'.join(labels) + '.'
+
+
+def decode_frame(buf, length: int, ethernet: bool = True) -> Tuple[int, int, int, int, int, str]:
+    """
+    Decode the headers the analyzer records, the way the scapy path does
+
+    Args:
+        buf: Frame bytes (bytes, bytearray or memoryview)
+        length: Number of valid bytes in `buf`
+        ethernet: False for link types that start directly at the IP header
+
+    Returns:
+        (protocol, src_ip, dst_ip, src_port, dst_port, info) encoded as in PacketRing
+    """
+    if ethernet:
+        if length < 14:
+            return PROTO_UNKNOWN, NO_ADDRESS, NO_ADDRESS, NO_PORT, NO_PORT, ''
+        ethertype = _U16.unpack_from(buf, 12)[0]
+        offset = 14
+        while ethertype in VLAN_ETHERTYPES and length >= offset + 4:
+            ethertype = _U16.unpack_from(buf, offset + 2)[0]
+            offset += 4
+    else:
+        version = buf[0] >> 4 if length else 0
+        ethertype = ETHERTYPE_IPV4 if version == 4 else ETHERTYPE_IPV6 if version == 6 else 0
+        offset = 0
+
+    if ethertype == ETHERTYPE_IPV4 and length >= offset + 20:
+        protocol = buf[offset + 9]
+        src_ip, dst_ip = _PAIR32.unpack_from(buf, offset + 12)
+        if _U16.unpack_from(buf, offset + 6)[0] & 0x1FFF:
+            # Later fragment: no transport header
+            return protocol, src_ip, dst_ip, NO_PORT, NO_PORT, ''
+        l4 = offset + (buf[offset] & 0x0F) * 4
+
+    elif ethertype == ETHERTYPE_IPV6 and length >= offset + 40:
+        protocol = buf[offset + 6]
+        src_ip = int.from_bytes(buf[offset + 8:offset + 24], 'big') | IPV6_FLAG
+        dst_ip = int.from_bytes(buf[offset + 24:offset + 40], 'big') | IPV6_FLAG
+        l4 = offset + 40
+        while (protocol in IPV6_EXTENSION_HEADERS or protocol == IPV6_FRAGMENT_HEADER) and length >= l4 + 8:
+            if protocol == IPV6_FRAGMENT_HEADER:
+                if _U16.unpack_from(buf, l4 + 2)[0] & 0xFFF8:
+                    return buf[l4], src_ip, dst_ip, NO_PORT, NO_PORT, ''
+                protocol = buf[l4]
+                l4 += 8
+            else:
+                protocol, l4 = buf[l4], l4 + (buf[l4 + 1] + 1) * 8
+
+    elif ethertype == ETHERTYPE_ARP and length >= offset + 28:
+        src_ip = _U32.unpack_from(buf, offset + 14)[0]
+        dst_ip = _U32.unpack_from(buf, offset + 24)[0]
+        return PROTO_ARP, src_ip, dst_ip, NO_PORT, NO_PORT, f"Op: {_U16.unpack_from(buf, offset + 6)[0]}"
+
+    else:
+        return PROTO_UNKNOWN, NO_ADDRESS, NO_ADDRESS, NO_PORT, NO_PORT, ''
+
+    if protocol == 6 and length >= l4 + 14:
+        src_port, dst_port = _PAIR16.unpack_from(buf, l4)
+        return PROTO_TCP, src_ip, dst_ip, src_port, dst_port, TCP_FLAG_INFO[((buf[l4 + 12] & 1) << 8) | buf[l4 + 13]]
+
+    if protocol == 17 and length >= l4 + 8:
+        src_port, dst_port = _PAIR16.unpack_from(buf, l4)
+        if src_port in DNS_PORTS or dst_port in DNS_PORTS:
+            query = _dns_query(buf, l4 + 8, length)
+            if query is not None:
+                return PROTO_DNS, src_ip, dst_ip, src_port, dst_port, 'Query: ' + query
+        return PROTO_UDP, src_ip, dst_ip, src_port, dst_port, ''
+
+    if (protocol == 1 or protocol == 58) and length > l4:
+        return PROTO_ICMP, src_ip, dst_ip, NO_PORT, NO_PORT, ICMP_TYPE_INFO[buf[l4]]
+
+    return protocol, src_ip, dst_ip, NO_PORT, NO_PORT, ''
+
+
+class RawCapture:
+    """
+    Capture loop on an AF_PACKET socket (Linux, needs CAP_NET_RAW)
+
+    Frames are received into one reusable buffer and only decoded by
+    decode_frame; an optional BPF filter is compiled with libpcap and
+    attached to the socket, so unwanted frames never leave the kernel.
+    Like scapy's sniff(), a bound interface is put in promiscuous mode
+    (as a socket membership, which the kernel undoes when it is closed).
+    """
+
+    def __init__(self, interface: Optional[str] = None, bpf_filter: Optional[str] = None,
+                 buffer_size: int = 8 * 1024 * 1024, promisc: bool = True):
+        """
+        Args:
+            interface: Interface to bind to (None = all interfaces)
+            bpf_filter: tcpdump-style filter expression
+            buffer_size: Kernel receive buffer in bytes, absorbs bursts
+            promisc: Receive frames addressed to other hosts on the bound interface
+        """
+        self.interface = interface
+        self.bpf_filter = bpf_filter
+        self.buffer_size = buffer_size
+        self.promisc = promisc
+        self.logger = logging.getLogger(__name__)
+
+    def open(self) -> socket.socket:
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.buffer_size)
+            if self.interface:
+                sock.bind((self.interface, ETH_P_ALL))
+                if self.promisc:
+                    membership = struct.pack('iHH8s', socket.if_nametoindex(self.interface), PACKET_MR_PROMISC, 0, b'')
+                    sock.setsockopt(SOL_PACKET, PACKET_ADD_MEMBERSHIP, membership)
+            elif self.promisc:
+                self.logger.info("No capture interface set: listening on all interfaces without promiscuous mode")
+            if self.bpf_filter:
+                from scapy.arch.linux import attach_filter
+                attach_filter(sock, self.bpf_filter, self.interface)
+            sock.settimeout(0.2)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def run(self, record: Callable, packet_count: int = 0, timeout: Optional[float] = None,
+            should_stop: Callable[[], bool] = lambda: False, on_frame: Optional[Callable] = None) -> int:
+        """
+        Receive until stopped, `packet_count` frames were seen or `timeout` elapsed
+
+        Args:
+            record: Called as record(timestamp, length, protocol, src_ip, dst_ip, src_port, dst_port, info)
+            on_frame: Called as on_frame(timestamp, frame, length) with the raw bytes of
+                every Ethernet frame (a view valid only during the call)
+
+        Returns:
+            Number of frames recorded
+        """
+        sock = self.open()
+        buf = bytearray(65536)
+        view = memoryview(buf)
+        receive = sock.recvfrom_into
+        deadline = time.time() + timeout if timeout else None
+        seen = 0
+        try:
+            while not should_stop():
+                try:
+                    length, address = receive(buf)
+                except socket.timeout:
+                    if deadline and time.time() >= deadline:
+                        break
+                    continue
+                now = time.time()
+                hatype = address[3]
+                # Loopback frames are delivered twice (outgoing and incoming), like libpcap keep one
+                if address[2] == PACKET_OUTGOING and hatype == ARPHRD_LOOPBACK:
+                    continue
+                ethernet = hatype == ARPHRD_ETHER or hatype == ARPHRD_LOOPBACK
+                if on_frame and ethernet:
+                    on_frame(now, view[:length], length)
+                record(now, length, *decode_frame(buf, length, ethernet))
+                seen += 1
+                if packet_count and seen >= packet_count:
+                    break
+                if deadline and now >= deadline:
+                    break
+        finally:
+            sock.close()
+        return seen
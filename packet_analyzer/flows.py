@@ -0,0 +1,315 @@
+"""
+Flow Table
+تجميع الباكتات في flows ثنائية الاتجاه (5-tuple) مع انتهاء بالخمول/المدة وتصدير سجلات مختصرة
+"""
+
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import threading
+
+from .fastpath import TCP_FLAG_INFO
+from .ring import (
+    NO_ADDRESS, NO_PORT, IPV6_FLAG, PROTO_TCP, PROTO_UDP, PROTO_DNS, PROTO_ICMP,
+    decode_address
+)
+
+
+TCP_FIN, TCP_SYN, TCP_RST, TCP_ACK = 0x01, 0x02, 0x04, 0x10
+
+# "Flags: SA" -> bits, for both the scapy and the fast path info text
+_TCP_FLAG_BITS = {info: value for value, info in enumerate(TCP_FLAG_INFO)}
+
+# TCP states; CLOSED and RESET flows are exported after close_timeout
+SYN_SENT, SYN_RECEIVED, ESTABLISHED, CLOSING, CLOSED, RESET = (
+    'SYN_SENT', 'SYN_RECEIVED', 'ESTABLISHED', 'CLOSING', 'CLOSED', 'RESET'
+)
+
+# Why a flow record was exported
+END_IDLE, END_ACTIVE, END_CLOSED, END_EVICTED, END_FLUSH = 'idle', 'active', 'closed', 'evicted', 'flush'
+
+IP_PROTOCOL_NAMES = {1: 'ICMP', 6: 'TCP', 17: 'UDP', 58: 'ICMPv6'}
+
+
+class _Flow:
+    """Counters of one bidirectional flow; src is the side that opened it"""
+
+    __slots__ = ('protocol', 'src_ip', 'src_port', 'dst_ip', 'dst_port', 'src_low', 'first', 'last',
+                 'packets', 'bytes', 'rev_packets', 'rev_bytes', 'flags', 'rev_flags', 'state')
+
+    def __init__(self, protocol: int, src_ip: int, src_port: int, dst_ip: int, dst_port: int,
+                 src_low: bool, timestamp: float):
+        self.protocol = protocol
+        self.src_low = src_low  # src is the first endpoint of the table key
+        self.src_ip = src_ip
+        self.src_port = src_port
+        self.dst_ip = dst_ip
+        self.dst_port = dst_port
+        self.first = timestamp
+        self.last = timestamp
+        self.packets = self.bytes = self.rev_packets = self.rev_bytes = 0
+        self.flags = self.rev_flags = 0
+        self.state = None
+
+    def record(self, reason: str) -> Tuple:
+        return (self.first, self.last, self.protocol, self.src_ip, self.src_port, self.dst_ip, self.dst_port,
+                self.packets, self.bytes, self.rev_packets, self.rev_bytes, self.flags | self.rev_flags,
+                self.state, reason)
+
+
+def flow_record_dict(record: Tuple) -> Dict:
+    """Exported flow record -> dict with decoded addresses (times stay unix timestamps)"""
+    (first, last, protocol, src_ip, src_port, dst_ip, dst_port,
+     packets, byte_count, rev_packets, rev_bytes, flags, state, reason) = record
+    return {
+        'first_seen': first,
+        'last_seen': last,
+        'protocol': protocol,
+        'src_ip': decode_address(src_ip),
+        'src_port': None if src_port == NO_PORT else src_port,
+        'dst_ip': decode_address(dst_ip),
+        'dst_port': None if dst_port == NO_PORT else dst_port,
+        'packets': packets,
+        'bytes': byte_count,
+        'rev_packets': rev_packets,
+        'rev_bytes': rev_bytes,
+        'tcp_flags': flags,
+        'state': state,
+        'end_reason': reason
+    }
+
+
+def describe_flow(flow: Dict) -> Dict:
+    """Readable form of a flow record dict for the API"""
+    return dict(
+        flow,
+        first_seen=datetime.fromtimestamp(flow['first_seen']).isoformat(),
+        last_seen=datetime.fromtimestamp(flow['last_seen']).isoformat(),
+        duration=round(flow['last_seen'] - flow['first_seen'], 3),
+        protocol=IP_PROTOCOL_NAMES.get(flow['protocol'], flow['protocol']),
+        tcp_flags=TCP_FLAG_INFO[flow['tcp_flags']][len('Flags: '):] if flow['protocol'] == 6 else None
+    )
+
+
+class FlowTable:
+    """
+    Bidirectional 5-tuple flow table (NetFlow/IPFIX-style metering)
+
+    Both directions of a conversation share one entry keyed on the
+    ordered endpoint pair; the side that sent the first packet (the SYN
+    for TCP) is the flow's source. A flow is exported as one compact
+    record when it has been idle for `idle_timeout`, every
+    `active_timeout` while it stays busy (its counters then restart),
+    `close_timeout` after a TCP FIN exchange or RST, or when the table
+    is full and it is the least recently seen. Timeouts run on packet
+    timestamps, so a recorded file ages its flows like the live capture did.
+
+    Exported records go to a bounded in-memory store and, in batches of
+    `export_batch`, to `on_export` (e.g. a database writer).
+    """
+
+    def __init__(self, idle_timeout: float = 15, active_timeout: float = 1800, close_timeout: float = 2,
+                 max_flows: int = 65536, max_records: int = 10000, export_batch: int = 500,
+                 on_export: Optional[Callable[[List[Dict]], None]] = None):
+        """
+        Args:
+            idle_timeout: Seconds without packets before a flow is exported
+            active_timeout: Seconds after which a long-lived flow is exported and restarted
+            close_timeout: Seconds a closed TCP flow waits for its last packets
+            max_flows: Flows tracked at once; the least recently seen is exported to make room
+            max_records: Exported records kept in memory
+            export_batch: Records handed to on_export at once (also flushed every second)
+            on_export: Called with a list of flow record dicts (see flow_record_dict)
+        """
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.close_timeout = close_timeout
+        self.max_flows = max_flows
+        self.export_batch = export_batch
+        self.on_export = on_export
+        self.lock = threading.Lock()
+        self.records = deque(maxlen=max_records)
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.flows: 'OrderedDict[Tuple, _Flow]' = OrderedDict()  # least recently seen first
+            self.closed: Dict[Tuple, None] = {}
+            self.records.clear()
+            self.pending: List[Tuple] = []
+            self.next_sweep = 0.0
+            self.packets = 0
+            self.exported = 0
+            self.evicted = 0
+
+    def observe(self, timestamp: float, length: int, protocol: int, src_ip: int, dst_ip: int,
+                src_port: int, dst_port: int, info: str):
+        """Count one decoded packet (arguments as passed to PacketRing.append)"""
+        if protocol >= 256:
+            if protocol == PROTO_TCP:
+                protocol = 6
+            elif protocol == PROTO_UDP or protocol == PROTO_DNS:
+                protocol = 17
+            elif protocol == PROTO_ICMP:
+                protocol = 58 if src_ip >= IPV6_FLAG else 1
+            else:
+                return  # ARP and undecoded frames are not IP flows
+        if src_ip == NO_ADDRESS:
+            return
+        low = src_ip < dst_ip or (src_ip == dst_ip and src_port <= dst_port)
+        if low:
+            key = (protocol, src_ip, src_port, dst_ip, dst_port)
+        else:
+            key = (protocol, dst_ip, dst_port, src_ip, src_port)
+        bits = _TCP_FLAG_BITS.get(info, 0) if protocol == 6 else 0
+        exported = self.exported
+
+        with self.lock:
+            self.packets += 1
+            flows = self.flows
+            flow = flows.get(key)
+            if flow is None:
+                if len(flows) >= self.max_flows:
+                    oldest_key, oldest = flows.popitem(last=False)
+                    self.closed.pop(oldest_key, None)
+                    self.evicted += 1
+                    self._export(oldest, END_EVICTED)
+                if bits & (TCP_SYN | TCP_ACK) == TCP_SYN | TCP_ACK:
+                    # First packet seen is the SYN-ACK: the other side opened the flow
+                    flow = _Flow(protocol, dst_ip, dst_port, src_ip, src_port, not low, timestamp)
+                else:
+                    flow = _Flow(protocol, src_ip, src_port, dst_ip, dst_port, low, timestamp)
+                flows[key] = flow
+            else:
+                flows.move_to_end(key)
+                if timestamp - flow.first >= self.active_timeout:
+                    self._export(flow, END_ACTIVE)
+                    flow.first = timestamp
+                    flow.packets = flow.bytes = flow.rev_packets = flow.rev_bytes = 0
+
+            forward = low == flow.src_low
+            if forward:
+                flow.packets += 1
+                flow.bytes += length
+                flow.flags |= bits
+            else:
+                flow.rev_packets += 1
+                flow.rev_bytes += length
+                flow.rev_flags |= bits
+            if timestamp > flow.last:
+                flow.last = timestamp
+            if protocol == 6 and (bits & (TCP_FIN | TCP_SYN | TCP_RST) or flow.state != ESTABLISHED):
+                self._track_tcp(key, flow, bits, forward)
+
+            if timestamp >= self.next_sweep:
+                self._sweep(timestamp)
+                batch = self._take_batch(True)
+            elif self.exported != exported:
+                batch = self._take_batch(False)
+            else:
+                batch = None
+        if batch:
+            self.on_export(batch)
+
+    def _track_tcp(self, key: Tuple, flow: _Flow, bits: int, forward: bool):
+        state = flow.state
+        if bits & TCP_RST:
+            state = RESET
+        elif bits & TCP_FIN or state == CLOSING:
+            state = CLOSED if flow.flags & flow.rev_flags & TCP_FIN else CLOSING
+        elif state is None:
+            if bits & TCP_SYN:
+                state = SYN_RECEIVED if bits & TCP_ACK else SYN_SENT
+            else:
+                state = ESTABLISHED  # picked up mid-connection
+        elif state == SYN_SENT and not forward and bits & TCP_SYN and bits & TCP_ACK:
+            state = SYN_RECEIVED
+        elif state == SYN_RECEIVED and forward and bits & TCP_ACK:
+            state = ESTABLISHED
+        flow.state = state
+        if state == CLOSED or state == RESET:
+            self.closed[key] = None
+
+    def _sweep(self, now: float):
+        """Export idle and closed flows (lock held); runs at most once a second of capture time"""
+        self.next_sweep = now + 1
+        flows = self.flows
+        idle_before = now - self.idle_timeout
+        while flows:
+            key, flow = next(iter(flows.items()))
+            if flow.last > idle_before:
+                break
+            del flows[key]
+            self.closed.pop(key, None)
+            self._export(flow, END_IDLE)
+
+        closed_before = now - self.close_timeout
+        for key in list(self.closed):
+            flow = flows.get(key)
+            if flow is None or flow.state not in (CLOSED, RESET):
+                del self.closed[key]  # reused by a new connection
+            elif flow.last <= closed_before:
+                del flows[key]
+                del self.closed[key]
+                self._export(flow, END_CLOSED)
+
+    def _export(self, flow: _Flow, reason: str):
+        record = flow.record(reason)
+        self.records.append(record)
+        self.exported += 1
+        if self.on_export:
+            self.pending.append(record)
+
+    def _take_batch(self, swept: bool) -> Optional[List[Dict]]:
+        """Pending records for on_export once a batch is full or after a sweep (lock held)"""
+        if not self.pending or (len(self.pending) < self.export_batch and not swept):
+            return None
+        batch, self.pending = self.pending, []
+        return [flow_record_dict(record) for record in batch]
+
+    def expire(self, now: float):
+        """Run the timeouts against `now` (e.g. wall clock while a live capture is quiet)"""
+        with self.lock:
+            self._sweep(now)
+            batch = self._take_batch(True)
+        if batch:
+            self.on_export(batch)
+
+    def flush(self):
+        """Export every flow still in the table (end of capture)"""
+        with self.lock:
+            for flow in self.flows.values():
+                self._export(flow, END_FLUSH)
+            self.flows.clear()
+            self.closed.clear()
+            batch = self._take_batch(True)
+        if batch:
+            self.on_export(batch)
+
+    def recent(self, limit: int = 100) -> List[Dict]:
+        """The `limit` most recently exported flow records, newest first"""
+        with self.lock:
+            records = list(self.records)[-limit:] if limit else []
+        return [flow_record_dict(record) for record in reversed(records)]
+
+    def active(self, limit: int = 100) -> List[Dict]:
+        """Flows still in the table, largest (both directions' bytes) first"""
+        with self.lock:
+            flows = sorted(self.flows.values(), key=lambda flow: flow.bytes + flow.rev_bytes, reverse=True)[:limit]
+            records = [flow.record(None) for flow in flows]
+        return [flow_record_dict(record) for record in records]
+
+    def get_status(self) -> Dict:
+        with self.lock:
+            return {
+                'active_flows': len(self.flows),
+                'max_flows': self.max_flows,
+                'packets': self.packets,
+                'exported': self.exported,
+                'evicted': self.evicted,
+                'stored_records': len(self.records),
+                'idle_timeout': self.idle_timeout,
+                'active_timeout': self.active_timeout,
+                # Records persisted per packet seen (flow aggregation's saving)
+                'packets_per_record': round(self.packets / self.exported, 1) if self.exported else None
+            }
@@ -0,0 +1,224 @@
+"""
+Offline Capture Files
+قراءة ملفات pcap/pcapng المسجّلة على أجزاء مربوطة بالذاكرة (mmap) بدون تحميل الملف كاملاً
+"""
+
+from typing import Iterator, Optional, Tuple
+import mmap
+import os
+import struct
+
+
+PCAP_MAGIC = 0xA1B2C3D4      # microsecond timestamps
+PCAP_MAGIC_NS = 0xA1B23C4D   # nanosecond timestamps
+PCAPNG_SECTION_HEADER = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_INTERFACE = 1
+PCAPNG_PACKET = 2            # obsolete Packet Block
+PCAPNG_SIMPLE_PACKET = 3
+PCAPNG_ENHANCED_PACKET = 6
+PCAPNG_OPTION_TSRESOL = 9
+
+# Link type -> (bytes before the frame decode_frame reads, frame starts with an Ethernet header)
+LINK_LAYERS = {
+    1: (0, True),      # Ethernet
+    0: (4, False),     # BSD loopback
+    12: (0, False),    # raw IP
+    14: (0, False),    # raw IP (OpenBSD)
+    101: (0, False),   # raw IP
+    113: (16, False),  # Linux cooked capture
+    228: (0, False),   # raw IPv4
+    229: (0, False),   # raw IPv6
+    276: (20, False),  # Linux cooked capture v2
+}
+
+
+class _MappedFile:
+    """
+    Read-only window over a file, remapped `chunk_size` bytes at a time
+
+    Only the current window is mapped, so resident memory stays around
+    `chunk_size` however large the file is. Views handed out stay valid
+    after a remap (the old mapping lives until its last view is gone).
+    """
+
+    def __init__(self, fileobj, chunk_size: int):
+        self.fileno = fileobj.fileno()
+        self.size = os.fstat(self.fileno).st_size
+        granularity = mmap.ALLOCATIONGRANULARITY
+        self.chunk_size = max(granularity, chunk_size // granularity * granularity)
+        self.view = None
+        self.start = 0
+        self.end = 0
+
+    def window(self, offset: int, length: int) -> Tuple[memoryview, int]:
+        """(view, position) such that view[position:position + length] is file[offset:offset + length]"""
+        if offset < self.start or offset + length > self.end:
+            start = offset - offset % mmap.ALLOCATIONGRANULARITY
+            end = min(self.size, max(start + self.chunk_size, offset + length))
+            mapped = mmap.mmap(self.fileno, end - start, access=mmap.ACCESS_READ, offset=start)
+            if hasattr(mapped, 'madvise'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            self.view = memoryview(mapped)
+            self.start = start
+            self.end = end
+        return self.view, offset - self.start
+
+
+class CaptureFile:
+    """
+    Streaming reader for pcap (micro/nanosecond, either byte order) and
+    pcapng files
+
+    Iterating yields (timestamp, wire length, frame, ethernet) per packet,
+    where `frame` is a memoryview into the mapped file starting at the
+    header decode_frame expects; it is only valid until the reader is
+    closed. Frames of unsupported link types are yielded empty.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 64 * 1024 * 1024):
+        """
+        Args:
+            path: pcap or pcapng file
+            chunk_size: Bytes mapped at a time
+
+        Raises:
+            ValueError: If the file is neither pcap nor pcapng
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.file = open(path, 'rb')
+        self.truncated = False
+        try:
+            header = self.file.read(24)
+            if len(header) < 4:
+                raise ValueError(f"{path}: not a pcap or pcapng file")
+            magic_le = struct.unpack_from('<I', header)[0]
+            magic_be = struct.unpack_from('>I', header)[0]
+            if magic_le == PCAPNG_SECTION_HEADER:
+                self.format = 'pcapng'
+            elif PCAP_MAGIC in (magic_le, magic_be) or PCAP_MAGIC_NS in (magic_le, magic_be):
+                if len(header) < 24:
+                    raise ValueError(f"{path}: truncated pcap header")
+                self.format = 'pcap'
+                self.endian = '<' if magic_le in (PCAP_MAGIC, PCAP_MAGIC_NS) else '>'
+                self.scale = 1e-9 if PCAP_MAGIC_NS in (magic_le, magic_be) else 1e-6
+                self.linktype = struct.unpack_from(self.endian + 'I', header, 20)[0] & 0xFFFF
+            else:
+                raise ValueError(f"{path}: not a pcap or pcapng file")
+        except Exception:
+            self.file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    @property
+    def size(self) -> int:
+        return os.fstat(self.file.fileno()).st_size
+
+    def __iter__(self) -> Iterator[Tuple[float, int, memoryview, bool]]:
+        mapped = _MappedFile(self.file, self.chunk_size)
+        if self.format == 'pcap':
+            return self._iter_pcap(mapped)
+        return self._iter_pcapng(mapped)
+
+    def _iter_pcap(self, mapped: _MappedFile):
+        unpack_from = struct.Struct(self.endian + 'IIII').unpack_from
+        window = mapped.window
+        scale = self.scale
+        size = mapped.size
+        skip, ethernet = LINK_LAYERS.get(self.linktype, (None, False))
+        offset = 24
+        while offset + 16 <= size:
+            view, pos = window(offset, 16)
+            seconds, fraction, captured, length = unpack_from(view, pos)
+            end = offset + 16 + captured
+            if end > mapped.end:
+                if end > size:
+                    self.truncated = True
+                    return
+                view, pos = window(offset, 16 + captured)
+            data = pos + 16
+            if skip is None or skip > captured:
+                frame = view[data:data]
+            else:
+                frame = view[data + skip:data + captured]
+            yield seconds + fraction * scale, length, frame, ethernet
+            offset = end
+        self.truncated = offset != size
+
+    def _iter_pcapng(self, mapped: _MappedFile):
+        window = mapped.window
+        size = mapped.size
+        endian = '<'
+        interfaces = []  # (skip, ethernet, seconds per timestamp unit) per interface of the section
+        timestamp = 0.0
+        offset = 0
+        while offset + 12 <= size:
+            view, pos = window(offset, 12)
+            block_type = struct.unpack_from(endian + 'I', view, pos)[0]
+            if block_type == PCAPNG_SECTION_HEADER:
+                # Byte order can change between sections
+                endian = '<' if struct.unpack_from('<I', view, pos + 8)[0] == PCAPNG_BYTE_ORDER_MAGIC else '>'
+                interfaces = []
+            block_length = struct.unpack_from(endian + 'I', view, pos + 4)[0]
+            if block_length < 12 or block_length % 4:
+                raise ValueError(f"{self.path}: corrupt pcapng block at offset {offset}")
+            end = offset + block_length
+            if end > size:
+                self.truncated = True
+                return
+            if end > mapped.end:
+                view, pos = window(offset, block_length)
+
+            if block_type == PCAPNG_ENHANCED_PACKET or block_type == PCAPNG_PACKET:
+                if block_type == PCAPNG_ENHANCED_PACKET:
+                    interface, high, low, captured, length = struct.unpack_from(endian + 'IIIII', view, pos + 8)
+                else:
+                    interface, _, high, low, captured, length = struct.unpack_from(endian + 'HHIIII', view, pos + 8)
+                skip, ethernet, resolution = interfaces[interface] if interface < len(interfaces) else (None, False, 1e-6)
+                timestamp = ((high << 32) | low) * resolution
+                data = pos + 28
+            elif block_type == PCAPNG_SIMPLE_PACKET:
+                length = struct.unpack_from(endian + 'I', view, pos + 8)[0]
+                captured = min(length, block_length - 16)
+                skip, ethernet, _ = interfaces[0] if interfaces else (None, False, 1e-6)
+                data = pos + 12
+            else:
+                if block_type == PCAPNG_INTERFACE:
+                    interfaces.append(self._interface(view, pos, block_length, endian))
+                offset = end
+                continue
+
+            if skip is None or skip > captured:
+                frame = view[data:data]
+            else:
+                frame = view[data + skip:data + captured]
+            yield timestamp, length, frame, ethernet
+            offset = end
+        self.truncated = offset != size
+
+    @staticmethod
+    def _interface(view: memoryview, pos: int, block_length: int, endian: str) -> Tuple[Optional[int], bool, float]:
+        """(skip, ethernet, timestamp resolution) from an Interface Description Block"""
+        linktype = struct.unpack_from(endian + 'H', view, pos + 8)[0]
+        skip, ethernet = LINK_LAYERS.get(linktype, (None, False))
+        resolution = 1e-6
+        option = pos + 16
+        options_end = pos + block_length - 4
+        while option + 4 <= options_end:
+            code, length = struct.unpack_from(endian + 'HH', view, option)
+            if code == 0:
+                break
+            if code == PCAPNG_OPTION_TSRESOL and length >= 1:
+                value = view[option + 4]
+                resolution = 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+            option += 4 + (length + 3) // 4 * 4
+        return skip, ethernet, resolution
@@ -0,0 +1,324 @@
+"""
+PCAP Ring Recorder
+تسجيل الباكتات الخام في ملفات pcap دوّارة (عدد ثابت من الملفات) أثناء التحليل الحي
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+import os
+import queue
+import re
+import struct
+import threading
+import time
+
+
+LINKTYPE_ETHERNET = 1
+FSYNC_POLICIES = ('none', 'rotate', 'interval', 'always')
+
+_GLOBAL_HEADER = struct.Struct('<IHHiIII')
+_RECORD_HEADER = struct.Struct('<IIII')
+_SEGMENT_NAME = re.compile(r'^(?P<prefix>.+)-\d{8}-\d{6}-\d{6}\.pcap$')
+
+
+class _Segment:
+    """One pcap file of the ring and the capture time it covers"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.start: Optional[float] = None
+        self.end: Optional[float] = None
+        self.packets = 0
+        self.bytes = 0
+
+    def to_dict(self, current: bool = False) -> Dict:
+        return {
+            'file': os.path.basename(self.path),
+            'path': self.path,
+            'start': self.start,
+            'end': self.end,
+            'packets': self.packets,
+            'bytes': self.bytes,
+            'current': current
+        }
+
+
+class PcapRingWriter:
+    """
+    Writes raw Ethernet frames to a ring of size/time-rotated pcap files
+
+    `write` only appends the record to an in-memory buffer; full buffers
+    (or buffers older than `flush_interval`) are handed to a writer
+    thread that does the file I/O, rotation and fsync, so the capture
+    thread never waits on the disk. If the writer falls `max_pending`
+    buffers behind, further buffers are dropped and counted rather than
+    blocking capture. Files of earlier captures in the same directory
+    with the same prefix count towards the ring and are deleted oldest
+    first.
+    """
+
+    def __init__(self, directory: str, prefix: str = 'capture', max_files: int = 10,
+                 max_file_bytes: int = 100 * 1024 * 1024, max_file_seconds: float = 300,
+                 fsync: str = 'rotate', fsync_interval: float = 5.0, buffer_size: int = 1024 * 1024,
+                 flush_interval: float = 1.0, max_pending: int = 64, snaplen: int = 65535):
+        """
+        Args:
+            directory: Where the pcap files are written (created if missing)
+            prefix: File name prefix; files are named <prefix>-<date>-<time>-<usec>.pcap
+            max_files: Files kept; the oldest is deleted when a new one is opened
+            max_file_bytes: Rotate before a file would exceed this size; buffers are
+                split between files at packet boundaries (a single larger frame gets a file of its own)
+            max_file_seconds: Rotate once a file covers this much capture time (0 = size only)
+            fsync: 'none' (leave it to the OS), 'rotate' (when a file is closed),
+                'interval' (every fsync_interval seconds and on rotate) or 'always' (every buffer)
+            fsync_interval: Seconds between fsyncs with the 'interval' policy
+            buffer_size: Bytes buffered before a write is handed to the writer thread
+            flush_interval: Maximum seconds a record waits in the buffer
+            max_pending: Buffers queued for the writer thread before new ones are dropped
+            snaplen: Bytes of each frame kept
+
+        Raises:
+            ValueError: On an unknown fsync policy or invalid limits
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}' (expected one of {', '.join(FSYNC_POLICIES)})")
+        if max_files < 1 or max_file_bytes < _GLOBAL_HEADER.size:
+            raise ValueError("PCAP ring needs at least one file and a positive file size")
+        self.directory = directory
+        self.prefix = prefix
+        self.max_files = max_files
+        self.max_file_bytes = max_file_bytes
+        self.max_file_seconds = max_file_seconds
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.snaplen = snaplen
+        self.logger = logging.getLogger(__name__)
+
+        os.makedirs(directory, exist_ok=True)
+        # Files left by earlier captures are the oldest part of the ring
+        self.old_files = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if (match := _SEGMENT_NAME.match(name)) and match.group('prefix') == prefix
+        )
+
+        self.lock = threading.Lock()
+        self.buffer = bytearray()
+        self.buffer_first: Optional[float] = None
+        self.buffer_last: Optional[float] = None
+        self.buffer_packets = 0
+        self.buffer_started = time.monotonic()
+        self.closed = False
+
+        self.segments_lock = threading.Lock()
+        self.segments: List[_Segment] = []
+        self.file = None
+        self.last_fsync = time.monotonic()
+        self.packets_written = 0
+        self.bytes_written = 0
+        self.dropped_packets = 0
+        self.files_deleted = 0
+        self.write_errors = 0
+
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self._run, name='pcap-writer', daemon=True)
+        self.thread.start()
+
+    def write(self, timestamp: float, frame, length: int):
+        """
+        Buffer one frame (called from the capture thread)
+
+        Args:
+            timestamp: Capture time
+            frame: Frame bytes starting at the Ethernet header (bytes, bytearray or memoryview)
+            length: Length of the frame on the wire
+        """
+        captured = min(len(frame), self.snaplen)
+        seconds = int(timestamp)
+        with self.lock:
+            if self.closed:
+                return
+            buffer = self.buffer
+            if not self.buffer_packets:
+                self.buffer_first = timestamp
+                self.buffer_started = time.monotonic()
+            buffer += _RECORD_HEADER.pack(seconds, int((timestamp - seconds) * 1000000), captured, length)
+            buffer += frame[:captured]
+            self.buffer_last = timestamp
+            self.buffer_packets += 1
+            if len(buffer) >= self.buffer_size:
+                self._hand_off()
+
+    def _hand_off(self):
+        """Queue the current buffer for the writer thread (lock held)"""
+        if not self.buffer_packets:
+            return
+        chunk = (self.buffer, self.buffer_first, self.buffer_last, self.buffer_packets)
+        try:
+            self.pending.put_nowait(chunk)
+        except queue.Full:
+            self.dropped_packets += self.buffer_packets
+        self.buffer = bytearray()
+        self.buffer_packets = 0
+
+    def close(self):
+        """Write out what is buffered and close the current file"""
+        with self.lock:
+            if self.closed:
+                return
+            self._hand_off()
+            self.closed = True
+        self.pending.put(None)
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            try:
+                chunk = self.pending.get(timeout=self.flush_interval / 4)
+            except queue.Empty:
+                chunk = ()
+            if chunk is None:
+                break
+            if chunk:
+                try:
+                    self._write_chunk(*chunk)
+                except OSError as e:
+                    self.write_errors += 1
+                    self.logger.error(f"PCAP write error: {e}")
+            else:
+                with self.lock:
+                    if not self.closed and time.monotonic() - self.buffer_started >= self.flush_interval:
+                        self._hand_off()
+            if self.fsync == 'interval' and self.file and time.monotonic() - self.last_fsync >= self.fsync_interval:
+                self._sync()
+        self._close_file()
+
+    def _write_chunk(self, data: bytearray, first: float, last: float, packets: int):
+        segment = self.segments[-1] if self.file else None
+        if segment is None or (self.max_file_seconds and segment.start is not None
+                               and last - segment.start >= self.max_file_seconds):
+            segment = self._rotate()
+        view = memoryview(data)
+        while segment.bytes + len(view) > self.max_file_bytes:
+            # Split the buffer after the last packet that still fits in this file
+            size, count, part_last = self._records_within(view, self.max_file_bytes - segment.bytes,
+                                                          at_least_one=not segment.packets)
+            if count:
+                self._append(segment, view[:size], first, part_last, count)
+                view = view[size:]
+                packets -= count
+                if not packets:
+                    return
+                first = self._record_time(view, 0)
+            segment = self._rotate()
+        self._append(segment, view, first, last, packets)
+
+    def _append(self, segment: _Segment, data, first: float, last: float, packets: int):
+        self.file.write(data)
+        self.file.flush()  # readers of the current file see whole buffers
+        if self.fsync == 'always':
+            self._sync()
+        with self.segments_lock:
+            if segment.start is None:
+                segment.start = first
+            segment.end = last
+            segment.packets += packets
+            segment.bytes += len(data)
+        self.packets_written += packets
+        self.bytes_written += len(data)
+
+    @staticmethod
+    def _record_time(data, offset: int) -> float:
+        seconds, micros, _, _ = _RECORD_HEADER.unpack_from(data, offset)
+        return seconds + micros / 1000000
+
+    @classmethod
+    def _records_within(cls, data, limit: int, at_least_one: bool = False):
+        """(bytes, packets, last timestamp) of the leading records of `data` that fit in `limit` bytes"""
+        offset = count = 0
+        last = None
+        while offset < len(data):
+            end = offset + _RECORD_HEADER.size + _RECORD_HEADER.unpack_from(data, offset)[2]
+            if end > limit and not (at_least_one and count == 0):
+                break
+            last = cls._record_time(data, offset)
+            offset, count = end, count + 1
+        return offset, count, last
+
+    def _rotate(self) -> _Segment:
+        self._close_file()
+        name = f"{self.prefix}-{datetime.now():%Y%m%d-%H%M%S-%f}.pcap"
+        segment = _Segment(os.path.join(self.directory, name))
+        self.file = open(segment.path, 'wb')
+        self.file.write(_GLOBAL_HEADER.pack(0xA1B2C3D4, 2, 4, 0, 0, self.snaplen, LINKTYPE_ETHERNET))
+        segment.bytes = _GLOBAL_HEADER.size
+        with self.segments_lock:
+            self.segments.append(segment)
+            # Drop the oldest files beyond the ring size (earlier captures first)
+            while len(self.old_files) + len(self.segments) > self.max_files:
+                if self.old_files:
+                    path = self.old_files.pop(0)
+                else:
+                    path = self.segments.pop(0).path
+                try:
+                    os.remove(path)
+                    self.files_deleted += 1
+                except FileNotFoundError:
+                    pass
+        return segment
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_fsync = time.monotonic()
+
+    def _close_file(self):
+        if not self.file:
+            return
+        try:
+            if self.fsync != 'none':
+                self._sync()
+            self.file.close()
+        except OSError as e:
+            self.write_errors += 1
+            self.logger.error(f"PCAP close error: {e}")
+        self.file = None
+
+    def get_segments(self, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict]:
+        """
+        Files of this recording whose packets overlap [start, end], oldest first
+
+        The current file covers packets up to the last buffer written;
+        up to `flush_interval` seconds of newer packets are still buffered.
+        """
+        with self.segments_lock:
+            segments = [
+                segment.to_dict(current=index == len(self.segments) - 1 and not self.closed)
+                for index, segment in enumerate(self.segments)
+                if segment.start is not None
+            ]
+        return [
+            segment for segment in segments
+            if (end is None or segment['start'] <= end) and (start is None or segment['end'] >= start)
+        ]
+
+    def get_status(self) -> Dict:
+        with self.segments_lock:
+            files = len(self.segments)
+        return {
+            'directory': self.directory,
+            'files': files,
+            'max_files': self.max_files,
+            'max_file_bytes': self.max_file_bytes,
+            'max_file_seconds': self.max_file_seconds,
+            'fsync': self.fsync,
+            'snaplen': self.snaplen,
+            'packets_written': self.packets_written,
+            'bytes_written': self.bytes_written,
+            'pending_buffers': self.pending.qsize(),
+            'dropped_packets': self.dropped_packets,
+            'files_deleted': self.files_deleted,
+            'write_errors': self.write_errors
+        }
@@ -0,0 +1,157 @@
+"""
+Packet Ring Buffer
+ذاكرة دائرية ثابتة الحجم للباكتات الملتقطة (أعمدة متوازية بدل dict لكل باكت)
+"""
+
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import socket
+import threading
+
+
+# Protocol codes: 0-255 are raw IP protocol numbers, named protocols follow
+PROTOCOL_NAMES = ('Unknown', 'TCP', 'UDP', 'DNS', 'ICMP', 'ARP')
+PROTO_UNKNOWN, PROTO_TCP, PROTO_UDP, PROTO_DNS, PROTO_ICMP, PROTO_ARP = range(256, 256 + len(PROTOCOL_NAMES))
+
+# Addresses are ints: IPv4 as is, IPv6 with IPV6_FLAG set so the two never collide
+NO_ADDRESS = -1
+NO_PORT = -1
+IPV6_FLAG = 1 << 128
+_IN_OVERFLOW = -2  # address column marker: the IPv6 value is in the overflow list
+
+
+def encode_address(address: Optional[str]) -> int:
+    """IPv4/IPv6 string -> int (NO_ADDRESS for None)"""
+    if not address:
+        return NO_ADDRESS
+    if ':' in address:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET6, address), 'big') | IPV6_FLAG
+    return int.from_bytes(socket.inet_aton(address), 'big')
+
+
+def decode_address(value: int) -> Optional[str]:
+    if value == NO_ADDRESS:
+        return None
+    if value >= IPV6_FLAG:
+        return socket.inet_ntop(socket.AF_INET6, (value ^ IPV6_FLAG).to_bytes(16, 'big'))
+    return socket.inet_ntoa(value.to_bytes(4, 'big'))
+
+
+def protocol_name(code: int):
+    """Named protocol, or the raw IP protocol number for anything else"""
+    return PROTOCOL_NAMES[code - 256] if code >= 256 else code
+
+
+class PacketRing:
+    """
+    Fixed-capacity ring of captured packets, oldest first
+
+    Every field lives in its own preallocated typed array, so appending
+    a packet is O(1) and allocates nothing besides its `info` string;
+    dicts are only built for the packets a caller actually reads. IPv6
+    addresses do not fit the 64-bit address columns and are kept in
+    overflow lists instead.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Args:
+            capacity: Number of packets kept; older ones are overwritten
+        """
+        if capacity < 1:
+            raise ValueError("Packet ring capacity must be at least 1")
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.lengths = array('I', bytes(array('I').itemsize * capacity))
+        self.protocols = array('H', bytes(2 * capacity))
+        self.src_ips = array('q', bytes(8 * capacity))
+        self.dst_ips = array('q', bytes(8 * capacity))
+        self.src_ip6s: List[int] = [0] * capacity
+        self.dst_ip6s: List[int] = [0] * capacity
+        self.src_ports = array('i', bytes(array('i').itemsize * capacity))
+        self.dst_ports = array('i', bytes(array('i').itemsize * capacity))
+        self.infos: List[str] = [''] * capacity
+        self.head = 0  # next write position
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, timestamp: float, length: int, protocol: int, src_ip: int, dst_ip: int,
+               src_port: int, dst_port: int, info: str = ''):
+        """Write one packet, overwriting the oldest when full (addresses/ports already encoded)"""
+        with self.lock:
+            pos = self.head
+            self.timestamps[pos] = timestamp
+            self.lengths[pos] = length
+            self.protocols[pos] = protocol
+            if src_ip < IPV6_FLAG:
+                self.src_ips[pos] = src_ip
+            else:
+                self.src_ips[pos] = _IN_OVERFLOW
+                self.src_ip6s[pos] = src_ip
+            if dst_ip < IPV6_FLAG:
+                self.dst_ips[pos] = dst_ip
+            else:
+                self.dst_ips[pos] = _IN_OVERFLOW
+                self.dst_ip6s[pos] = dst_ip
+            self.src_ports[pos] = src_port
+            self.dst_ports[pos] = dst_port
+            self.infos[pos] = info
+            self.head = pos + 1 if pos + 1 < self.capacity else 0
+            if self.size < self.capacity:
+                self.size += 1
+
+    def clear(self):
+        """Forget all packets without reallocating the arrays"""
+        with self.lock:
+            self.head = 0
+            self.size = 0
+            self.infos = [''] * self.capacity
+
+    def _positions(self, limit: Optional[int]) -> Tuple[int, int]:
+        """Physical start position and count of the most recent `limit` packets"""
+        count = self.size if limit is None else max(0, min(limit, self.size))
+        start = (self.head - count) % self.capacity
+        return start, count
+
+    def _iter_positions(self, limit: Optional[int] = None) -> Iterator[int]:
+        start, count = self._positions(limit)
+        end = start + count
+        if end <= self.capacity:
+            yield from range(start, end)
+        else:
+            yield from range(start, self.capacity)
+            yield from range(0, end - self.capacity)
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict]:
+        """The most recent `limit` packets as dicts, oldest first"""
+        with self.lock:
+            rows = [self._row(pos) for pos in self._iter_positions(limit)]
+        return rows
+
+    def _row(self, pos: int) -> Dict:
+        src_ip = self.src_ips[pos]
+        dst_ip = self.dst_ips[pos]
+        src_port = self.src_ports[pos]
+        dst_port = self.dst_ports[pos]
+        return {
+            'timestamp': datetime.fromtimestamp(self.timestamps[pos]).isoformat(),
+            'length': self.lengths[pos],
+            'protocol': protocol_name(self.protocols[pos]),
+            'src_ip': decode_address(self.src_ip6s[pos] if src_ip == _IN_OVERFLOW else src_ip),
+            'dst_ip': decode_address(self.dst_ip6s[pos] if dst_ip == _IN_OVERFLOW else dst_ip),
+            'src_port': None if src_port == NO_PORT else src_port,
+            'dst_port': None if dst_port == NO_PORT else dst_port,
+            'info': self.infos[pos]
+        }
+
+    def nbytes(self) -> int:
+        """Approximate memory of the preallocated columns (excluding info strings and IPv6 values)"""
+        per_packet = sum(column.itemsize for column in (
+            self.timestamps, self.lengths, self.protocols,
+            self.src_ips, self.dst_ips, self.src_ports, self.dst_ports
+        )) + 3 * 8
+        return per_packet * self.capacity
@@ -0,0 +1,222 @@
+"""
+Traffic Sketches
+عدّادات تقريبية بذاكرة ثابتة لأكثر IPs نشاطاً وكشف المسح و DDoS على التقاط غير محدود
+"""
+
+from math import log, sqrt
+from typing import Dict, List, Optional, Set, Tuple
+import heapq
+import sys
+import threading
+
+from .ring import NO_ADDRESS
+
+
+_MASK64 = (1 << 64) - 1
+_INVERSE_POWERS = tuple(2.0 ** -rank for rank in range(65))
+
+
+def _mix64(value: int) -> int:
+    """splitmix64 finalizer: spreads integer keys (IPs, ports) over 64 bits"""
+    value ^= value >> 64  # fold IPv6 keys so their prefix counts too
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters over `capacity` counters
+
+    For a stream of total weight N, every key whose true weight exceeds
+    N / capacity is tracked, and each reported count overestimates the
+    true one by at most its `error` (itself at most N / capacity).
+    Each tracked key also carries an `extra` sum (e.g. bytes when
+    counting packets), exact since the key was last admitted.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries: Dict[int, List[int]] = {}  # key -> [count, error, extra]
+        self.heap: List[Tuple[int, int]] = []   # (count when pushed, key), min first
+        self.total = 0
+
+    def update(self, key: int, weight: int = 1, extra: int = 0) -> Optional[int]:
+        """Add `weight` to `key`; returns the key evicted to make room, if any"""
+        self.total += weight
+        entry = self.entries.get(key)
+        if entry is not None:
+            # The heap entry goes stale; it is refreshed when it reaches the top
+            entry[0] += weight
+            entry[2] += extra
+            return None
+        if len(self.entries) < self.capacity:
+            self.entries[key] = [weight, 0, extra]
+            heapq.heappush(self.heap, (weight, key))
+            return None
+
+        heap = self.heap
+        while True:
+            count, victim = heap[0]
+            current = self.entries[victim][0]
+            if current == count:
+                break
+            heapq.heapreplace(heap, (current, victim))
+        del self.entries[victim]
+        self.entries[key] = [count + weight, count, extra]
+        heapq.heapreplace(heap, (count + weight, key))
+        return victim
+
+    def top(self, limit: int) -> List[Tuple[int, int, int, int]]:
+        """(key, count, error, extra) of the `limit` largest counts"""
+        busiest = heapq.nlargest(limit, self.entries.items(), key=lambda item: item[1][0])
+        return [(key, entry[0], entry[1], entry[2]) for key, entry in busiest]
+
+    def error_bound(self) -> float:
+        return self.total / self.capacity
+
+    def nbytes(self) -> int:
+        """Approximate memory: dict, heap and one entry list + heap tuple per key"""
+        per_key = sys.getsizeof([0, 0, 0]) + sys.getsizeof((0, 0))
+        return sys.getsizeof(self.entries) + sys.getsizeof(self.heap) + len(self.entries) * per_key
+
+
+class HyperLogLog:
+    """Distinct count in 2**precision bytes, relative standard error 1.04 / sqrt(2**precision)"""
+
+    def __init__(self, precision: int = 8):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: int):
+        hashed = _mix64(value)
+        index = hashed >> (64 - self.precision)
+        rest_bits = 64 - self.precision
+        rank = rest_bits - (hashed & ((1 << rest_bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        m = len(self.registers)
+        zeros = self.registers.count(0)
+        if zeros:
+            # Small range: linear counting is more accurate (and skips the register sum)
+            estimate = m * log(m / zeros)
+            if estimate <= 2.5 * m:
+                return int(round(estimate))
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        return int(round(alpha * m * m / sum(map(_INVERSE_POWERS.__getitem__, self.registers))))
+
+    @staticmethod
+    def relative_error(precision: int) -> float:
+        return 1.04 / sqrt(1 << precision)
+
+
+class TrafficSketches:
+    """
+    Bounded-memory counterpart of TrafficCounters for unbounded captures
+
+    Top talkers come from Space-Saving over packets and over bytes.
+    Distinct destination ports per source and distinct sources per
+    destination are HyperLogLogs attached to the addresses the packet
+    Space-Saving currently tracks; an evicted address loses its
+    HyperLogLogs, so a scanner hidden under a flood larger than
+    capacity * its own packet count can be missed. Memory is fixed by
+    `capacity` and `precision` regardless of how many addresses appear.
+    """
+
+    def __init__(self, capacity: int = 1024, precision: int = 8):
+        """
+        Args:
+            capacity: Addresses tracked by each Space-Saving summary
+            precision: HyperLogLog registers = 2**precision bytes per tracked address
+        """
+        self.capacity = capacity
+        self.precision = precision
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.packets = SpaceSaving(self.capacity)
+            self.bytes = SpaceSaving(self.capacity)
+            self.ports: Dict[int, HyperLogLog] = {}
+            self.sources: Dict[int, HyperLogLog] = {}
+
+    def observe(self, timestamp: float, length: int, src_ip: int, dst_ip: int, dst_port: int):
+        """Count one packet (addresses/ports encoded as in PacketRing)"""
+        with self.lock:
+            if src_ip != NO_ADDRESS:
+                self._count(src_ip, 1, length)
+                if dst_port > 0 and src_ip in self.packets.entries:
+                    sketch = self.ports.get(src_ip)
+                    if sketch is None:
+                        sketch = self.ports[src_ip] = HyperLogLog(self.precision)
+                    sketch.add(dst_port)
+            if dst_ip != NO_ADDRESS:
+                self._count(dst_ip, 1, length)
+                if src_ip != NO_ADDRESS and dst_ip in self.packets.entries:
+                    sketch = self.sources.get(dst_ip)
+                    if sketch is None:
+                        sketch = self.sources[dst_ip] = HyperLogLog(self.precision)
+                    sketch.add(src_ip)
+
+    def merge(self, timestamp: float, packets: Dict[int, int], byte_counts: Dict[int, int],
+              ports: Dict[int, Set[int]], sources: Dict[int, Set[int]]):
+        """Add counts aggregated elsewhere (e.g. by a pipeline worker); same bounds as observe"""
+        with self.lock:
+            for ip, count in packets.items():
+                self._count(ip, count, byte_counts.get(ip, 0))
+            for attached, delta in ((self.ports, ports), (self.sources, sources)):
+                for ip, members in delta.items():
+                    if ip not in self.packets.entries:
+                        continue
+                    sketch = attached.get(ip)
+                    if sketch is None:
+                        sketch = attached[ip] = HyperLogLog(self.precision)
+                    for member in members:
+                        sketch.add(member)
+
+    def _count(self, ip: int, packets: int, byte_count: int):
+        evicted = self.packets.update(ip, packets, byte_count)
+        if evicted is not None:
+            self.ports.pop(evicted, None)
+            self.sources.pop(evicted, None)
+        self.bytes.update(ip, byte_count, packets)
+
+    def top_talkers(self, limit: int = 10, by: str = 'packets') -> List[Tuple[int, int, int]]:
+        """(ip, packets, bytes); the ranked metric is an upper bound, the other a lower bound"""
+        with self.lock:
+            if by == 'bytes':
+                return [(ip, packets, byte_count) for ip, byte_count, _, packets in self.bytes.top(limit)]
+            return [(ip, packets, byte_count) for ip, packets, _, byte_count in self.packets.top(limit)]
+
+    def port_scanners(self, threshold: int) -> List[Tuple[int, int]]:
+        """(source ip, estimated distinct destination ports) for sources above `threshold`"""
+        with self.lock:
+            estimates = [(ip, sketch.count()) for ip, sketch in self.ports.items()]
+        return [(ip, count) for ip, count in estimates if count > threshold]
+
+    def flood_targets(self, threshold: int) -> List[Tuple[int, int]]:
+        """(destination ip, estimated distinct sources) for destinations above `threshold`"""
+        with self.lock:
+            estimates = [(ip, sketch.count()) for ip, sketch in self.sources.items()]
+        return [(ip, count) for ip, count in estimates if count > threshold]
+
+    def get_status(self) -> Dict:
+        with self.lock:
+            hll_bytes = sys.getsizeof(self.ports) + sys.getsizeof(self.sources) + sum(
+                sys.getsizeof(sketch.registers) for sketch in (*self.ports.values(), *self.sources.values())
+            )
+            return {
+                'mode': 'sketch',
+                'capacity': self.capacity,
+                'tracked_ips': len(self.packets.entries),
+                # Reported counts exceed the true ones by at most these
+                'packets_error_bound': round(self.packets.error_bound(), 2),
+                'bytes_error_bound': round(self.bytes.error_bound(), 2),
+                'hll_precision': self.precision,
+                'hll_relative_error': round(HyperLogLog.relative_error(self.precision), 4),
+                'memory_bytes': self.packets.nbytes() + self.bytes.nbytes() + hll_bytes
+            }
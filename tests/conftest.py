@@ -0,0 +1,11 @@
+"""
+Test setup: import the project from the repository root and point
+models.py at a throwaway SQLite database before it is first imported
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='sentra-tests-'), 'sentra.db')
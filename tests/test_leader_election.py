@@ -0,0 +1,165 @@
+"""
+Several scheduler processes sharing one database: only the lease holder
+runs the periodic jobs, one run per interval across all of them, and
+another process takes over when the leader is killed (after the TTL) or
+stops (at once)
+"""
+
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from automation.alert_persistence import AlertPersistence
+from automation.auto_responder import AutoResponder
+from automation.leader import LeaderElection
+from models import Session, WriteBehindWriter, get_session
+
+TTL = 1.5
+RENEW_INTERVAL = TTL / 3
+INTERVAL = 1
+# Headroom for process scheduling on a loaded machine
+SLACK = 1.0
+
+
+def scheduler_process(index, log_path, ready, stop):
+    """One app process as role 'all' runs it: a paused scheduler started by the election"""
+    log = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+
+    def tick():
+        # A single small O_APPEND write: nothing is left half-done or locked
+        # when the process is killed (unlike a multiprocessing.Queue)
+        os.write(log, f'{time.time()!r}\n'.encode())
+
+    responder = AutoResponder()
+    responder.add_periodic_task(tick, INTERVAL, 'tick')
+    responder.start(paused=True)
+    election = LeaderElection(
+        get_session, name='test-scheduler', ttl=TTL, renew_interval=RENEW_INTERVAL,
+        on_elected=lambda: responder.set_active(True),
+        on_demoted=lambda: responder.set_active(False)
+    )
+    election.start()
+    ready.set()
+    stop.wait()
+    election.stop()
+    responder.stop()
+
+
+class Cluster:
+    """Scheduler processes on a shared database, each logging its job runs to a file"""
+
+    def __init__(self, directory, count):
+        context = multiprocessing.get_context('spawn')
+        self.logs = [os.path.join(directory, f'runs-{index}.log') for index in range(count)]
+        self.stops = [context.Event() for _ in range(count)]
+        readies = [context.Event() for _ in range(count)]
+        self.processes = [
+            context.Process(target=scheduler_process, args=(index, self.logs[index], readies[index], self.stops[index]),
+                            daemon=True)
+            for index in range(count)
+        ]
+        for process in self.processes:
+            process.start()
+        for ready in readies:
+            assert ready.wait(60), "scheduler process did not start"
+
+    def runs(self):
+        """(process index, time) of every job run so far, in time order"""
+        runs = []
+        for index, path in enumerate(self.logs):
+            if os.path.exists(path):
+                with open(path) as f:
+                    runs.extend((index, float(line)) for line in f.read().split('\n') if line)
+        return sorted(runs, key=lambda run: run[1])
+
+    def wait_for_run(self, exclude=(), timeout=10.0):
+        """First job run by a process not in `exclude`"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            runs = [run for run in self.runs() if run[0] not in exclude]
+            if runs:
+                return runs[0]
+            time.sleep(0.05)
+        pytest.fail(f"no job run from a process other than {list(exclude)} within {timeout}s")
+
+    def close(self):
+        for process, stop in zip(self.processes, self.stops):
+            # Event.set() waits for the waiters to wake: never for a killed one
+            if process.is_alive():
+                stop.set()
+        for process in self.processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.kill()
+
+
+@pytest.fixture
+def cluster(tmp_path, monkeypatch):
+    # Inherited by the spawned processes, which import models afresh
+    monkeypatch.setenv('DATABASE_PATH', str(tmp_path / 'shared.db'))
+    cluster = Cluster(str(tmp_path), 3)
+    yield cluster
+    cluster.close()
+
+
+def test_one_executor_per_interval_across_failover(cluster):
+    first, _ = cluster.wait_for_run()
+    time.sleep(3.5)
+
+    # Crash: SIGKILL, the lease is only taken over once it expires
+    cluster.processes[first].kill()
+    killed_at = time.time()
+    second, second_started = cluster.wait_for_run(exclude=[first])
+    assert second_started - killed_at <= TTL + RENEW_INTERVAL + INTERVAL + SLACK
+    time.sleep(3.5)
+
+    # Graceful stop: the lease is released and claimed at the next attempt
+    cluster.stops[second].set()
+    stopped_at = time.time()
+    third, third_started = cluster.wait_for_run(exclude=[first, second])
+    assert third_started - stopped_at <= RENEW_INTERVAL + INTERVAL + SLACK
+    time.sleep(2.5)
+
+    runs = cluster.runs()
+    per_process = {index: sum(1 for runner, _ in runs if runner == index) for index in range(3)}
+    assert sum(per_process.values()) == len(runs)
+    assert all(per_process[index] >= 2 for index in (first, second, third)), per_process
+
+    # Each leader's runs are contiguous: nobody runs jobs after losing the lease
+    runners = [index for index, _ in runs]
+    switches = [index for position, index in enumerate(runners) if position == 0 or runners[position - 1] != index]
+    assert switches == [first, second, third], runners
+    assert all(at < killed_at for index, at in runs if index == first)
+
+    # Exactly one executor per interval: no two runs, from the same or
+    # different processes, closer than an interval (a new leader starts
+    # its interval when elected rather than catching up)
+    gaps = [b - a for (_, a), (_, b) in zip(runs, runs[1:])]
+    assert all(gap > INTERVAL * 0.8 for gap in gaps), f"job ran twice within an interval: {gaps}"
+
+
+def test_standby_reads_alerts_from_the_table():
+    writer = WriteBehindWriter(Session, flush_interval=0.05)
+    leader = AutoResponder(persistence=AlertPersistence(writer, get_session))
+    leader.start(paused=True)
+    leader.set_active(True)
+    first = leader.create_alert('standby_test', 'high', 'first alert')
+    assert writer.flush()
+
+    # Boots with 'first alert' restored, then loses the election
+    standby = AutoResponder(persistence=AlertPersistence(writer, get_session))
+    standby.start(paused=True)
+    try:
+        leader.create_alert('standby_test', 'high', 'second alert')
+        assert writer.flush()
+
+        messages = [alert['message'] for alert in standby.get_alerts(alert_type='standby_test')]
+        assert messages == ['second alert', 'first alert']
+        assert standby.acknowledge_alert(first['id'])
+        assert standby.get_alerts(alert_type='standby_test', acknowledged=True)[0]['id'] == first['id']
+    finally:
+        standby.stop()
+        leader.stop()
+        writer.stop()
@@ -0,0 +1,219 @@
+"""
+Notification channels against local stand-ins for a webhook receiver, an
+SMTP server and a syslog daemon, delivered through the dispatcher
+(batching, retries after a failed delivery)
+"""
+
+import email
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from automation.notifications import NotificationDispatcher, SmtpNotifier, SyslogNotifier, WebhookNotifier
+
+
+def make_alert(index, severity='high'):
+    return {'id': index, 'type': 'test', 'severity': severity, 'message': f'alert {index}',
+            'timestamp': '2024-01-01T00:00:00', 'count': 1}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def dispatch(notifier, alerts):
+    """Deliver alerts through a dispatcher and return its stats for the channel"""
+    dispatcher = NotificationDispatcher([notifier], backoff_base=0.05, backoff_max=0.1, tick=0.02)
+    dispatcher.start()
+    try:
+        for alert in alerts:
+            assert dispatcher.submit(alert)
+        wait_for(lambda: dispatcher.get_stats()['channels'][notifier.name]['sent_alerts']
+                 + dispatcher.get_stats()['channels'][notifier.name]['failed_alerts'] >= len(alerts))
+    finally:
+        dispatcher.stop()
+    return dispatcher.get_stats()['channels'][notifier.name]
+
+
+@pytest.fixture
+def webhook():
+    """HTTP receiver answering the queued status codes (then 200) and recording the bodies"""
+    received, statuses = [], []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            status = statuses.pop(0) if statuses else 200
+            if status < 300:
+                received.append((self.headers['Content-Type'], json.loads(body)))
+            self.send_response(status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/hook', received, statuses
+    server.shutdown()
+    server.server_close()
+
+
+def test_webhook_posts_json_digest(webhook):
+    url, received, _ = webhook
+    notifier = WebhookNotifier(url, batch_size=3, batch_interval=0.1)
+    stats = dispatch(notifier, [make_alert(i) for i in range(5)] + [make_alert(5, 'low')])
+
+    assert stats['sent_messages'] == 2 and stats['sent_alerts'] == 5
+    assert [content_type for content_type, _ in received] == ['application/json'] * 2
+    bodies = [body for _, body in received]
+    assert [body['count'] for body in bodies] == [3, 2]
+    assert [alert['id'] for body in bodies for alert in body['alerts']] == [0, 1, 2, 3, 4]
+    assert bodies[0]['summary'] == '3 SentraOS alerts (highest severity: high)'
+
+
+def test_webhook_error_status_is_retried(webhook):
+    url, received, statuses = webhook
+    statuses.extend([500, 503])
+    notifier = WebhookNotifier(url, batch_interval=0.05)
+    stats = dispatch(notifier, [make_alert(1, 'critical')])
+
+    assert stats['retries'] == 2 and stats['failed_alerts'] == 0
+    assert stats['sent_messages'] == 1
+    assert [alert['id'] for _, body in received for alert in body['alerts']] == [1]
+    assert received[0][1]['summary'] == '[CRITICAL] test: alert 1'
+
+
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    """Just enough of an SMTP server for smtplib.send_message; stores each message"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        self.messages = []
+        super().__init__(('127.0.0.1', 0), SmtpStandIn.Handler)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def reply(self, line):
+            self.wfile.write(line.encode('ascii') + b'\r\n')
+
+        def handle(self):
+            self.reply('220 stand-in ESMTP')
+            envelope = {'rcpt': []}
+            while True:
+                line = self.rfile.readline().decode('ascii').rstrip('\r\n')
+                command = line[:4].upper()
+                if not line or command == 'QUIT':
+                    self.reply('221 bye')
+                    return
+                if command in ('EHLO', 'HELO'):
+                    self.reply('250 stand-in')
+                elif command == 'MAIL':
+                    envelope = {'from': line.split(':', 1)[1].strip(' <>'), 'rcpt': []}
+                    self.reply('250 OK')
+                elif command == 'RCPT':
+                    envelope['rcpt'].append(line.split(':', 1)[1].strip(' <>'))
+                    self.reply('250 OK')
+                elif command == 'DATA':
+                    self.reply('354 end with .')
+                    data = []
+                    while True:
+                        chunk = self.rfile.readline()
+                        if chunk in (b'.\r\n', b''):
+                            break
+                        data.append(chunk[1:] if chunk.startswith(b'..') else chunk)
+                    envelope['message'] = email.message_from_bytes(b''.join(data))
+                    self.server.messages.append(envelope)
+                    self.reply('250 queued')
+                else:
+                    self.reply('250 OK')
+
+
+@pytest.fixture
+def smtp_server():
+    server = SmtpStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_smtp_sends_text_digest(smtp_server):
+    notifier = SmtpNotifier('127.0.0.1', sender='sentra@example.com',
+                            recipients=['ops@example.com', 'sec@example.com'],
+                            port=smtp_server.server_address[1], batch_size=2, batch_interval=0.1)
+    alerts = [make_alert(1, 'critical'), dict(make_alert(2), count=4)]
+    stats = dispatch(notifier, alerts)
+
+    assert stats['sent_messages'] == 1 and stats['sent_alerts'] == 2
+    assert len(smtp_server.messages) == 1
+    envelope = smtp_server.messages[0]
+    assert envelope['from'] == 'sentra@example.com'
+    assert envelope['rcpt'] == ['ops@example.com', 'sec@example.com']
+    message = envelope['message']
+    assert message['Subject'] == '2 SentraOS alerts (highest severity: critical)'
+    assert message['To'] == 'ops@example.com, sec@example.com'
+    assert message.get_payload(decode=True).decode().splitlines() == [
+        '2024-01-01T00:00:00  [CRITICAL] test: alert 1',
+        '2024-01-01T00:00:00  [HIGH] test: alert 2 (x4)',
+    ]
+
+
+def test_smtp_unreachable_fails_after_retries():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    notifier = SmtpNotifier('127.0.0.1', sender='sentra@example.com', recipients=['ops@example.com'],
+                            port=port, timeout=1.0, batch_interval=0.05, max_retries=2)
+    stats = dispatch(notifier, [make_alert(1)])
+
+    assert stats['sent_messages'] == 0
+    assert stats['retries'] == 2 and stats['failed_alerts'] == 1
+    assert stats['last_error']
+
+
+def test_syslog_reconnects_after_daemon_restart():
+    path = os.path.join(tempfile.mkdtemp(), 'log')
+
+    def listen():
+        daemon = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        daemon.bind(path)
+        daemon.settimeout(2.0)
+        return daemon
+
+    daemon = listen()
+    notifier = SyslogNotifier(path, facility='daemon')
+    notifier.send([make_alert(1)])
+    assert daemon.recv(4096) == b'<28>sentra: [HIGH] test: alert 1\x00'
+
+    # syslogd restarts: the connected socket now points at nothing
+    daemon.close()
+    os.unlink(path)
+    daemon = listen()
+    try:
+        with pytest.raises(OSError):
+            notifier.send([make_alert(2)])
+        assert notifier.handler is None
+
+        # The retry opens a new connection
+        notifier.send([make_alert(3, 'critical')])
+        assert daemon.recv(4096) == b'<26>sentra: [CRITICAL] test: alert 3\x00'
+    finally:
+        daemon.close()
+        notifier.handler.close()
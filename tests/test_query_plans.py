@@ -0,0 +1,92 @@
+"""
+The history/dashboard queries must be index searches that return rows
+already ordered (no full table scan and no temporary b-tree sort)
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from dashboard.pagination import keyset_page
+from models import (
+    engine, get_session, SystemMetric, ScanResult, Alert, PacketCapture, ActivityLog, FlowRecord
+)
+
+
+@contextmanager
+def captured_selects():
+    """Collect the SELECT statements (and their parameters) sent to SQLite"""
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+
+def query_plan(statement, parameters):
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+PAGE_KEY = (datetime(2024, 1, 1), 100)
+
+# name -> (expected index, function running the route's query with a session)
+HOT_QUERIES = {
+    # /api/metrics/history (first page and a ?cursor= page)
+    'metrics_history': ('ix_system_metrics_type_time', lambda s: keyset_page(
+        s.query(SystemMetric).filter_by(metric_type='cpu').filter(SystemMetric.visible_to(1)),
+        SystemMetric.timestamp, SystemMetric.id, 20, None)),
+    'metrics_history_page': ('ix_system_metrics_type_time', lambda s: keyset_page(
+        s.query(SystemMetric).filter_by(metric_type='cpu').filter(SystemMetric.visible_to(1)),
+        SystemMetric.timestamp, SystemMetric.id, 20, PAGE_KEY)),
+    # /api/security/scans
+    'scan_history': ('ix_scan_results_user_time', lambda s: keyset_page(
+        s.query(ScanResult).filter_by(user_id=1), ScanResult.timestamp, ScanResult.id, 10, PAGE_KEY)),
+    # /api/stats
+    'stats_scan_count': ('ix_scan_results_user_time', lambda s:
+        s.query(ScanResult).filter_by(user_id=1).count()),
+    'stats_critical_alerts': ('ix_alerts_user_severity_time', lambda s:
+        s.query(Alert).filter(Alert.visible_to(1)).filter_by(severity='critical').count()),
+    'stats_recent_scans': ('ix_scan_results_user_time', lambda s:
+        s.query(ScanResult).filter_by(user_id=1).order_by(ScanResult.timestamp.desc()).limit(5).all()),
+    # /api/packets/history and the active capture lookup of /api/packets/stop
+    'capture_history': ('ix_packet_captures_user_time', lambda s: keyset_page(
+        s.query(PacketCapture).filter_by(user_id=1), PacketCapture.start_time, PacketCapture.id, 10, PAGE_KEY)),
+    'active_capture': ('ix_packet_captures_user_time', lambda s:
+        s.query(PacketCapture).filter_by(user_id=1, status='active')
+        .order_by(PacketCapture.start_time.desc()).first()),
+    # /api/packets/flows?capture_id=
+    'capture_flows': ('ix_flow_records_capture_time', lambda s: keyset_page(
+        s.query(FlowRecord).filter_by(capture_id=1), FlowRecord.first_seen, FlowRecord.id, 100, PAGE_KEY)),
+    # /api/activity
+    'activity_history': ('ix_activity_logs_user_time', lambda s: keyset_page(
+        s.query(ActivityLog).filter_by(user_id=1), ActivityLog.timestamp, ActivityLog.id, 20, PAGE_KEY)),
+}
+
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_query_uses_index(name):
+    index, run = HOT_QUERIES[name]
+    session = get_session()
+    try:
+        with captured_selects() as statements:
+            run(session)
+    finally:
+        session.close()
+
+    assert statements, f"{name} sent no SELECT"
+    for statement, parameters in statements:
+        plan = query_plan(statement, parameters)
+        detail = '\n'.join(plan)
+        assert f'INDEX {index} ' in detail, f"{name} does not use {index}:\n{detail}"
+        assert not any(step.startswith('SCAN') for step in plan), f"{name} scans a table:\n{detail}"
+        assert 'TEMP B-TREE' not in detail, f"{name} sorts in a temporary b-tree:\n{detail}"
@@ -0,0 +1,94 @@
+"""
+WriteBehindWriter: a record that cannot be written (e.g. an alert whose
+id another process already stored) must not discard the rest of its batch,
+and alerts are stored under a new id rather than dropped
+"""
+
+from datetime import datetime
+
+from automation.alert_persistence import AlertPersistence
+from automation.alert_store import AlertStore
+from models import Session, WriteBehindWriter, ActivityLog, Alert, SystemMetric
+
+
+def make_alert(alert_id):
+    now = datetime.now()
+    return Alert(id=alert_id, alert_type='test', severity='low', message=f'alert {alert_id}',
+                 details={}, fingerprint='f', first_seen=now, last_seen=now, timestamp=now)
+
+
+def test_conflicting_record_only_drops_itself():
+    writer = WriteBehindWriter(Session, batch_size=100, flush_interval=60)
+    session = Session()
+    try:
+        session.add(make_alert(9001))
+        session.commit()
+    finally:
+        session.close()
+
+    writer.submit(ActivityLog(action='test_before', description='kept'))
+    writer.submit(SystemMetric(metric_type='test_metric', value=1.0))
+    writer.submit(make_alert(9001))  # primary key conflict
+    writer.submit(make_alert(9002))
+    writer.submit(lambda s: s.add(ActivityLog(action='test_callable', description='kept')))
+    writer.submit(ActivityLog(action='test_after', description='kept'))
+    assert writer.flush()
+    writer.stop()
+
+    session = Session()
+    try:
+        actions = {log.action for log in session.query(ActivityLog).filter(ActivityLog.action.like('test_%'))}
+        assert actions == {'test_before', 'test_callable', 'test_after'}
+        assert session.query(SystemMetric).filter_by(metric_type='test_metric').count() == 1
+        assert session.query(Alert).filter(Alert.id.in_([9001, 9002])).count() == 2
+        assert session.get(Alert, 9001).message == 'alert 9001'
+    finally:
+        session.close()
+
+    stats = writer.get_stats()
+    assert stats['written'] == 5
+    assert stats['failed'] == 1
+    assert stats['rekeyed'] == 0
+    assert 'UNIQUE constraint failed' in stats['last_error']
+
+
+def test_conflicting_alert_is_stored_under_a_new_id():
+    writer = WriteBehindWriter(Session, batch_size=100, flush_interval=60)
+    persistence = AlertPersistence(writer, Session)
+    store = AlertStore()
+    persistence.on_rekey(store.rekey)
+
+    # Another process already stored an alert under the id this one hands out next
+    session = Session()
+    try:
+        session.add(make_alert(9101))
+        session.commit()
+    finally:
+        session.close()
+    store.restore([], last_id=9100)
+
+    alert, _ = store.record('test', 'high', 'ours', {}, 'fp-ours', 300)
+    assert alert['id'] == 9101
+    persistence.save_new(alert)
+    repeat, _ = store.record('test', 'high', 'ours again', {}, 'fp-ours', 300)
+    persistence.save_repeat(repeat)
+    assert writer.flush()
+
+    new_id = persistence.rekeyed[9101]
+    assert new_id > 9101
+    assert store.get(9101) is None and store.get(new_id)['message'] == 'ours again'
+    assert store.acknowledge(new_id)
+    persistence.save_acknowledged(new_id)
+    assert store.record('test', 'low', 'next', {}, 'fp-next', 300)[0]['id'] > new_id
+    writer.stop()
+
+    session = Session()
+    try:
+        theirs, ours = session.get(Alert, 9101), session.get(Alert, new_id)
+        assert theirs.message == 'alert 9101' and theirs.count == 1 and not theirs.acknowledged
+        assert ours.message == 'ours again' and ours.count == 2 and ours.acknowledged
+    finally:
+        session.close()
+
+    stats = writer.get_stats()
+    assert stats['written'] == 3 and stats['rekeyed'] == 1 and stats['failed'] == 0